@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import platform
+import subprocess
+import datetime
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Benchmarks are run from app/photo_organizer: python -m benchmarks.<name>
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB (0 when unavailable)."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(module: str, *args: str) -> Dict:
+    """
+    Runs one measurement in a fresh interpreter so peak RSS belongs to that
+    measurement only. The child prints a single JSON object on stdout.
+    """
+    out = subprocess.run([sys.executable, "-m", module, "--child", *args],
+                         cwd=APP_ROOT, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_metadata(params: Optional[Dict] = None) -> Dict:
+    """Where and on what a run happened, stored next to the results so two runs can be compared."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {k: v for k, v in (params or {}).items() if k not in ("json", "child")},
+    }
+
+
+def report(results: List[Dict], json_path: str = None, meta: Optional[Dict] = None):
+    """
+    Prints a fixed-width table and optionally writes the raw results as JSON
+    (a plain list, or {"meta": ..., "results": [...]} when meta is given).
+    """
+    if results:
+        # Union of the keys in first-seen order: rows may carry stage-specific fields
+        keys = list(dict.fromkeys(k for r in results for k in r))
+        widths = {k: max(len(k), *(len(_fmt(r.get(k))) for r in results)) for k in keys}
+        print("  ".join(k.ljust(widths[k]) for k in keys))
+        for r in results:
+            print("  ".join(_fmt(r.get(k)).ljust(widths[k]) for k in keys))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"meta": meta, "results": results} if meta else results, f, indent=2)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
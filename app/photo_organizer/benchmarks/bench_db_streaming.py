@@ -0,0 +1,98 @@
+"""
+Peak RSS and query time of the files-table read APIs on synthetic sessions.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_db_streaming --rows 100000 1000000 --json db_streaming.json
+
+Each (rows, method) pair runs in its own interpreter so peak RSS is not
+shared between measurements.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+from ._common import peak_rss_mb, run_child, report
+
+METHODS = {
+    "get_all_files": "fetchall() of the whole table",
+    "iter_files": "keyset-paginated stream of the whole table",
+    "iter_errors": "stream of status='error' rows (1% of the table, index on status)",
+    "count_pending": "COUNT(*) of pending rows with a destination",
+}
+
+
+def build_session(path: str, rows: int):
+    from src.data.database import SessionDatabase
+
+    db = SessionDatabase(path)
+    conn = db._get_conn()
+    statuses = ("pending", "verified", "verified", "error")
+
+    def gen():
+        for i in range(rows):
+            status = "error" if i % 100 == 0 else statuses[i % 3]
+            yield (f"/media/card/DCIM/{i // 1000:04d}/IMG_{i:07d}.JPG", f"IMG_{i:07d}.JPG", 2_000_000 + i,
+                   "image/jpeg", f"2023-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:00:00", "EXIF",
+                   f"/archive/2023/{i % 12 + 1:02d}/IMG_{i:07d}.JPG", status)
+
+    conn.executemany("""
+        INSERT INTO files (source_path, file_name, file_size, mime_type, date_taken, date_source, dest_path, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, gen())
+    conn.commit()
+    db.close()
+
+
+def measure(path: str, method: str) -> dict:
+    from src.data.database import SessionDatabase
+
+    db = SessionDatabase(path)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    seen = 0
+    if method == "get_all_files":
+        for row in db.get_all_files():
+            seen += 1
+    elif method == "iter_files":
+        for row in db.iter_files():
+            seen += 1
+    elif method == "iter_errors":
+        for row in db.iter_files(statuses=("error",)):
+            seen += 1
+    elif method == "count_pending":
+        seen = db.count_files(statuses=("pending",), has_dest=True)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {"rows_seen": seen, "seconds": elapsed, "peak_rss_mb": peak, "delta_rss_mb": peak - baseline}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS), default=list(METHODS))
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("DB", "METHOD"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"session_{rows}.db")
+            start = time.perf_counter()
+            build_session(path, rows)
+            print(f"Built {rows} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            for method in args.methods:
+                result = run_child("benchmarks.bench_db_streaming", path, method)
+                results.append({"rows": rows, "method": method, **result})
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
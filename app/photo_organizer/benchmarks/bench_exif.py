@@ -0,0 +1,71 @@
+"""
+EXIF date extraction throughput: header-only reader vs the exifread/PIL path.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_exif --files 300 --cold --json exif.json
+"""
+import os
+import time
+import argparse
+import datetime
+import tempfile
+
+from ._common import report
+from .corpus import make_jpeg, make_tiff_raw
+from src.core.exif_fast import read_exif_date
+from src.core.metadata import MetadataExtractor
+
+KINDS = {
+    # name: (builder, extension, size)
+    "jpeg": (make_jpeg, ".jpg", 3 * 1024 * 1024),
+    "jpeg_no_exif": (make_jpeg, ".jpg", 3 * 1024 * 1024),
+    "cr2": (make_tiff_raw, ".cr2", 25 * 1024 * 1024),
+}
+
+
+def drop_cache(paths):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for p in paths:
+        with open(p, "rb") as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200, help="Files per kind")
+    parser.add_argument("--cold", action="store_true", help="Drop the page cache before each pass (POSIX)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    readers = {
+        "header_only": read_exif_date,
+        "exifread+PIL": MetadataExtractor._get_exif_date_libs,
+    }
+    base = datetime.datetime(2020, 1, 1, 12, 0, 0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, (builder, ext, size) in KINDS.items():
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(tmp, kind, f"{i:05d}{ext}")
+                date = None if kind == "jpeg_no_exif" else base + datetime.timedelta(hours=i)
+                builder(path, date, size, seed=i)
+                paths.append(path)
+
+            answers = {}
+            for name, reader in readers.items():
+                if args.cold:
+                    drop_cache(paths)
+                start = time.perf_counter()
+                answers[name] = [reader(p) for p in paths]
+                elapsed = time.perf_counter() - start
+                results.append({"kind": kind, "reader": name, "files": len(paths),
+                                "seconds": elapsed, "files_per_s": len(paths) / elapsed})
+            if len(set(map(tuple, answers.values()))) != 1:
+                print(f"WARNING: readers disagree on {kind}")
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Metadata extraction scaling: extractor threads vs the process-pool mode of Scanner,
+on a mix where most files go through pure-Python readers (GIL-bound).
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_extract --files 4000 --workers 1 2 4 8 16 32 --json extract.json
+"""
+import os
+import time
+import logging
+import argparse
+import datetime
+import tempfile
+
+from ._common import report
+from .corpus import make_jpeg, make_png, make_mp4
+from src.core.scanner import Scanner
+from src.data.database import SessionDatabase
+
+
+def build_corpus(root: str, files: int):
+    """60% PNG (library fallback), 30% JPEG without EXIF (filename regex), 10% MP4."""
+    base = datetime.datetime(2019, 1, 1)
+    for i in range(files):
+        folder = os.path.join(root, f"d{i % 50:02d}")
+        if i % 10 < 6:
+            make_png(os.path.join(folder, f"scan_{i:06d}.png"), size=64 * 1024, seed=i)
+        elif i % 10 < 9:
+            make_jpeg(os.path.join(folder, f"IMG_2019{i % 12 + 1:02d}15_{i:06d}.jpg"), None, size=64 * 1024, seed=i)
+        else:
+            make_mp4(os.path.join(folder, f"clip_{i:06d}.mp4"), base + datetime.timedelta(hours=i),
+                     size=256 * 1024, seed=i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=4000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    # exifread warns once per PNG without EXIF
+    logging.getLogger("exifread").setLevel(logging.ERROR)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        build_corpus(corpus, args.files)
+        for mode in ("threads", "processes"):
+            baseline = None
+            for workers in args.workers:
+                db = SessionDatabase(os.path.join(tmp, f"{mode}_{workers}.db"), write_behind=True)
+                scanner = Scanner(db, max_workers=workers, use_processes=(mode == "processes"))
+                start = time.perf_counter()
+                scanner.scan_path(corpus)
+                elapsed = time.perf_counter() - start
+                db.close()
+                baseline = baseline or elapsed
+                results.append({"mode": mode, "workers": workers, "files": scanner.total_files_found,
+                                "seconds": elapsed, "files_per_s": scanner.total_files_found / elapsed,
+                                "speedup": baseline / elapsed})
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Hashing throughput per algorithm, read method and buffer size, against the old
+8 KB f.read loop of MetadataExtractor.calculate_hash.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_hash --size-mb 512 --buffers 65536 1048576 4194304 --json hash.json
+"""
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+
+from ._common import report
+from .bench_exif import drop_cache
+from src.core.hashing import ALGORITHMS, FileHasher, METHOD_READINTO, METHOD_FILE_DIGEST, METHOD_MMAP
+
+
+def legacy_hash(path: str, algorithm: str) -> str:
+    """The pre-hashing-module loop: one new bytes object per 8 KB chunk."""
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(8192):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512, help="Size of the test file")
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument("--buffers", type=int, nargs="+", default=[64 * 1024, 1024 * 1024, 4 * 1024 * 1024])
+    parser.add_argument("--cold", action="store_true", help="Drop the page cache before each pass (POSIX)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payload.bin")
+        block = os.urandom(1024 * 1024)
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+        size = os.path.getsize(path)
+
+        def measure(algorithm: str, method: str, buffer_size, fn):
+            if args.cold:
+                drop_cache([path])
+            start = time.perf_counter()
+            digest = fn()
+            elapsed = time.perf_counter() - start
+            results.append({"algorithm": algorithm, "method": method, "buffer": buffer_size or "-",
+                            "seconds": elapsed, "mb_per_s": size / elapsed / (1024 * 1024)})
+            return digest
+
+        for algorithm in args.algorithms:
+            expected = measure(algorithm, "legacy_8k_read", 8192, lambda: legacy_hash(path, algorithm))
+            for buffer_size in args.buffers:
+                hasher = FileHasher(algorithm, buffer_size=buffer_size, method=METHOD_READINTO)
+                digest = measure(algorithm, METHOD_READINTO, buffer_size, lambda: hasher.hash_file(path)[0])
+                if digest != expected:
+                    print(f"WARNING: {algorithm} readinto/{buffer_size} digest mismatch")
+            if hasattr(hashlib, "file_digest"):
+                hasher = FileHasher(algorithm, method=METHOD_FILE_DIGEST)
+                measure(algorithm, METHOD_FILE_DIGEST, None, lambda: hasher.hash_file(path)[0])
+            hasher = FileHasher(algorithm, method=METHOD_MMAP)
+            if measure(algorithm, METHOD_MMAP, None, lambda: hasher.hash_file(path)[0]) != expected:
+                print(f"WARNING: {algorithm} mmap digest mismatch")
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+End-to-end pipeline benchmark on a generated corpus: scan, dedup, plan and
+transfer, each measured for throughput, per-item latency percentiles and peak RSS.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_pipeline --files 10000 100000 --json before.json
+    python -m benchmarks.bench_pipeline --files 1000000 --sparse --stages scan plan --json big.json
+    python -m benchmarks.compare before.json after.json
+
+Every stage runs in its own interpreter on the session DB left by the previous
+one, so peak RSS belongs to that stage alone. Use --sparse above ~100k files:
+payloads become holes and the corpus takes almost no disk.
+"""
+import os
+import sys
+import json
+import time
+import array
+import shutil
+import argparse
+import tempfile
+
+from ._common import peak_rss_mb, run_child, report, run_metadata
+from .corpus import generate_corpus, CORPUS_SHAPES
+
+STAGES = ("scan", "dedup", "plan", "transfer")
+
+
+def percentiles(samples: array.array) -> dict:
+    """p50/p90/p99/max of latency samples (seconds) in milliseconds."""
+    if not samples:
+        return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+
+
+def timed(fn, samples: array.array):
+    """Wraps fn so each call appends its duration to samples (array.append is atomic under the GIL)."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_stage(stage: str, workdir: str) -> dict:
+    from src.core.scanner import Scanner
+    from src.core.dedup import DuplicateFinder
+    from src.core.organizer import OrganizerEngine
+    from src.data.database import SessionDatabase
+
+    db = SessionDatabase(os.path.join(workdir, "session.db"), write_behind=True)
+    organizer = OrganizerEngine(db)
+    samples = array.array("d")
+    extra = {}
+    start = time.perf_counter()
+
+    if stage == "scan":
+        scanner = Scanner(db)
+        # Latency = one file through the extract stage (probe, parse, row)
+        scanner._process_file = timed(scanner._process_file, samples)
+        scanner.scan_path(os.path.join(workdir, "corpus"))
+        items = scanner.total_files_found
+        extra = {k: v for k, v in scanner.stage_stats().items() if k.endswith("_s") or k.startswith("probe_")}
+    elif stage == "dedup":
+        finder = DuplicateFinder(db, organizer.transfer)
+        finder._fingerprint = timed(finder._fingerprint, samples)
+        finder._full_hash = timed(finder._full_hash, samples)
+        result = finder.run()
+        items = result["files"]
+        extra = {"groups": result["groups"], "full_hashed": result["full_hashed"]}
+    elif stage == "plan":
+        # Latency = per planned row, averaged over each batch (the planner works in SQL batches)
+        last = [time.perf_counter(), 0]
+
+        def progress(done, total):
+            now = time.perf_counter()
+            if done > last[1]:
+                samples.append((now - last[0]) / (done - last[1]))
+            last[:] = [now, done]
+        plan = organizer.calculate_destinations(os.path.join(workdir, "dest"), skip_duplicates=True,
+                                                progress_callback=progress)
+        items = db.count_files(has_dest=True)
+        extra = {"conflicts": plan["conflicts"]}
+    else:
+        organizer._transfer_file = timed(organizer._transfer_file, samples)
+        organizer.execute_transfer()
+        items = len(samples)
+        stats = db.get_stats()
+        extra = {"mb_written_per_s": stats["bytes_written"] / (1024 * 1024) / (time.perf_counter() - start),
+                 "errors": stats["errors"]}
+
+    elapsed = time.perf_counter() - start
+    db.close()
+    return {"items": items, "seconds": elapsed, "items_per_s": items / elapsed if elapsed else 0.0,
+            **percentiles(samples), "peak_rss_mb": peak_rss_mb(), **extra}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--shape", choices=CORPUS_SHAPES, default="camera")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--size-scale", type=float, default=0.01, help="Fraction of real file sizes")
+    parser.add_argument("--sparse", action="store_true", help="Write payloads as holes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep corpus and sessions here instead of a temp dir")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(*args.child)))
+        return
+
+    results = []
+    base = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        for files in args.files:
+            workdir = os.path.join(base, f"{args.shape}_{files}")
+            shutil.rmtree(workdir, ignore_errors=True)
+            start = time.perf_counter()
+            manifest = generate_corpus(os.path.join(workdir, "corpus"), files, args.shape, args.seed,
+                                       args.size_scale, args.sparse)
+            print(f"Corpus of {files} files ({manifest['bytes'] / 1e9:.2f} GB) in "
+                  f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+            for stage in args.stages:
+                result = run_child("benchmarks.bench_pipeline", stage, workdir)
+                results.append({"files": files, "shape": args.shape, "stage": stage, **result})
+                print(f"  {stage}: {result['items_per_s']:.0f}/s, p99 {result['p99_ms']:.2f} ms, "
+                      f"{result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(base, ignore_errors=True)
+    report(results, args.json, meta=run_metadata(vars(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Syscalls per file of the metadata stage: FileProbe (one open, one header read)
+vs the library readers that open the file by path.
+read() calls are taken from the kernel (/proc/self/io "syscr") where available,
+next to FileProbe's own counters.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_probe --files 200 --json probe.json
+"""
+import os
+import time
+import argparse
+import datetime
+import tempfile
+
+from ._common import report
+from .corpus import make_jpeg, make_tiff_raw, make_mp4, make_heic
+from src.core.metadata import MetadataExtractor
+from src.core.probe import FileProbe
+
+KINDS = {
+    # name: (builder, extension, size, kwargs)
+    "jpeg": (make_jpeg, ".jpg", 3 * 1024 * 1024, {}),
+    "cr2": (make_tiff_raw, ".cr2", 25 * 1024 * 1024, {}),
+    "mp4": (make_mp4, ".mp4", 30 * 1024 * 1024, {}),
+    "mov_moov_end": (make_mp4, ".mov", 30 * 1024 * 1024, {"moov_at_end": True, "brand": b"qt  "}),
+    "heic": (make_heic, ".heic", 3 * 1024 * 1024, {}),
+}
+
+
+def kernel_reads() -> int:
+    """read-family syscalls issued by this process so far (Linux), else -1."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("syscr:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def libraries_path(path: str):
+    """The pre-probe pipeline: guess_type, then exifread+PIL or hachoir by path, then stat."""
+    mime = MetadataExtractor.get_mime_type(path)
+    if mime.startswith("image"):
+        date = MetadataExtractor._get_exif_date_libs(path)
+    else:
+        import hachoir.parser
+        import hachoir.metadata
+        date = None
+        parser = hachoir.parser.createParser(path)
+        if parser:
+            with parser:
+                meta = hachoir.metadata.extractMetadata(parser)
+            date = meta.get("creation_date") if meta and meta.has("creation_date") else None
+    if not date:
+        os.stat(path)
+    return date
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200, help="Files per kind")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    base = datetime.datetime(2020, 5, 1, 8, 0, 0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, (builder, ext, size, kwargs) in KINDS.items():
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(tmp, kind, f"{i:05d}{ext}")
+                builder(path, base + datetime.timedelta(hours=i), size, seed=i, **kwargs)
+                paths.append(path)
+            stats = [os.stat(p) for p in paths]
+            # Warm-up: mimetypes table, library imports
+            MetadataExtractor.extract(paths[0])
+            libraries_path(paths[0])
+
+            FileProbe.reset_totals()
+            syscr = kernel_reads()
+            start = time.perf_counter()
+            for p, st in zip(paths, stats):
+                MetadataExtractor.extract(p, st)
+            elapsed = time.perf_counter() - start
+            syscr = kernel_reads() - syscr if syscr >= 0 else None
+            totals = FileProbe.totals()
+            n = len(paths)
+            results.append({"kind": kind, "path": "FileProbe", "files_per_s": n / elapsed,
+                            "opens_per_file": (totals.get("opens", 0) + totals.get("fallback_opens", 0)) / n,
+                            "reads_per_file": totals.get("reads", 0) / n,
+                            "kernel_reads_per_file": syscr / n if syscr is not None else "-"})
+
+            syscr = kernel_reads()
+            start = time.perf_counter()
+            for p in paths:
+                libraries_path(p)
+            elapsed = time.perf_counter() - start
+            syscr = kernel_reads() - syscr if syscr >= 0 else None
+            results.append({"kind": kind, "path": "libraries", "files_per_s": n / elapsed,
+                            "opens_per_file": "-", "reads_per_file": "-",
+                            "kernel_reads_per_file": syscr / n if syscr is not None else "-"})
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
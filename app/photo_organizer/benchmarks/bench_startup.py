@@ -0,0 +1,111 @@
+"""
+Start-up budget: wall time of a fresh interpreter until the CLI has printed
+--help, and until the main window is visible, plus the heaviest imports of
+each path from -X importtime. Exits with status 1 when a median goes over its
+budget, or when the CLI path imports a module it must not (Qt, metadata backends).
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_startup --runs 5 --cli-budget-ms 300 --gui-budget-ms 1500
+
+The GUI path runs with QT_QPA_PLATFORM=offscreen and is skipped when PySide6
+is not installed.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from ._common import APP_ROOT, report, run_metadata
+
+# Must stay out of `cli.py --help`: Qt, and the lazily loaded metadata parsers
+CLI_FORBIDDEN = ("PySide6", "PIL", "exifread", "hachoir")
+
+GUI_CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+from main import create_window
+app, window = create_window(sys.argv[:1])
+app.processEvents()
+print("visible", time.time(), window.isVisible(), flush=True)
+"""
+
+
+def import_profile(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """(total import time in ms, {top-level package: self ms summed over its modules}) from -X importtime output."""
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+    return sum(packages.values()), packages
+
+
+def timed_run(cmd: List[str], env: Optional[Dict[str, str]] = None, marker: Optional[str] = None,
+              cwd: str = APP_ROOT) -> Tuple[float, str, str]:
+    """Wall ms from spawning cmd to its exit, or to the time printed after `marker` on stdout."""
+    start = time.time()
+    out = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, env=env)
+    end = time.time()
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}")
+    if marker:
+        for line in out.stdout.splitlines():
+            if line.startswith(marker):
+                end = float(line.split()[1])
+                break
+        else:
+            raise RuntimeError(f"'{marker}' not printed")
+    return (end - start) * 1000, out.stdout, out.stderr
+
+
+def measure(name: str, cmd: List[str], runs: int, budget_ms: float, env: Optional[Dict[str, str]] = None,
+            marker: Optional[str] = None, forbidden: Tuple[str, ...] = (), cwd: str = APP_ROOT) -> Dict:
+    times = [timed_run(cmd, env, marker, cwd)[0] for _ in range(runs)]
+    _, _, stderr = timed_run([sys.executable, "-X", "importtime", *cmd[1:]], env, marker, cwd)
+    import_ms, packages = import_profile(stderr)
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:3]
+    leaked = sorted(p for p in packages if p in forbidden)
+    median = statistics.median(times)
+    return {"path": name, "first_ms": times[0], "median_ms": median, "budget_ms": budget_ms,
+            "import_ms": import_ms,
+            "heaviest": ", ".join(f"{p} {ms:.0f}ms" for p, ms in heaviest),
+            "forbidden_imports": ",".join(leaked) or "-",
+            "ok": median <= budget_ms and not leaked}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per path (the median is checked)")
+    parser.add_argument("--cli-budget-ms", type=float, default=300.0)
+    parser.add_argument("--gui-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = [measure("cli --help", [sys.executable, "cli.py", "--help"], args.runs, args.cli_budget_ms,
+                       forbidden=CLI_FORBIDDEN)]
+    try:
+        import PySide6  # noqa: F401  (only checks availability)
+    except ImportError:
+        results.append({"path": "gui window", "ok": None, "heaviest": "skipped: PySide6 not installed"})
+    else:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        # The window creates session.db in its working directory
+        with tempfile.TemporaryDirectory() as tmp:
+            results.append(measure("gui window", [sys.executable, "-c", GUI_CHILD.format(root=APP_ROOT)],
+                                   args.runs, args.gui_budget_ms, env=env, marker="visible", cwd=tmp))
+
+    report(results, args.json, run_metadata(vars(args)))
+    failed = [r["path"] for r in results if r["ok"] is False]
+    if failed:
+        print(f"Over budget: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
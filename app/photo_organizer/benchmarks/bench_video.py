@@ -0,0 +1,103 @@
+"""
+Video/HEIC date extraction: seek-based ISOBMFF reader vs hachoir.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_video --files 50 --json video.json
+"""
+import io
+import os
+import time
+import argparse
+import datetime
+import tempfile
+
+from ._common import report
+from .corpus import make_mp4, make_heic
+from src.core import isobmff
+from src.core.metadata import MetadataExtractor
+
+KINDS = {
+    # name: (builder, extension, size, kwargs)
+    "mp4_moov_start": (make_mp4, ".mp4", 50 * 1024 * 1024, {}),
+    "mov_moov_end": (make_mp4, ".mov", 50 * 1024 * 1024, {"moov_at_end": True, "brand": b"qt  "}),
+    "heic": (make_heic, ".heic", 3 * 1024 * 1024, {}),
+}
+
+
+class CountingReader(io.RawIOBase):
+    """Raw file wrapper counting the bytes actually read."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb", buffering=0)
+        self.bytes_read = 0
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        self.bytes_read += n or 0
+        return n
+
+    def seek(self, offset, whence=0):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50, help="Files per kind")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    base = datetime.datetime(2021, 6, 1, 9, 30, 0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, (builder, ext, size, kwargs) in KINDS.items():
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(tmp, kind, f"{i:05d}{ext}")
+                builder(path, base + datetime.timedelta(days=i), size, seed=i, **kwargs)
+                paths.append(path)
+
+            reader = isobmff.heif_date_from_file if kind == "heic" else isobmff.movie_date_from_file
+            start = time.perf_counter()
+            read = 0
+            for p in paths:
+                with CountingReader(p) as f:
+                    reader(f)
+                    read += f.bytes_read
+            elapsed = time.perf_counter() - start
+            results.append({"kind": kind, "reader": "isobmff", "files_per_s": len(paths) / elapsed,
+                            "bytes_per_file": read // len(paths)})
+
+            fallback = MetadataExtractor._get_exif_date_libs if kind == "heic" else _hachoir_date
+            start = time.perf_counter()
+            for p in paths:
+                fallback(p)
+            elapsed = time.perf_counter() - start
+            results.append({"kind": kind, "reader": "exifread+PIL" if kind == "heic" else "hachoir",
+                            "files_per_s": len(paths) / elapsed, "bytes_per_file": "-"})
+    report(results, args.json)
+
+
+def _hachoir_date(path: str):
+    # The library path only, bypassing the ISOBMFF fast path in _get_video_date
+    import hachoir.parser
+    import hachoir.metadata
+    parser = hachoir.parser.createParser(path)
+    if not parser:
+        return None
+    with parser:
+        metadata = hachoir.metadata.extractMetadata(parser)
+    return metadata.get('creation_date') if metadata and metadata.has('creation_date') else None
+
+
+if __name__ == "__main__":
+    main()
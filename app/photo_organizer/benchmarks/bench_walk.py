@@ -0,0 +1,61 @@
+"""
+Directory walk throughput, serial vs parallel, with injected per-call latency
+standing in for a NAS round-trip.
+
+    cd app/photo_organizer
+    python -m benchmarks.bench_walk --dirs 2000 --files 5 --scandir-ms 5 --stat-ms 1 --workers 1 4 16 64
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from ._common import report
+from .latency import SlowFS
+from src.core.scanner import Scanner
+from src.core.walker import ParallelWalker
+
+
+def build_tree(root: str, dirs: int, files: int, fanout: int = 10):
+    """dirs directories, fanout wide per level, files media files in each."""
+    paths = [root]
+    made = 0
+    while made < dirs:
+        parent = paths[made // fanout]
+        path = os.path.join(parent, f"d{made:06d}")
+        os.mkdir(path)
+        paths.append(path)
+        for i in range(files):
+            open(os.path.join(path, f"IMG_{i:04d}.jpg"), "wb").close()
+        made += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dirs", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=5, help="Files per directory")
+    parser.add_argument("--scandir-ms", type=float, default=5.0)
+    parser.add_argument("--stat-ms", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        build_tree(tmp, args.dirs, args.files)
+        baseline = None
+        for workers in args.workers:
+            fs = SlowFS(args.scandir_ms / 1000, args.stat_ms / 1000)
+            walker = ParallelWalker(Scanner.SKIP_DIRS, Scanner.SKIP_FILES, max_workers=workers, scandir=fs.scandir)
+            start = time.perf_counter()
+            found = sum(1 for _ in walker.walk(tmp))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            results.append({"workers": workers, "files": found, "seconds": elapsed,
+                            "files_per_s": found / elapsed, "speedup": baseline / elapsed,
+                            "scandir_calls": fs.calls["scandir"], "stat_calls": fs.calls["stat"]})
+    report(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
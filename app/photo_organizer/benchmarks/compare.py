@@ -0,0 +1,84 @@
+"""
+Diffs two benchmark JSON files (any benchmark written with --json).
+
+    cd app/photo_organizer
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Rows are matched on their non-numeric fields plus the size fields (files, rows,
+workers...); every shared numeric metric is printed as old -> new with the change.
+Changes beyond the threshold in the bad direction are flagged and make the exit
+status 1, so the command can gate a CI job.
+"""
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+from ._common import report
+
+# Numeric fields that identify a measurement rather than measure it
+KEY_FIELDS = {"files", "rows", "workers", "buffer", "dirs"}
+# Metrics where a larger value is better (everything else: smaller is better)
+HIGHER_IS_BETTER = ("_per_s", "speedup")
+# Metrics that describe the run and are not compared
+IGNORED = {"items", "groups", "full_hashed", "errors"}
+
+
+def load(path: str) -> Tuple[Dict, List[Dict]]:
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data.get("meta") or {}, data.get("results", [])
+    return {}, data
+
+
+def row_key(row: Dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in row.items()
+                        if k in KEY_FIELDS or not isinstance(v, (int, float)) or isinstance(v, bool)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change flagged as regression")
+    parser.add_argument("--json", help="Write the comparison to this file")
+    args = parser.parse_args()
+
+    old_meta, old_rows = load(args.old)
+    new_meta, new_rows = load(args.new)
+    if old_meta or new_meta:
+        print(f"old: {old_meta.get('commit', '?')} {old_meta.get('timestamp', '')}  "
+              f"new: {new_meta.get('commit', '?')} {new_meta.get('timestamp', '')}")
+        if old_meta.get("platform") != new_meta.get("platform") or old_meta.get("cpu_count") != new_meta.get("cpu_count"):
+            print("WARNING: runs come from different machines")
+
+    old_by_key = {row_key(r): r for r in old_rows}
+    results = []
+    regressions = 0
+    for new in new_rows:
+        old = old_by_key.get(row_key(new))
+        if old is None:
+            continue
+        label = " ".join(v for k, v in row_key(new))
+        for metric, value in new.items():
+            if metric in KEY_FIELDS or metric in IGNORED or isinstance(value, bool):
+                continue
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            change = (value - before) / before * 100 if before else 0.0
+            better_up = metric.endswith(HIGHER_IS_BETTER)
+            worse = -change if better_up else change
+            flag = "REGRESSION" if worse > args.threshold else ("improved" if -worse > args.threshold else "")
+            regressions += flag == "REGRESSION"
+            results.append({"measurement": label, "metric": metric, "old": before, "new": value,
+                            "change_pct": change, "flag": flag})
+    report(results, args.json)
+    if not results:
+        print("No matching measurements")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Deterministic synthetic media files for the benchmarks. Only the structure the
+metadata readers look at is real (JPEG segments, TIFF IFDs); pixel data is
+filler, so files are cheap to generate yet parse like camera output.
+"""
+import os
+import zlib
+import struct
+import random
+import shutil
+import datetime
+from typing import Dict, Optional
+
+
+def tiff_block(date: Optional[datetime.datetime], endian: str = '<', filler_tags: int = 12) -> bytes:
+    """
+    TIFF header + IFD0 (filler tags, DateTime, ExifIFD pointer) + Exif IFD
+    (DateTimeOriginal, DateTimeDigitized). With date=None only filler tags are written.
+    """
+    order = b'II' if endian == '<' else b'MM'
+    date_str = date.strftime('%Y:%m:%d %H:%M:%S').encode() + b'\x00' if date else b''
+
+    ifd0_tags = [(0x0100 + i, 4, 1, i) for i in range(filler_tags)]   # LONG fillers
+    exif_tags = []
+    if date:
+        ifd0_tags.append((0x0132, 2, len(date_str), None))
+        ifd0_tags.append((0x8769, 4, 1, None))
+        exif_tags = [(0x9003, 2, len(date_str), None), (0x9004, 2, len(date_str), None)]
+    ifd0_tags.sort()
+
+    ifd0_off = 8
+    ifd0_len = 2 + 12 * len(ifd0_tags) + 4
+    exif_off = ifd0_off + ifd0_len
+    exif_len = (2 + 12 * len(exif_tags) + 4) if exif_tags else 0
+    data_off = exif_off + exif_len
+
+    out = bytearray(order + struct.pack(endian + 'HI', 42, ifd0_off))
+    data = bytearray()
+
+    def entries(tags):
+        block = bytearray(struct.pack(endian + 'H', len(tags)))
+        for tag, typ, count, value in tags:
+            if tag == 0x8769:
+                value = exif_off
+            if typ == 2:
+                value = data_off + len(data)
+                data.extend(date_str)
+            block += struct.pack(endian + 'HHII', tag, typ, count, value)
+        block += struct.pack(endian + 'I', 0)
+        return block
+
+    out += entries(ifd0_tags)
+    if exif_tags:
+        out += entries(exif_tags)
+    out += data
+    return bytes(out)
+
+
+def make_jpeg(path: str, date: Optional[datetime.datetime], size: int = 2 * 1024 * 1024, seed: int = 0,
+              sparse: bool = False):
+    """SOI, APP0 (JFIF), APP1 (Exif, only when date is set), DQT filler, SOS + payload, EOI."""
+    rng = random.Random(seed)
+    segs = bytearray(b'\xff\xd8')
+    segs += b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    if date:
+        app1 = b'Exif\x00\x00' + tiff_block(date)
+        segs += b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+    dqt = bytes(rng.getrandbits(8) for _ in range(65))
+    segs += b'\xff\xdb' + struct.pack('>H', len(dqt) + 2) + dqt
+    segs += b'\xff\xda' + struct.pack('>H', 8) + b'\x01\x01\x00\x00\x3f\x00'
+    _write_with_payload(path, bytes(segs), size, b'\xff\xd9', rng, sparse)
+
+
+def make_tiff_raw(path: str, date: Optional[datetime.datetime], size: int = 25 * 1024 * 1024,
+                  endian: str = '<', seed: int = 0, sparse: bool = False):
+    """TIFF-structured RAW (CR2/NEF/ARW-like): header and IFDs first, sensor data after."""
+    _write_with_payload(path, tiff_block(date, endian), size, b'', random.Random(seed), sparse)
+
+
+def make_png(path: str, size: int = 1024 * 1024, text_chunks: int = 20, seed: int = 0, sparse: bool = False):
+    """
+    PNG with tEXt chunks and no eXIf: no native date reader applies, so extraction
+    runs the pure-Python library fallback (exifread, then PIL) end to end.
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rng = random.Random(seed)
+    head = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1024, 1024, 8, 2, 0, 0, 0))
+    for i in range(text_chunks):
+        head += chunk(b'tEXt', b'Comment\x00' + bytes(rng.choice(b'abcdefgh ') for _ in range(200)))
+    idat_len = max(0, size - len(head) - 12 - 12)
+    # The IDAT header goes in front of the filler; its CRC is not checked by the readers
+    _write_with_payload(path, head + struct.pack('>I', idat_len) + b'IDAT', len(head) + 8 + idat_len + 4 + 12,
+                        b'\x00' * 4 + chunk(b'IEND', b''), rng, sparse)
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', len(payload) + 8) + kind + payload
+
+
+def _full_box(kind: bytes, version: int, payload: bytes) -> bytes:
+    return _box(kind, bytes([version, 0, 0, 0]) + payload)
+
+
+def make_mp4(path: str, date: Optional[datetime.datetime], size: int = 20 * 1024 * 1024,
+             moov_at_end: bool = False, brand: bytes = b'isom', seed: int = 0, sparse: bool = False):
+    """ftyp + moov(mvhd) + mdat, or ftyp + mdat + moov when moov_at_end (non-faststart files)."""
+    created = int((date - datetime.datetime(1904, 1, 1)).total_seconds()) if date else 0
+    mvhd = _full_box(b'mvhd', 0, struct.pack('>IIII', created, created, 1000, 10000)
+                     + struct.pack('>IH', 0x00010000, 0x0100) + bytes(10)
+                     + struct.pack('>9I', 0x00010000, 0, 0, 0, 0x00010000, 0, 0, 0, 0x40000000)
+                     + bytes(24) + struct.pack('>I', 2))
+    # A trak placeholder so mvhd is not the only child
+    moov = _box(b'moov', mvhd + _box(b'trak', _box(b'tkhd', bytes(84))))
+    ftyp = _box(b'ftyp', brand + struct.pack('>I', 0x200) + brand + b'mp41')
+    mdat_len = max(16, size - len(ftyp) - len(moov))
+    head = ftyp + (b'' if moov_at_end else moov)
+    # 64-bit mdat header: size==1 then largesize, like files over 4 GB
+    mdat_header = struct.pack('>I', 1) + b'mdat' + struct.pack('>Q', mdat_len)
+    tail = moov if moov_at_end else b''
+    _write_with_payload(path, head + mdat_header, len(head) + mdat_len + len(tail), tail, random.Random(seed), sparse)
+
+
+def make_heic(path: str, date: Optional[datetime.datetime], size: int = 2 * 1024 * 1024, seed: int = 0,
+              sparse: bool = False):
+    """ftyp(heic) + meta(hdlr, pitm, iinf, iloc) + mdat holding the Exif item, then image filler."""
+    exif = struct.pack('>I', 6) + b'Exif\x00\x00' + tiff_block(date) if date else b''
+    ftyp = _box(b'ftyp', b'heic' + bytes(4) + b'mif1heic')
+
+    def build_meta(exif_offset: int) -> bytes:
+        infe = [_full_box(b'infe', 2, struct.pack('>HH', 1, 0) + b'hvc1' + b'\x00')]
+        if exif:
+            infe.append(_full_box(b'infe', 2, struct.pack('>HH', 2, 0) + b'Exif' + b'\x00'))
+        iinf = _full_box(b'iinf', 0, struct.pack('>H', len(infe)) + b''.join(infe))
+        items = [(1, exif_offset + len(exif), 1024)]
+        if exif:
+            items.append((2, exif_offset, len(exif)))
+        iloc = _full_box(b'iloc', 0, bytes([0x44, 0x00]) + struct.pack('>H', len(items))
+                         + b''.join(struct.pack('>HHHII', i, 0, 1, off, ln) for i, off, ln in items))
+        return _full_box(b'meta', 0, _full_box(b'hdlr', 0, bytes(4) + b'pict' + bytes(13))
+                         + _full_box(b'pitm', 0, struct.pack('>H', 1)) + iinf + iloc)
+
+    meta_len = len(build_meta(0))
+    mdat_payload_start = len(ftyp) + meta_len + 8
+    meta = build_meta(mdat_payload_start)
+    body = max(0, size - len(ftyp) - len(meta) - 8 - len(exif))
+    head = ftyp + meta + struct.pack('>I', 8 + len(exif) + body) + b'mdat' + exif
+    _write_with_payload(path, head, len(head) + body, b'', random.Random(seed), sparse)
+
+
+# Share of each kind in a generated corpus, and its full-scale size
+CORPUS_MIX = (
+    # kind, weight, size
+    ("jpeg_exif", 40, 3 * 1024 * 1024),
+    ("jpeg_plain", 8, 2 * 1024 * 1024),       # No EXIF: filesystem date
+    ("named_date", 10, 2 * 1024 * 1024),      # No EXIF, date in the file name (IMG_YYYYMMDD_...)
+    ("raw", 10, 25 * 1024 * 1024),
+    ("heic", 10, 2 * 1024 * 1024),
+    ("mp4_moov_start", 8, 30 * 1024 * 1024),
+    ("mov_moov_end", 7, 30 * 1024 * 1024),
+    ("png", 7, 1024 * 1024),
+)
+
+CORPUS_SHAPES = ("wide", "deep", "camera")
+
+
+def generate_corpus(root: str, files: int, shape: str = "camera", seed: int = 0, size_scale: float = 0.01,
+                    sparse: bool = False, duplicates: float = 0.02, name_collisions: float = 0.02) -> Dict[str, int]:
+    """
+    Writes a deterministic media tree (same arguments, same bytes) and returns a manifest
+    {kind: count, ..., "bytes": total}.
+    shape: "wide" = 1000 sibling folders; "deep" = chains 12 folders deep;
+           "camera" = DCIM/NNNCANON folders of 999 files, like a memory card.
+    size_scale shrinks the full-scale sizes of CORPUS_MIX (0.01: a 3 MB JPEG becomes 30 KB);
+    sparse leaves the payload as a hole so even 1M files cost almost no disk.
+    duplicates / name_collisions: shares of files that are byte copies under another
+    name, or distinct content under a name already used for the same day.
+    """
+    if shape not in CORPUS_SHAPES:
+        raise ValueError(f"Unknown shape: {shape}")
+    rng = random.Random(seed)
+    kinds = [k for k, _, _ in CORPUS_MIX]
+    weights = [w for _, w, _ in CORPUS_MIX]
+    sizes = {k: size for k, _, size in CORPUS_MIX}
+    base = datetime.datetime(2015, 1, 1, 8, 0, 0)
+    manifest: Dict[str, int] = {k: 0 for k in kinds}
+    manifest.update(duplicates=0, name_collisions=0, bytes=0)
+    written = []   # Paths of regular files: sources for the byte copies
+    by_kind: Dict[str, list] = {k: [] for k in kinds}   # (name, date) per kind, for name reuse
+
+    for i in range(files):
+        folder = os.path.join(root, _corpus_folder(shape, i))
+        roll = rng.random()
+        if written and roll < duplicates:
+            src = written[rng.randrange(len(written))]
+            path = os.path.join(folder, f"copy_{i:07d}{os.path.splitext(src)[1]}")
+            os.makedirs(folder, exist_ok=True)
+            shutil.copyfile(src, path)
+            manifest["duplicates"] += 1
+            manifest["bytes"] += os.path.getsize(path)
+            continue
+
+        kind = rng.choices(kinds, weights)[0]
+        date = base + datetime.timedelta(minutes=rng.randrange(10 * 365 * 24 * 60))
+        # Distinct sizes: sparse files of one kind and date must not come out byte-identical
+        size = max(4096, int(sizes[kind] * size_scale * rng.uniform(0.5, 1.5)))
+        name = _corpus_name(kind, i, date)
+        if by_kind[kind] and roll < duplicates + name_collisions:
+            # Same name and day as an earlier file of the kind: the planner must pick a new name
+            name, reuse_date = by_kind[kind][rng.randrange(len(by_kind[kind]))]
+            date = reuse_date.replace(hour=(reuse_date.hour + 1) % 24)
+            manifest["name_collisions"] += 1
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            path = os.path.join(folder, f"{i:07d}_{name}")
+
+        if kind in ("jpeg_exif", "jpeg_plain", "named_date"):
+            make_jpeg(path, date if kind == "jpeg_exif" else None, size, seed=i, sparse=sparse)
+        elif kind == "raw":
+            make_tiff_raw(path, date, size, endian='<' if i % 2 else '>', seed=i, sparse=sparse)
+        elif kind == "heic":
+            make_heic(path, date, size, seed=i, sparse=sparse)
+        elif kind == "mp4_moov_start":
+            make_mp4(path, date, size, seed=i, sparse=sparse)
+        elif kind == "mov_moov_end":
+            make_mp4(path, date, size, moov_at_end=True, brand=b'qt  ', seed=i, sparse=sparse)
+        else:
+            make_png(path, size, seed=i, sparse=sparse)
+        manifest[kind] += 1
+        manifest["bytes"] += os.path.getsize(path)
+        written.append(path)
+        by_kind[kind].append((name, date))
+    return manifest
+
+
+def _corpus_folder(shape: str, i: int) -> str:
+    if shape == "wide":
+        return f"d{i % 1000:04d}"
+    if shape == "deep":
+        chain = i // 100   # 100 files per leaf, a new 12-level chain every 12 leaves
+        return os.path.join(f"root{chain // 12:05d}", *(f"level{level:02d}" for level in range(chain % 12 + 1)))
+    return os.path.join("DCIM", f"{100 + i // 999:03d}CANON")
+
+
+def _corpus_name(kind: str, i: int, date: datetime.datetime) -> str:
+    if kind == "named_date":
+        return f"IMG_{date:%Y%m%d_%H%M%S}_{i:07d}.jpg"
+    if kind == "raw":
+        return f"_MG_{i:07d}.CR2" if i % 2 else f"DSC_{i:07d}.NEF"
+    ext = {"jpeg_exif": ".JPG", "jpeg_plain": ".jpg", "heic": ".HEIC", "mp4_moov_start": ".mp4",
+           "mov_moov_end": ".MOV", "png": ".png"}[kind]
+    return f"IMG_{i:07d}{ext}"
+
+
+def _write_with_payload(path: str, head: bytes, size: int, tail: bytes, rng: random.Random, sparse: bool = False):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    body = max(0, size - len(head) - len(tail))
+    if sparse:
+        # Hole instead of payload: real headers and sizes, no disk space (1M-file corpora)
+        with open(path, 'wb') as f:
+            f.write(head)
+            f.seek(len(head) + body)
+            f.write(tail)
+            f.truncate(len(head) + body + len(tail))
+        return
+    # One random 64 KB block repeated: realistic sizes without paying for randomness
+    block = rng.randbytes(64 * 1024)
+    with open(path, 'wb') as f:
+        f.write(head)
+        for _ in range(body // len(block)):
+            f.write(block)
+        f.write(block[:body % len(block)])
+        f.write(tail)
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Writes a synthetic media corpus (see generate_corpus).")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--shape", choices=CORPUS_SHAPES, default="camera")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size-scale", type=float, default=0.01)
+    parser.add_argument("--sparse", action="store_true")
+    args = parser.parse_args()
+    manifest = generate_corpus(args.root, args.files, args.shape, args.seed, args.size_scale, args.sparse)
+    print(manifest, file=sys.stderr)
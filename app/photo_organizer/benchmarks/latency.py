@@ -0,0 +1,74 @@
+"""
+Latency-injecting filesystem fixture: wraps os.scandir so every directory
+listing and every first stat() of an entry costs a fixed delay, like a
+round-trip on an SMB/NFS mount. Pass SlowFS(...).scandir wherever a
+scandir callable is injectable (e.g. ParallelWalker(scandir=...)).
+"""
+import os
+import time
+import threading
+
+
+class _SlowEntry:
+    """DirEntry proxy whose first stat() pays the injected latency."""
+    __slots__ = ("_entry", "_fs", "_stat")
+
+    def __init__(self, entry: os.DirEntry, fs: "SlowFS"):
+        self._entry = entry
+        self._fs = fs
+        self._stat = None
+
+    name = property(lambda self: self._entry.name)
+    path = property(lambda self: self._entry.path)
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self) -> bool:
+        return self._entry.is_symlink()
+
+    def inode(self) -> int:
+        return self._entry.inode()
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if self._stat is None:
+            self._fs._pay(self._fs.stat_delay, "stat")
+            self._stat = self._entry.stat(follow_symlinks=follow_symlinks)
+        return self._stat
+
+
+class _SlowScandir:
+    def __init__(self, path, fs: "SlowFS"):
+        fs._pay(fs.scandir_delay, "scandir")
+        self._it = os.scandir(path)
+        self._fs = fs
+
+    def __iter__(self):
+        return (_SlowEntry(e, self._fs) for e in self._it)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+
+class SlowFS:
+    def __init__(self, scandir_delay: float = 0.005, stat_delay: float = 0.001):
+        self.scandir_delay = scandir_delay
+        self.stat_delay = stat_delay
+        self.calls = {"scandir": 0, "stat": 0}
+        self._lock = threading.Lock()
+
+    def scandir(self, path):
+        return _SlowScandir(path, self)
+
+    def _pay(self, delay: float, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+        # sleep() releases the GIL, like a blocking network syscall
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,11 @@
+import sys
+import os
+
+# Ensure the package root is in path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Headless entry point (no Qt import): python cli.py --help
+from src.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,17 @@
 import sys
 import os
+import threading
 
 # Ensure the package root is in path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.ui.main_window import MainWindow, QApplication
 from src.ui.styles import DARK_THEME
+from src.core.metadata import preload_backends
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+
+def create_window(argv):
+    app = QApplication(argv)
     
     # Apply Theme
     app.setStyle("Fusion")
@@ -23,4 +26,12 @@ if __name__ == "__main__":
     
     window = MainWindow()
     window.show()
+
+    # Metadata parsers (Pillow, exifread, hachoir) load once the window is visible
+    threading.Thread(target=preload_backends, name="PreloadBackends", daemon=True).start()
+    return app, window
+
+
+if __name__ == "__main__":
+    app, window = create_window(sys.argv)
     sys.exit(app.exec())
@@ -0,0 +1,235 @@
+"""
+Headless entry point: drives Scanner / DuplicateFinder / OrganizerEngine
+directly and never imports Qt, so it runs on servers without a display.
+
+    cd app/photo_organizer
+    python cli.py --db job.db scan /mnt/card1 /mnt/card2
+    python cli.py catalog /mnt/archive
+    python cli.py --db job.db plan /mnt/archive --mode type_date --skip-duplicates --skip-archived
+    python cli.py --db job.db execute --workers 4
+    python cli.py --db job.db verify --incremental --max-mb-per-s 200
+    python cli.py --db job.db --json stats
+
+With --json every progress update and the final result of a command is one
+JSON object per line on stdout ({"event": "progress"|"result"|"error", "command": ...}).
+Exit status: 0 ok, 1 errors reported by the command, 2 bad arguments.
+"""
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Optional
+
+from .core.scanner import Scanner
+from .core.organizer import OrganizerEngine
+from .core.dedup import DuplicateFinder
+from .core.verifier import MigrationVerifier
+from .core.archive import ArchiveMatcher
+from .core.transfer import TransferEngine
+from .core.hashing import ALGORITHMS, DEFAULT_ALGORITHM
+from .data.database import SessionDatabase
+from .data.metadata_cache import MetadataCache
+from .utils.instrumentation import metrics, start_profiler, stop_profiler
+
+
+class Reporter:
+    """Progress output: human-readable lines, or JSON lines for scripts and ingest pipelines."""
+
+    def __init__(self, command: str, as_json: bool = False):
+        self.command = command
+        self.as_json = as_json
+        self.started = time.monotonic()
+
+    def emit(self, event: str, message: str = "", **fields):
+        if self.as_json:
+            record = {"event": event, "command": self.command,
+                      "elapsed_s": round(time.monotonic() - self.started, 3)}
+            if message:
+                record["message"] = message
+            record.update(fields)
+            print(json.dumps(record), flush=True)
+        elif event == "result":
+            for key, value in fields.items():
+                print(f"{key}: {value}")
+        elif event == "error":
+            print(f"Errore: {message}", file=sys.stderr, flush=True)
+        else:
+            print(message or " ".join(f"{k}={v}" for k, v in fields.items()), flush=True)
+
+    def message(self, text: str):
+        self.emit("progress", text)
+
+    def counter(self, current: int, total: int):
+        self.emit("progress", f"{current}/{total} file" if not self.as_json else "",
+                  current=current, total=total)
+
+
+def cmd_scan(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    scanner = Scanner(db, cache=cache, max_workers=args.workers, walk_workers=args.walk_workers,
+                      use_processes=args.processes, adaptive=not args.fixed_workers)
+    for source in args.sources:
+        out.message(f"Scansione di {source}...")
+        scanner.scan_path(source, out.message)
+    db.flush()
+    return {"files_found": scanner.total_files_found, **db.get_stats()}
+
+
+def cmd_plan(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    organizer = OrganizerEngine(db, cache=cache, hash_algorithm=args.hash, max_mb_per_s=args.max_mb_per_s)
+    result = {}
+    if args.skip_duplicates:
+        out.message("Ricerca duplicati in corso...")
+        result.update(DuplicateFinder(db, organizer.transfer, max_workers=args.hash_workers).run(out.message))
+    if args.skip_archived:
+        catalog = organizer.open_catalog(args.dest, create=False)
+        if catalog:
+            out.message("Ricerca file già in archivio...")
+            result.update(ArchiveMatcher(db, catalog, organizer.transfer, max_workers=args.hash_workers).run(out.message))
+            catalog.close()
+    out.message("Calcolo destinazioni in corso...")
+    result.update(organizer.calculate_destinations(args.dest, args.mode, skip_duplicates=args.skip_duplicates,
+                                                   progress_callback=out.counter))
+    return result
+
+
+def cmd_execute(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    organizer = OrganizerEngine(db, verify_mode=args.verify_mode, transfer_workers=args.workers,
+                                cache=cache, hash_algorithm=args.hash, transfer_mode=args.transfer_mode,
+                                use_catalog=not args.no_catalog, adaptive=not args.fixed_workers,
+                                max_mb_per_s=args.max_mb_per_s)
+    organizer.execute_transfer(delete_source=args.delete_source, progress_callback=out.counter,
+                               log_callback=out.message)
+    return db.get_stats()
+
+
+def cmd_verify(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    organizer = OrganizerEngine(db, cache=cache, hash_algorithm=args.hash)
+    return organizer.verify_migration(mode=args.mode, incremental=args.incremental, sample_fraction=args.sample,
+                                      max_mb_per_s=args.max_mb_per_s, workers=args.workers,
+                                      progress_callback=out.counter, log_callback=out.message)
+
+
+def cmd_catalog(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    catalog = OrganizerEngine(db, hash_algorithm=args.hash).open_catalog(args.library)
+    if catalog is None:
+        raise OSError(f"Catalogo non disponibile in {args.library}")
+    try:
+        return ArchiveMatcher(db, catalog).index_library(args.walk_workers, out.message)
+    finally:
+        catalog.close()
+
+
+def cmd_stats(args, db: SessionDatabase, cache: Optional[MetadataCache], out: Reporter) -> Dict:
+    result = db.get_stats()
+    if args.metrics:
+        result.update(db.load_stats("metrics."))
+    return result
+
+
+COMMANDS = {
+    "scan": cmd_scan,
+    "plan": cmd_plan,
+    "execute": cmd_execute,
+    "verify": cmd_verify,
+    "catalog": cmd_catalog,
+    "stats": cmd_stats,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Organizer Foto Pro without the GUI.")
+    parser.add_argument("--db", default="session.db", help="Session DB path (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Progress and results as JSON lines on stdout")
+    parser.add_argument("--cache", default=MetadataCache.default_path(),
+                        help="Metadata cache DB path (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the metadata cache")
+    parser.add_argument("--hash", choices=ALGORITHMS, default=DEFAULT_ALGORITHM,
+                        help="Hash algorithm for duplicates and collisions (default: %(default)s)")
+    parser.add_argument("--profile", metavar="FILE", help="Write sampling profiler collapsed stacks to FILE")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="Index the source folders into the session DB")
+    scan.add_argument("sources", nargs="+")
+    scan.add_argument("--workers", type=int,
+                      help="Metadata extraction workers, the starting point when adaptive (default: CPU count)")
+    scan.add_argument("--walk-workers", type=int, default=16, help="Directory listings in flight (default: %(default)s)")
+    scan.add_argument("--processes", action="store_true", help="Extract metadata in worker processes")
+    scan.add_argument("--fixed-workers", action="store_true", help="Keep --workers fixed instead of adapting it")
+
+    plan = sub.add_parser("plan", help="Compute the destination of every scanned file")
+    plan.add_argument("dest")
+    plan.add_argument("--mode", choices=(OrganizerEngine.MODE_DATE_TREE, OrganizerEngine.MODE_TYPE_DATE),
+                      default=OrganizerEngine.MODE_DATE_TREE, help="Folder layout (default: %(default)s)")
+    plan.add_argument("--skip-duplicates", action="store_true", help="Find duplicates and leave the extra copies")
+    plan.add_argument("--skip-archived", action="store_true",
+                      help="Skip files whose content the library catalog already holds")
+    plan.add_argument("--hash-workers", type=int, default=8,
+                      help="Duplicate/archive hashing workers (default: %(default)s)")
+    plan.add_argument("--max-mb-per-s", type=float, help="Read budget for hashing (default: unlimited)")
+
+    execute = sub.add_parser("execute", help="Copy (or move) the planned files")
+    execute.add_argument("--delete-source", action="store_true", help="Remove each source once its copy is verified")
+    execute.add_argument("--workers", type=int, default=8,
+                         help="Concurrent transfers, the ceiling of the per-device limits (default: %(default)s)")
+    execute.add_argument("--fixed-workers", action="store_true",
+                         help="Keep the detected per-device limits instead of adapting them")
+    execute.add_argument("--max-mb-per-s", type=float, help="Read budget for copies and hashes (default: unlimited)")
+    execute.add_argument("--verify-mode", choices=TransferEngine.VERIFY_MODES, default=TransferEngine.VERIFY_FULL,
+                         help="Post-copy check (default: %(default)s)")
+    execute.add_argument("--transfer-mode", choices=OrganizerEngine.TRANSFER_MODES, default=OrganizerEngine.TRANSFER_AUTO,
+                         help="rename/reflink/hardlink when source and destination allow it, "
+                              "else a verified copy (default: %(default)s)")
+    execute.add_argument("--no-catalog", action="store_true", help="Do not record the archived files in the library catalog")
+
+    verify = sub.add_parser("verify", help="Re-hash the transferred files at the destination")
+    verify.add_argument("--mode", choices=MigrationVerifier.MODES, default=MigrationVerifier.MODE_FULL,
+                        help="Re-hash every file, or a random sample (default: %(default)s)")
+    verify.add_argument("--sample", type=float, default=0.05, help="Fraction of files in sample mode (default: %(default)s)")
+    verify.add_argument("--incremental", action="store_true",
+                        help="Skip files whose size and mtime did not change since their last verification")
+    verify.add_argument("--max-mb-per-s", type=float, help="Read budget across all workers (default: unlimited)")
+    verify.add_argument("--workers", type=int, default=4, help="Concurrent reads (default: %(default)s)")
+
+    catalog = sub.add_parser("catalog", help="Index a library's existing files into its catalog (stat only)")
+    catalog.add_argument("library")
+    catalog.add_argument("--walk-workers", type=int, default=16, help="Directory listings in flight (default: %(default)s)")
+
+    stats = sub.add_parser("stats", help="Print the session summary")
+    stats.add_argument("--metrics", action="store_true", help="Include the saved per-stage timings")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    out = Reporter(args.command, args.json)
+    if args.profile:
+        start_profiler()
+
+    db = SessionDatabase(args.db, write_behind=True)
+    cache = None if args.no_cache else MetadataCache(args.cache)
+    status = 0
+    try:
+        result = COMMANDS[args.command](args, db, cache, out)
+        out.emit("result", **result)
+        if result.get("errors") or result.get("missing") or result.get("corrupted"):
+            status = 1
+    except KeyboardInterrupt:
+        out.emit("error", "Interrotto")
+        status = 130
+    except Exception as e:
+        out.emit("error", str(e))
+        status = 1
+    finally:
+        db.flush()
+        if args.command != "stats":
+            db.save_stats(metrics.flat_stats(f"metrics.{args.command}."))
+        db.close()
+        if cache:
+            cache.close()
+        if args.profile:
+            stop_profiler(args.profile)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import os
+import itertools
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+from .transfer import TransferEngine
+from .hashing import stored_hash
+from .walker import ParallelWalker
+from .scanner import Scanner
+from ..data.database import SessionDatabase
+from ..data.library_catalog import LibraryCatalog
+from ..utils.instrumentation import metrics
+
+
+class ArchiveMatcher:
+    """
+    Skips files the destination library already holds, before planning:
+    1. Look the session's sizes up in the LibraryCatalog, one page at a time (no I/O)
+    2. Hash only the files whose size is in the library, on both sides
+       (library hashes are saved in the catalog, so each is read once ever)
+    3. Files whose (size, hash) is archived become 'skipped', with the archived path
+    """
+    PAGE_SIZE = 1000
+    TODO_STATUSES = ('pending', 'error')
+
+    def __init__(self, db: SessionDatabase, catalog: LibraryCatalog, transfer: Optional[TransferEngine] = None,
+                 max_workers: int = 8):
+        self.db = db
+        self.catalog = catalog
+        # Same algorithm as the transfer engine so file_hash stays reusable at copy time
+        self.transfer = transfer or TransferEngine()
+        self.max_workers = max_workers
+        self._stop_event = False
+
+    def stop(self):
+        self._stop_event = True
+
+    @metrics.timed("stage.archive_index")
+    def index_library(self, walk_workers: int = 16,
+                      progress_callback: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """Brings the catalog in line with the media files actually under the library root (stat only)."""
+        walker = ParallelWalker(Scanner.SKIP_DIRS, Scanner.SKIP_FILES, max_workers=walk_workers,
+                                file_filter=lambda name: os.path.splitext(name)[1].lower() in Scanner.MEDIA_EXTENSIONS)
+        self._stop_event = False
+        files = ((entry.path, st.st_size) for entry, st in walker.walk(self.catalog.root, lambda: self._stop_event))
+        report = self.catalog.sync(files, should_stop=lambda: self._stop_event)
+        if progress_callback:
+            progress_callback(f"Archivio: {report['files']} file indicizzati, "
+                              f"{report['added']} nuovi, {report['removed']} rimossi")
+        return report
+
+    @metrics.timed("stage.archive_match")
+    def run(self, progress_callback: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        self._stop_event = False
+        self.db.flush()
+        report = {
+            "archive_checked": 0,
+            "archive_candidates": 0,   # Same size as something in the library
+            "archive_hashed": 0,       # Files read to decide (session and library side)
+            "archived": 0,             # Marked skipped
+            "archive_stale": 0,        # Catalog entries whose file is gone
+        }
+        rows = self.db.iter_files(statuses=self.TODO_STATUSES, page_size=self.PAGE_SIZE)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while not self._stop_event:
+                page = list(itertools.islice(rows, self.PAGE_SIZE))
+                if not page:
+                    break
+                report['archive_checked'] += len(page)
+                self._match_page(pool, page, report)
+                if progress_callback:
+                    progress_callback(f"Archivio: {report['archive_checked']} file controllati, "
+                                      f"{report['archived']} già presenti")
+        self.catalog.flush()
+        return report
+
+    def _match_page(self, pool, page: List, report: Dict[str, int]):
+        entries = self.catalog.lookup_sizes({r['file_size'] for r in page})
+        candidates = [r for r in page if r['file_size'] in entries]
+        if not candidates:
+            return
+        report['archive_candidates'] += len(candidates)
+        algorithm = self.transfer.algorithm
+
+        # Both sides hashed in the same pool: session files without a hash of this
+        # algorithm, library files of a matching size never hashed with it
+        sources = {r['id']: r['source_path'] for r in candidates if not stored_hash(r, algorithm)}
+        library = {e['path'] for r in candidates for e in entries[r['file_size']]
+                   if not (e['file_hash'] and e['hash_algo'] == algorithm)}
+        jobs = [('s', key, path) for key, path in sources.items()]
+        jobs += [('l', rel, self.catalog.absolute(rel)) for rel in library]
+        hashes = dict(((side, key), h) for (side, key, _), h
+                      in zip(jobs, pool.map(lambda job: self._full_hash(job[2]), jobs)))
+        report['archive_hashed'] += len(jobs)
+
+        if sources:
+            self.db.set_file_hashes([(hashes[('s', i)], i) for i in sources if hashes[('s', i)]], algorithm)
+        self.catalog.set_hashes([(hashes[('l', rel)], algorithm, rel) for rel in library if hashes[('l', rel)]])
+        # Unreadable library files (deleted or moved by hand) drop out of the catalog
+        stale = {rel for rel in library if not hashes[('l', rel)]}
+        if stale:
+            self.catalog.remove(list(stale))
+            report['archive_stale'] += len(stale)
+
+        skipped = []
+        for r in candidates:
+            src_hash = stored_hash(r, algorithm) or hashes.get(('s', r['id']))
+            if not src_hash:
+                continue
+            for e in entries[r['file_size']]:
+                archived_hash = hashes.get(('l', e['path'])) if e['path'] in library else e['file_hash']
+                if archived_hash == src_hash and self._still_there(e):
+                    skipped.append((f"Già in archivio: {self.catalog.absolute(e['path'])}", r['id']))
+                    break
+        if skipped:
+            self.db.mark_skipped(skipped, self.TODO_STATUSES)
+            report['archived'] += len(skipped)
+
+    def _still_there(self, entry) -> bool:
+        """A catalog hit is trusted only while the archived file still has its size (one stat per match)."""
+        try:
+            return os.stat(self.catalog.absolute(entry['path'])).st_size == entry['size']
+        except OSError:
+            self.catalog.remove([entry['path']])
+            return False
+
+    def _full_hash(self, path: str) -> str:
+        try:
+            return self.transfer.hash_file(path)[0]
+        except OSError:
+            return ""
@@ -0,0 +1,118 @@
+import hashlib
+import itertools
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+from .transfer import TransferEngine
+from .hashing import stored_hash
+from ..data.database import SessionDatabase
+from ..utils.instrumentation import metrics
+
+
+class DuplicateFinder:
+    """
+    Staged content dedup between scan and plan:
+    1. Group by file_size (SQL, no I/O)
+    2. Within a size group, compare a head/middle/tail fingerprint
+    3. Fully hash only files whose fingerprint still collides
+    Full hashes go to files.file_hash, groups to the 'duplicates' table.
+    """
+    SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, db: SessionDatabase, transfer: Optional[TransferEngine] = None, max_workers: int = 8):
+        self.db = db
+        # Same algorithm as the transfer engine so file_hash stays reusable at copy time
+        self.transfer = transfer or TransferEngine()
+        self.max_workers = max_workers
+        self._stop_event = False
+
+    def stop(self):
+        self._stop_event = True
+
+    @metrics.timed("stage.dedup")
+    def run(self, progress_callback: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        self._stop_event = False
+        self.db.flush()
+        self.db.reset_duplicates()
+        report = {
+            "files": self.db.count_files(),
+            "size_candidates": 0,
+            "partial_hashed": 0,
+            "full_hashed": 0,
+            "groups": 0,
+            "duplicates": 0
+        }
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            rows = self.db.iter_size_collisions()
+            for size, group in itertools.groupby(rows, key=lambda r: r['file_size']):
+                if self._stop_event:
+                    break
+                group = list(group)
+                report['size_candidates'] += len(group)
+                self._resolve_size_group(pool, size, group, report)
+
+                if progress_callback and report['size_candidates'] % 500 < len(group):
+                    progress_callback(f"Duplicati: {report['size_candidates']} file analizzati, "
+                                      f"{report['duplicates']} duplicati")
+
+        if progress_callback:
+            progress_callback(f"Duplicati: {report['groups']} gruppi, {report['duplicates']} copie superflue, "
+                              f"{report['full_hashed']}/{report['files']} file letti per intero")
+        return report
+
+    def _resolve_size_group(self, pool, size: int, group: List, report: Dict[str, int]):
+        # Small files: the fingerprint would read them whole anyway, hash them directly
+        if size > 3 * self.SAMPLE_SIZE:
+            fingerprints = list(pool.map(lambda r: self._fingerprint(r['source_path'], size), group))
+            report['partial_hashed'] += len(group)
+            buckets: Dict[str, List] = {}
+            for row, fp in zip(group, fingerprints):
+                if fp:
+                    buckets.setdefault(fp, []).append(row)
+            candidates = [rows for rows in buckets.values() if len(rows) > 1]
+        else:
+            candidates = [group]
+
+        algorithm = self.transfer.algorithm
+        new_hashes = []
+        groups = []
+        for rows in candidates:
+            # Hashes of another algorithm (e.g. md5 from an older session) are not comparable
+            known = {r['id']: stored_hash(r, algorithm) for r in rows}
+            missing = [r for r in rows if not known[r['id']]]
+            hashes = dict(zip((r['id'] for r in missing), pool.map(self._full_hash, (r['source_path'] for r in missing))))
+            report['full_hashed'] += len(missing)
+            new_hashes.extend((h, file_id) for file_id, h in hashes.items() if h)
+
+            by_hash: Dict[str, List[int]] = {}
+            for r in rows:
+                h = known[r['id']] or hashes.get(r['id'])
+                if h:
+                    by_hash.setdefault(h, []).append(r['id'])
+            groups.extend((h, ids) for h, ids in by_hash.items() if len(ids) > 1)
+
+        if new_hashes:
+            self.db.set_file_hashes(new_hashes, algorithm)
+        if groups:
+            self.db.add_duplicate_groups(groups)
+            report['groups'] += len(groups)
+            report['duplicates'] += sum(len(ids) - 1 for _, ids in groups)
+
+    @metrics.timed("dedup.fingerprint")
+    def _fingerprint(self, path: str, size: int) -> str:
+        """blake2b of head, middle and tail samples. "" if unreadable."""
+        h = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, 'rb') as f:
+                for offset in (0, (size - self.SAMPLE_SIZE) // 2, size - self.SAMPLE_SIZE):
+                    f.seek(offset)
+                    h.update(f.read(self.SAMPLE_SIZE))
+        except OSError:
+            return ""
+        return h.hexdigest()
+
+    def _full_hash(self, path: str) -> str:
+        try:
+            return self.transfer.hash_file(path)[0]
+        except OSError:
+            return ""
@@ -0,0 +1,130 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from ..utils.instrumentation import metrics
+
+
+_SUFFIXES = re.compile(r"(_\d+)+$")
+
+
+def collision_family(path: str) -> str:
+    """
+    Key shared by every name free_name() can turn path into, and by the names
+    that can turn into it: directory + stem without its _N suffixes + extension,
+    case-folded (IMG.jpg, IMG_1.jpg, img_1_2.JPG are one family).
+    """
+    directory, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, _SUFFIXES.sub("", stem) + ext).lower()
+
+
+@dataclass
+class IndexedFile:
+    size: int
+    mtime_ns: int
+    file_hash: Optional[str] = None   # Filled the first time a collision needs it
+
+
+class DestinationIndex:
+    """
+    In-memory view of the destination tree: name -> (size, mtime, cached hash)
+    per directory, filled by one scandir the first time a directory is used
+    and updated by the engine as it writes. Collision checks, free-suffix
+    allocation and "is this the same file" hashes then cost no filesystem
+    round-trip after the first listing (a network archive otherwise pays
+    several per file), and each existing file is hashed at most once.
+
+    Entries of one directory must be changed under one lock per directory
+    (OrganizerEngine._dir_lock); the index only guards its directory table.
+    """
+
+    def __init__(self, scandir: Callable = os.scandir):
+        self.scandir = scandir   # Injectable, like ParallelWalker's
+        self._dirs: Dict[str, Optional[Dict[str, IndexedFile]]] = {}
+        self._lock = threading.Lock()
+
+    def _listing(self, directory: str) -> Dict[str, IndexedFile]:
+        with self._lock:
+            if directory in self._dirs:
+                entries = self._dirs[directory]
+                return entries if entries is not None else {}
+        entries: Optional[Dict[str, IndexedFile]] = {}
+        with metrics.timer("dest_index.scandir"):
+            try:
+                with self.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file():
+                                st = entry.stat()
+                                entries[entry.name] = IndexedFile(st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except FileNotFoundError:
+                entries = None   # Created on the first write
+            except OSError:
+                pass
+        with self._lock:
+            entries = self._dirs.setdefault(directory, entries)
+            return entries if entries is not None else {}
+
+    def directory_exists(self, directory: str) -> bool:
+        self._listing(directory)
+        with self._lock:
+            return self._dirs.get(directory) is not None
+
+    def lookup(self, path: str) -> Optional[IndexedFile]:
+        return self._listing(os.path.dirname(path)).get(os.path.basename(path))
+
+    def add(self, path: str, size: int, mtime_ns: int = 0, file_hash: Optional[str] = None):
+        """Records a file the engine created (or found while writing)."""
+        directory = os.path.dirname(path)
+        self._listing(directory)
+        with self._lock:
+            entries = self._dirs.get(directory)
+            if entries is None:
+                entries = self._dirs[directory] = {}
+        entries[os.path.basename(path)] = IndexedFile(size, mtime_ns, file_hash)
+
+    def refresh(self, path: str):
+        """Re-reads one path from disk (e.g. a file created behind the index's back)."""
+        try:
+            st = os.lstat(path)   # A dangling symlink still takes the name
+        except OSError:
+            self.remove(path)
+            return
+        self.add(path, st.st_size, st.st_mtime_ns)
+
+    def remove(self, path: str):
+        self._listing(os.path.dirname(path)).pop(os.path.basename(path), None)
+
+    def hash_of(self, path: str, hash_file: Callable[[str], Tuple[str, int]]) -> Tuple[str, int]:
+        """(hash, bytes read): computed by hash_file the first time, then served from the index."""
+        entry = self.lookup(path)
+        if entry is not None and entry.file_hash:
+            return entry.file_hash, 0
+        file_hash, n = hash_file(path)
+        if entry is not None:
+            entry.file_hash = file_hash
+        return file_hash, n
+
+    def siblings(self, path: str, size: int) -> List[str]:
+        """Other names of path's collision_family in its directory holding size bytes, in name order."""
+        directory = os.path.dirname(path)
+        family = collision_family(path)
+        return [os.path.join(directory, name) for name, entry in sorted(self._listing(directory).items())
+                if entry.size == size and name != os.path.basename(path)
+                and collision_family(os.path.join(directory, name)) == family]
+
+    def free_name(self, path: str) -> str:
+        """path, or the first name_N.ext not taken in its directory."""
+        entries = self._listing(os.path.dirname(path))
+        name = os.path.basename(path)
+        if name not in entries:
+            return path
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        while f"{stem}_{counter}{ext}" in entries:
+            counter += 1
+        return os.path.join(os.path.dirname(path), f"{stem}_{counter}{ext}")
@@ -0,0 +1,128 @@
+"""
+Header-only EXIF date reader for JPEG and TIFF-based files (TIFF, CR2, NEF, ARW...).
+Walks the JPEG segment list up to APP1, or the TIFF IFD chain, through an mmap,
+so only the pages holding the header and the date strings are ever read.
+"""
+import mmap
+import struct
+import datetime
+from typing import Optional
+
+# TIFF tags
+TAG_DATETIME = 0x0132            # IFD0 "Image DateTime" (last modification)
+TAG_EXIF_IFD = 0x8769            # Pointer to the Exif sub-IFD
+TAG_DATETIME_ORIGINAL = 0x9003   # Exif "DateTimeOriginal"
+TAG_DATETIME_DIGITIZED = 0x9004  # Exif "DateTimeDigitized"
+
+TYPE_ASCII = 2
+MAX_IFD_ENTRIES = 1000   # Corrupt headers must not make us walk megabytes
+
+
+def read_exif_date(file_path: str) -> Optional[datetime.datetime]:
+    """DateTimeOriginal > DateTimeDigitized > DateTime, or None if absent or not JPEG/TIFF."""
+    try:
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    # No readahead: a fault on a 25 MB RAW must not pull in megabytes of sensor data
+                    mm.madvise(mmap.MADV_RANDOM)
+                return exif_date_from_buffer(mm)
+    except (OSError, ValueError):   # ValueError: empty file cannot be mapped
+        return None
+
+
+def exif_date_from_buffer(buf, partial: bool = False) -> Optional[datetime.datetime]:
+    """
+    Same as read_exif_date on any sliceable buffer (bytes, memoryview, mmap).
+    With partial=True buf is only the start of the file: a read past its end raises
+    EOFError instead of returning None, so the caller can retry on the whole file.
+    """
+    try:
+        if buf[:2] == b'\xff\xd8':
+            tiff = _find_jpeg_tiff(buf)
+            if tiff is None:
+                return None
+        elif buf[:4] in (b'II*\x00', b'MM\x00*'):
+            tiff = 0
+        else:
+            return None
+        return _date_from_tiff(buf, tiff)
+    except (struct.error, IndexError) as e:
+        if partial:
+            raise EOFError("EXIF header extends past the buffer") from e
+        return None
+    except ValueError:
+        return None
+
+
+def _find_jpeg_tiff(buf) -> Optional[int]:
+    """Offset of the TIFF header inside the Exif APP1 segment."""
+    pos = 2
+    size = len(buf)
+    while pos + 4 <= size:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:          # Fill byte
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / start of scan: no more metadata
+            return None
+        length = struct.unpack_from('>H', buf, pos + 2)[0]
+        if marker == 0xE1 and buf[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return pos + 10
+        pos += 2 + length
+    raise IndexError("segment list runs past the buffer")
+
+
+def _date_from_tiff(buf, tiff: int) -> Optional[datetime.datetime]:
+    endian = '<' if buf[tiff:tiff + 2] == b'II' else '>'
+    ifd0 = struct.unpack_from(endian + 'I', buf, tiff + 4)[0]
+
+    tags = _read_ifd(buf, tiff, ifd0, endian, (TAG_DATETIME, TAG_EXIF_IFD))
+    found = {}
+    if TAG_EXIF_IFD in tags:
+        found = _read_ifd(buf, tiff, tags[TAG_EXIF_IFD], endian,
+                          (TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED))
+
+    for tag, source in ((TAG_DATETIME_ORIGINAL, found), (TAG_DATETIME_DIGITIZED, found), (TAG_DATETIME, tags)):
+        if tag in source:
+            date = _parse_date(source[tag])
+            if date:
+                return date
+    return None
+
+
+def _read_ifd(buf, tiff: int, offset: int, endian: str, wanted) -> dict:
+    """Returns {tag: value} for the wanted tags of one IFD (ASCII as bytes, LONG as int)."""
+    pos = tiff + offset
+    count = struct.unpack_from(endian + 'H', buf, pos)[0]
+    result = {}
+    for i in range(min(count, MAX_IFD_ENTRIES)):
+        entry = pos + 2 + i * 12
+        tag, typ, n = struct.unpack_from(endian + 'HHI', buf, entry)
+        if tag not in wanted:
+            continue
+        if typ == TYPE_ASCII:
+            if n <= 4:
+                start = entry + 8
+            else:
+                start = tiff + struct.unpack_from(endian + 'I', buf, entry + 8)[0]
+            if start + n > len(buf):
+                raise IndexError("tag value past the buffer")
+            result[tag] = bytes(buf[start:start + n])
+        else:
+            result[tag] = struct.unpack_from(endian + 'I', buf, entry + 8)[0]
+        if len(result) == len(wanted):
+            break
+    return result
+
+
+def _parse_date(raw) -> Optional[datetime.datetime]:
+    if not isinstance(raw, bytes):
+        return None
+    text = raw.split(b'\x00', 1)[0].strip().decode('ascii', 'ignore')
+    try:
+        return datetime.datetime.strptime(text[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None   # "0000:00:00 00:00:00" and other placeholders
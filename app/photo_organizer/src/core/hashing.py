@@ -0,0 +1,120 @@
+"""
+File hashing with selectable algorithms.
+Hashes are always stored next to the name of the algorithm that produced them
+(files.hash_algo, metadata cache), so hashes from older sessions are only
+compared with hashes of the same kind.
+"""
+import os
+import mmap
+import hashlib
+import threading
+from typing import Optional, Tuple
+from ..utils.instrumentation import metrics
+
+# md5 stays available to compare with sessions that only stored md5 hashes.
+# sha256 is the default: OpenSSL runs it on the SHA extensions of current x86/ARM CPUs
+# (about 2x md5 and blake2b), and without them it is still on par with md5.
+# python -m benchmarks.bench_hash shows the numbers for the machine at hand.
+ALGORITHMS = ('md5', 'sha1', 'sha256', 'blake2b', 'blake2s')
+DEFAULT_ALGORITHM = 'sha256'
+# Hashes stored before the algorithm was recorded (hash_algo NULL) are md5
+LEGACY_ALGORITHM = 'md5'
+
+METHOD_AUTO = 'auto'                 # readinto, mmap from MMAP_THRESHOLD up
+METHOD_READINTO = 'readinto'         # One reusable buffer per thread
+METHOD_FILE_DIGEST = 'file_digest'   # hashlib.file_digest (Python 3.11+)
+METHOD_MMAP = 'mmap'
+METHODS = (METHOD_AUTO, METHOD_READINTO, METHOD_FILE_DIGEST, METHOD_MMAP)
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+def new_hasher(algorithm: str = DEFAULT_ALGORITHM):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+    return hashlib.new(algorithm)
+
+
+def stored_hash(row, algorithm: str) -> Optional[str]:
+    """A row's file_hash if it was computed with algorithm, else None (must be recomputed)."""
+    file_hash = row['file_hash']
+    if not file_hash:
+        return None
+    return file_hash if (row['hash_algo'] or LEGACY_ALGORITHM) == algorithm else None
+
+
+class FileHasher:
+    """
+    Hashes whole files. hash_file is thread-safe: each thread reuses its own
+    buffer, so a 4 GB video costs ~4000 readinto calls and no per-chunk bytes objects.
+    """
+
+    def __init__(self, algorithm: str = DEFAULT_ALGORITHM, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 method: str = METHOD_AUTO, mmap_threshold: int = MMAP_THRESHOLD):
+        new_hasher(algorithm)   # Validate early
+        if method not in METHODS:
+            raise ValueError(f"Unknown hash method: {method}")
+        self.algorithm = algorithm
+        self.buffer_size = buffer_size
+        self.method = method
+        self.mmap_threshold = mmap_threshold
+        self._local = threading.local()
+
+    def new(self):
+        return hashlib.new(self.algorithm)
+
+    def hash_file(self, file_path: str) -> Tuple[str, int]:
+        """Returns (hexdigest, bytes_read)."""
+        with metrics.timer(f"hash.{self.algorithm}"):
+            digest, total = self._hash_path(file_path)
+        metrics.count("hash.bytes", total)
+        return digest, total
+
+    def _hash_path(self, file_path: str) -> Tuple[str, int]:
+        with open(file_path, 'rb', buffering=0) as f:
+            method = self.method
+            if method == METHOD_AUTO:
+                method = METHOD_MMAP if os.fstat(f.fileno()).st_size >= self.mmap_threshold else METHOD_READINTO
+            if method == METHOD_MMAP:
+                result = self._hash_mmap(f)
+                if result:
+                    return result
+            elif method == METHOD_FILE_DIGEST and hasattr(hashlib, 'file_digest'):
+                digest = hashlib.file_digest(f, self.new)
+                return digest.hexdigest(), f.tell()
+            return self._hash_readinto(f)
+
+    def _buffer(self) -> bytearray:
+        buf = getattr(self._local, 'buf', None)
+        if buf is None or len(buf) != self.buffer_size:
+            buf = self._local.buf = bytearray(self.buffer_size)
+        return buf
+
+    def _hash_readinto(self, f) -> Tuple[str, int]:
+        hasher = self.new()
+        buf = self._buffer()
+        total = 0
+        with memoryview(buf) as view:
+            while n := f.readinto(buf):
+                hasher.update(view[:n])
+                total += n
+        return hasher.hexdigest(), total
+
+    def _hash_mmap(self, f) -> Optional[Tuple[str, int]]:
+        """Hashes straight from the page cache, no copy into Python. None if the file cannot be mapped."""
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, OverflowError):   # Empty file, 32-bit address space, special files
+            return None
+        with mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            hasher = self.new()
+            # Large slices: hashlib drops the GIL while it digests each one
+            step = self.buffer_size * 16
+            with memoryview(mm) as view:
+                for offset in range(0, len(mm), step):
+                    with view[offset:offset + step] as chunk:
+                        hasher.update(chunk)
+            return hasher.hexdigest(), len(mm)
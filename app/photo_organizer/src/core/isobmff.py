@@ -0,0 +1,200 @@
+"""
+Seek-based ISOBMFF reader (MP4, MOV, 3GP, M4V, HEIC/HEIF/AVIF).
+Only box headers are read while walking, so reaching a 'moov' stored after a
+multi-GB 'mdat' costs one small read per top-level box.
+"""
+import struct
+import datetime
+from typing import BinaryIO, Iterator, Optional, Tuple
+from .exif_fast import exif_date_from_buffer
+
+# ISOBMFF timestamps count seconds since 1904-01-01 (UTC)
+EPOCH_1904 = datetime.datetime(1904, 1, 1)
+
+MAX_META_SIZE = 4 * 1024 * 1024    # HEIC 'meta' is a few KB; refuse to slurp garbage
+MAX_EXIF_ITEM_SIZE = 1024 * 1024
+
+
+def read_movie_date(file_path: str) -> Optional[datetime.datetime]:
+    """creation_time of moov/mvhd (naive UTC), or None if absent/zero."""
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            return movie_date_from_file(f)
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def read_heif_date(file_path: str) -> Optional[datetime.datetime]:
+    """EXIF date of the HEIC/HEIF 'Exif' item, located through meta/iinf + meta/iloc."""
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            return heif_date_from_file(f)
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def movie_date_from_file(f: BinaryIO) -> Optional[datetime.datetime]:
+    for box, start, end in _iter_boxes(f, 0, None):
+        if box == b'moov':
+            for child, c_start, c_end in _iter_boxes(f, start, end):
+                if child == b'mvhd':
+                    f.seek(c_start)
+                    head = f.read(12)
+                    if len(head) < 8:
+                        return None
+                    version = head[0]
+                    created = struct.unpack('>Q', head[4:12])[0] if version == 1 else struct.unpack('>I', head[4:8])[0]
+                    if not created:
+                        return None   # Many encoders leave it at 0
+                    try:
+                        return EPOCH_1904 + datetime.timedelta(seconds=created)
+                    except OverflowError:
+                        return None   # Corrupt 64-bit value (past year 9999): fall back to other sources
+            return None
+    return None
+
+
+def heif_date_from_file(f: BinaryIO) -> Optional[datetime.datetime]:
+    for box, start, end in _iter_boxes(f, 0, None):
+        if box == b'meta':
+            if end - start > MAX_META_SIZE:
+                return None
+            f.seek(start)
+            meta = f.read(end - start)
+            location = _exif_item_location(meta)
+            if location is None:
+                return None
+            offset, length = location
+            f.seek(offset)
+            item = f.read(min(length, MAX_EXIF_ITEM_SIZE))
+            # Exif item = 4-byte offset to the TIFF header, then (usually "Exif\0\0" +) TIFF
+            tiff_offset = struct.unpack('>I', item[:4])[0]
+            return exif_date_from_buffer(item[4 + tiff_offset:])
+    return None
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: Optional[int]) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (type, payload_start, box_end) for the boxes in [start, end), reading headers only."""
+    pos = start
+    while end is None or pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, box = struct.unpack('>I4s', header[:8])
+        payload = pos + 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack('>Q', header[8:16])[0]
+            payload = pos + 16
+        elif size == 0:
+            # Box runs to the end of the file / parent
+            if end is None:
+                f.seek(0, 2)
+                size = f.tell() - pos
+            else:
+                size = end - pos
+        if size < payload - pos:
+            return   # Corrupt
+        yield box, payload, pos + size
+        pos += size
+
+
+def _sub_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """In-memory variant of _iter_boxes for the small 'meta' box."""
+    pos = start
+    while pos + 8 <= end:
+        size, box = struct.unpack_from('>I4s', data, pos)
+        payload = pos + 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            payload = pos + 16
+        elif size == 0:
+            size = end - pos
+        if size < payload - pos:
+            return
+        yield box, payload, min(pos + size, end)
+        pos += size
+
+
+def _exif_item_location(meta: bytes) -> Optional[Tuple[int, int]]:
+    """(file_offset, length) of the Exif item described by a 'meta' payload."""
+    exif_id = None
+    iloc = None
+    # 'meta' is a FullBox: skip version + flags
+    for box, start, end in _sub_boxes(meta, 4, len(meta)):
+        if box == b'iinf':
+            exif_id = _find_exif_item_id(meta, start, end)
+        elif box == b'iloc':
+            iloc = (start, end)
+    if exif_id is None or iloc is None:
+        return None
+    return _find_item_extent(meta, iloc[0], exif_id)
+
+
+def _find_exif_item_id(data: bytes, start: int, end: int) -> Optional[int]:
+    version = data[start]
+    pos = start + 4
+    if version == 0:
+        pos += 2
+    else:
+        pos += 4
+    for box, b_start, b_end in _sub_boxes(data, pos, end):
+        if box != b'infe':
+            continue
+        infe_version = data[b_start]
+        if infe_version < 2:
+            continue
+        p = b_start + 4
+        if infe_version == 2:
+            item_id = struct.unpack_from('>H', data, p)[0]
+            p += 2
+        else:
+            item_id = struct.unpack_from('>I', data, p)[0]
+            p += 4
+        p += 2   # item_protection_index
+        if data[p:p + 4] == b'Exif':
+            return item_id
+    return None
+
+
+def _find_item_extent(data: bytes, start: int, wanted_id: int) -> Optional[Tuple[int, int]]:
+    version = data[start]
+    pos = start + 4
+    sizes = data[pos]
+    offset_size, length_size = sizes >> 4, sizes & 0x0F
+    sizes2 = data[pos + 1]
+    base_offset_size = sizes2 >> 4
+    index_size = sizes2 & 0x0F if version in (1, 2) else 0
+    pos += 2
+    if version < 2:
+        count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+    else:
+        count = struct.unpack_from('>I', data, pos)[0]
+        pos += 4
+
+    def read_uint(n: int) -> int:
+        nonlocal pos
+        value = int.from_bytes(data[pos:pos + n], 'big') if n else 0
+        pos += n
+        return value
+
+    for _ in range(count):
+        item_id = read_uint(2 if version < 2 else 4)
+        method = read_uint(2) & 0x0F if version in (1, 2) else 0
+        read_uint(2)   # data_reference_index
+        base = read_uint(base_offset_size)
+        extents = read_uint(2)
+        first = None
+        for _ in range(extents):
+            read_uint(index_size)
+            offset = read_uint(offset_size)
+            length = read_uint(length_size)
+            if first is None:
+                first = (base + offset, length)
+        if item_id == wanted_id:
+            # Only plain file offsets (construction_method 0) are supported
+            return first if method == 0 else None
+    return None
@@ -1,14 +1,40 @@
 import os
 import re
+import time
 import datetime
 import mimetypes
-import hashlib
-from typing import Tuple, Optional
-from PIL import Image
-from PIL.ExifTags import TAGS
-import exifread
-import hachoir.parser
-import hachoir.metadata
+import struct
+import importlib
+from types import ModuleType
+from typing import Dict, List, Tuple, Optional
+from .exif_fast import exif_date_from_buffer
+from .isobmff import movie_date_from_file, heif_date_from_file
+from .hashing import FileHasher, LEGACY_ALGORITHM, DEFAULT_BUFFER_SIZE
+from .probe import FileProbe, KIND_JPEG, KIND_TIFF, KIND_HEIF, KIND_MOVIE
+from ..utils.instrumentation import metrics
+
+# Fallback parsers, imported on first use: together they cost ~170 ms of start-up
+# (hachoir.parser alone ~100 ms) and most files are dated by the fast paths above
+# without ever reaching them. The GUI and the CLI start without loading them.
+BACKENDS = ("exifread", "PIL.Image", "hachoir.parser", "hachoir.metadata")
+_backends: Dict[str, ModuleType] = {}
+
+
+def _backend(name: str) -> ModuleType:
+    module = _backends.get(name)
+    if module is None:
+        # import_module is thread-safe: extractor threads racing here get the same module
+        module = _backends[name] = importlib.import_module(name)
+    return module
+
+
+def preload_backends():
+    """Imports the fallback parsers ahead of the first scan, e.g. from a background thread once the window is up."""
+    for name in BACKENDS:
+        try:
+            _backend(name)
+        except ImportError as e:
+            print(f"Metadata backend {name} unavailable: {e}")
 
 class MetadataExtractor:
     
@@ -22,15 +48,15 @@ class MetadataExtractor:
         r'Screenshot[-_](?P<year>20\d{2})(?P<month>\d{2})(?P<day>\d{2})' # Screenshot_YYYYMMDD
     ]
 
+    # ISOBMFF containers: dates come from box headers (moov/mvhd, HEIF meta/Exif)
+    ISOBMFF_VIDEO_EXTENSIONS = {'.mp4', '.mov', '.m4v', '.3gp'}
+    HEIF_EXTENSIONS = {'.heic', '.heif', '.avif'}
+
     @staticmethod
-    def calculate_hash(file_path: str, algorithm: str = 'md5', chunk_size: int = 8192) -> str:
-        """Calculates file hash efficiently."""
-        hasher = hashlib.new(algorithm)
+    def calculate_hash(file_path: str, algorithm: str = LEGACY_ALGORITHM, chunk_size: int = DEFAULT_BUFFER_SIZE) -> str:
+        """Calculates file hash efficiently (see core.hashing). "" if unreadable."""
         try:
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(chunk_size):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            return FileHasher(algorithm, buffer_size=chunk_size).hash_file(file_path)[0]
         except OSError:
             return ""
 
@@ -45,17 +71,38 @@ class MetadataExtractor:
         Returns (best_guess_date, source_of_date)
         Priority: EXIF > Metadata (Video) > Filename > OS Stat
         """
-        mime = cls.get_mime_type(file_path)
-        
+        _, date, source = cls.extract(file_path)
+        return date, source
+
+    @classmethod
+    def extract(cls, file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, datetime.datetime, str]:
+        """
+        Returns (mime_type, best_guess_date, source_of_date) from a single FileProbe:
+        one open and one header read in the common case. st (e.g. from the walker)
+        saves the stat of the filesystem fallback.
+        """
+        start = time.perf_counter()
+        with FileProbe(file_path, st) as probe:
+            date, source = cls._get_date(probe)
+        # Per date source: EXIF hits and filesystem fallbacks have very different costs
+        metrics.observe(f"metadata.get_date.{source}", time.perf_counter() - start)
+        return probe.mime, date, source
+
+    @classmethod
+    def _get_date(cls, probe: FileProbe) -> Tuple[datetime.datetime, str]:
+        file_path = probe.path
+        mime = probe.mime
+        ext = os.path.splitext(file_path)[1].lower()
+
         # 1. Try EXIF for Images
         if mime.startswith('image'):
-            date = cls._get_exif_date(file_path)
+            date = cls._get_exif_date(probe, ext)
             if date:
                 return date, "EXIF"
 
-        # 2. Try Hachoir for Videos
-        if mime.startswith('video'):
-            date = cls._get_video_date(file_path)
+        # 2. Try container metadata for Videos (.3gp is guessed as audio/3gpp)
+        if mime.startswith('video') or ext in cls.ISOBMFF_VIDEO_EXTENSIONS:
+            date = cls._get_video_date(probe)
             if date:
                 return date, "VideoMetadata"
 
@@ -66,7 +113,7 @@ class MetadataExtractor:
 
         # 4. Fallback to OS File Stats
         try:
-            stat = os.stat(file_path)
+            stat = probe.stat() or os.stat(file_path)
             # Use the earliest of mtime or ctime
             timestamp = min(stat.st_mtime, stat.st_ctime)
             return datetime.datetime.fromtimestamp(timestamp), "FileSystem"
@@ -75,12 +122,40 @@ class MetadataExtractor:
             # We return now but log it as 'Unknown' essentially
             return datetime.datetime.now(), "Unknown"
 
+    @classmethod
+    def _get_exif_date(cls, probe: FileProbe, ext: str) -> Optional[datetime.datetime]:
+        if not probe.ok:
+            return None   # Unreadable: the libraries would fail the same way
+        if probe.kind in (KIND_JPEG, KIND_TIFF):
+            # Fast path: JPEG APP1 / TIFF IFDs straight from the header buffer
+            try:
+                return exif_date_from_buffer(probe.header, partial=not probe.whole_file_read)
+            except EOFError:
+                pass
+            # IFDs or date strings beyond the header (some RAW layouts): map the same descriptor
+            try:
+                with probe.map() as mm:
+                    return exif_date_from_buffer(mm)
+            except (OSError, ValueError):
+                return None
+        if probe.kind == KIND_HEIF or (probe.kind is None and ext in cls.HEIF_EXTENSIONS):
+            try:
+                date = heif_date_from_file(probe.reader())
+            except (OSError, struct.error, ValueError):
+                date = None
+            if date:
+                return date
+        # PNG/WebP/GIF, HEIF items we cannot locate: the libraries open the file by path
+        FileProbe.add_totals({'fallback_opens': 1})
+        with metrics.timer("metadata.exif_libs"):
+            return cls._get_exif_date_libs(probe.path)
+
     @staticmethod
-    def _get_exif_date(file_path: str) -> Optional[datetime.datetime]:
+    def _get_exif_date_libs(file_path: str) -> Optional[datetime.datetime]:
         try:
             # Try with ExifRead first (often faster/more robust for just tags)
             with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=False, stop_tag='DateTimeOriginal')
+                tags = _backend('exifread').process_file(f, details=False, stop_tag='DateTimeOriginal')
                 
             date_str = None
             if 'EXIF DateTimeOriginal' in tags:
@@ -98,7 +173,7 @@ class MetadataExtractor:
             
         # Fallback to Pillow
         try:
-            img = Image.open(file_path)
+            img = _backend('PIL.Image').open(file_path)
             exif_data = img._getexif()
             if exif_data:
                 # 36867 is DateTimeOriginal
@@ -110,18 +185,39 @@ class MetadataExtractor:
             
         return None
 
+    @classmethod
+    def _get_video_date(cls, probe: FileProbe) -> Optional[datetime.datetime]:
+        if not probe.ok:
+            return None
+        # Fast path: jump to moov/mvhd, wherever moov sits in the file. Its answer is
+        # final (hachoir reads the same mvhd field); only a parse error falls back
+        if probe.kind == KIND_MOVIE:
+            try:
+                return movie_date_from_file(probe.reader())
+            except (OSError, struct.error, ValueError):
+                pass
+        file_path = probe.path
+        FileProbe.add_totals({'fallback_opens': 1})
+
+        # Fallback: full hachoir parser
+        with metrics.timer("metadata.hachoir"):
+            return cls._get_hachoir_date(file_path)
+
     @staticmethod
-    def _get_video_date(file_path: str) -> Optional[datetime.datetime]:
+    def _get_hachoir_date(file_path: str) -> Optional[datetime.datetime]:
         try:
-            parser = hachoir.parser.createParser(file_path)
+            parser = _backend('hachoir.parser').createParser(file_path)
             if not parser:
                 return None
             
             with parser:
-                metadata = hachoir.metadata.extractMetadata(parser)
+                metadata = _backend('hachoir.metadata').extractMetadata(parser)
             
             if metadata and metadata.has('creation_date'):
-                return metadata.get('creation_date')
+                date = metadata.get('creation_date')
+                # A zero mvhd timestamp decodes to the 1904 epoch: not a real date
+                if date.year > 1904:
+                    return date
         except Exception:
             pass
         return None
@@ -141,3 +237,25 @@ class MetadataExtractor:
                 except (ValueError, KeyError):
                     continue
         return None
+
+
+def extract_batch(items: List[Tuple[str, int, float, float]]) -> Tuple[List[Tuple[str, Optional[str], Optional[str]]], Dict[str, int], Dict]:
+    """
+    Process-pool entry point. Takes (path, size, mtime, ctime) items and returns
+    ([(mime_type, date_iso, date_source), ...] in the same order, FileProbe syscall counts,
+    instrumentation of the batch for metrics.merge).
+    Plain tuples keep the pickled payload per file small.
+    """
+    FileProbe.reset_totals()
+    metrics.reset()
+    rows = []
+    for path, size, mtime, ctime in items:
+        # Just the fields FileProbe and the filesystem-date fallback read
+        st = os.stat_result((0, 0, 0, 0, 0, 0, size, 0, mtime, ctime))
+        try:
+            mime, date, source = MetadataExtractor.extract(path, st)
+            rows.append((mime, date.isoformat(), source))
+        except Exception as e:
+            print(f"Scan error on {path}: {e}")
+            rows.append((MetadataExtractor.get_mime_type(path), None, None))
+    return rows, FileProbe.totals(), metrics.export()
@@ -1,185 +1,434 @@
 import os
-import shutil
+import sqlite3
 import datetime
 import logging
+import threading
 from pathlib import Path
-from typing import Callable, Optional
-from .metadata import MetadataExtractor
+from typing import Callable, Dict, List, Optional
+from .transfer import TransferEngine
+from .hashing import stored_hash, DEFAULT_ALGORITHM
+from .scheduler import TransferScheduler
+from .dest_index import DestinationIndex, collision_family
+from .verifier import MigrationVerifier
 from ..data.database import SessionDatabase
+from ..data.metadata_cache import MetadataCache
+from ..data.library_catalog import LibraryCatalog
+from ..utils.instrumentation import metrics
+from ..utils.ratelimit import TokenBucket
 
 class OrganizerEngine:
     MODE_DATE_TREE = "date_tree"     # YYYY/MM/DD/file.jpg
     MODE_TYPE_DATE = "type_date"     # Photos/YYYY/MM/file.jpg
+    # Names found taken on disk but missing from the DestinationIndex, per file, before giving up
+    MAX_RESERVE_ATTEMPTS = 100
+
+    # How a file reaches its destination; every mode falls back to a verified copy
+    TRANSFER_AUTO = "auto"   # rename for moves on one device, else reflink where the filesystem can
+    TRANSFER_MODES = (TRANSFER_AUTO,) + TransferEngine.METHODS
     
-    def __init__(self, db: SessionDatabase):
+    def __init__(self, db: SessionDatabase, verify_mode: str = TransferEngine.VERIFY_FULL,
+                 transfer_workers: int = 8, cache: Optional[MetadataCache] = None,
+                 hash_algorithm: str = DEFAULT_ALGORITHM, transfer_mode: str = TRANSFER_AUTO,
+                 use_catalog: bool = True, adaptive: bool = True, max_mb_per_s: Optional[float] = None):
+        """
+        use_catalog: record every archived file in the library's LibraryCatalog.
+        adaptive: per-device transfer slots tuned at run time (TransferScheduler).
+        max_mb_per_s: cap on what the engine reads (copies, hashes), so a background import leaves the disks usable.
+        """
+        if transfer_mode not in self.TRANSFER_MODES:
+            raise ValueError(f"Unknown transfer mode: {transfer_mode}")
         self.db = db
+        self.cache = cache
+        self.transfer_mode = transfer_mode
+        self.use_catalog = use_catalog
+        self.catalog: Optional[LibraryCatalog] = None
+        rate_limit = TokenBucket(max_mb_per_s * 1024 * 1024) if max_mb_per_s else None
+        self.transfer = TransferEngine(verify_mode=verify_mode, algorithm=hash_algorithm, rate_limit=rate_limit)
+        self.scheduler = TransferScheduler(max_workers=transfer_workers, adaptive=adaptive)
+        self.dest_index = DestinationIndex()
+        self._dir_locks: Dict[str, threading.Lock] = {}
+        self._dir_locks_guard = threading.Lock()
+        self.verifier: Optional[MigrationVerifier] = None
         self._stop_event = False
         self.logger = logging.getLogger("Organizer")
 
     def stop(self):
         self._stop_event = True
+        if self.verifier:
+            self.verifier.stop()
 
-    def calculate_destinations(self, base_dest_path: str, mode: str = MODE_DATE_TREE):
-        """Populates the 'dest_path' column in DB for all files."""
-        files = self.db.get_all_files()
-        
-        for row in files:
-            if self._stop_event: break
-            
-            source_path = row['source_path']
-            date_str = row['date_taken']
-            mime = row['mime_type']
-            filename = row['file_name']
-            
-            # Parse date
-            try:
-                dt = datetime.datetime.fromisoformat(date_str)
-            except (ValueError, TypeError):
-                dt = datetime.datetime.now() # Should not happen if scanner works
-            
-            # Build sub-path
-            year = dt.strftime("%Y")
-            month = dt.strftime("%m")
-            day = dt.strftime("%d")
-            
-            if mode == self.MODE_TYPE_DATE:
-                type_folder = "Video" if mime.startswith("video") else "Foto"
-                # Photos/2023/08/img.jpg
-                rel_path = os.path.join(type_folder, year, month, filename)
-            else:
-                # 2023/08/15/img.jpg
-                rel_path = os.path.join(year, month, day, filename)
-                
-            full_dest = os.path.join(base_dest_path, rel_path)
-            
-            # Check for collisions (in DB first, then FS)
-            # Note: real collision check happens at execution time for FS
-            # But here we might want to check if multiple source files map to same dest
-            # For now, simple mapping.
-            
-            self.db.set_destination(source_path, full_dest)
+    @metrics.timed("stage.plan")
+    def calculate_destinations(self, base_dest_path: str, mode: str = MODE_DATE_TREE, skip_duplicates: bool = False,
+                               progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        Populates the 'dest_path' column in DB for all files, in one transaction.
+        Paths are computed by SQLite in id-range batches (no per-row Python work);
+        sources that would land on the same path are then given _1, _2... suffixes
+        deterministically (id order), so execution never has to discover them.
+        skip_duplicates: uses the groups found by DuplicateFinder, only the first copy is planned.
+        """
+        self._plan_hashes: List[tuple] = []
+        if skip_duplicates:
+            self.db.flush()
+            self.db.skip_duplicates()
+        # Execution (possibly another process) adds what it archives to this library's catalog
+        self.db.set_setting("library_root", os.path.abspath(base_dest_path))
+
+        expression, params = self._dest_expression(base_dest_path, mode)
+        report = self.db.plan_destinations(expression, params, self._resolve_plan_conflicts,
+                                           exclude_statuses=('skipped',), progress_callback=progress_callback,
+                                           should_stop=lambda: self._stop_event)
+        # Hashes read to tell in-plan conflicts apart: kept for dedup, collisions and zero-copy
+        if self._plan_hashes:
+            self.db.set_file_hashes(self._plan_hashes, self.transfer.algorithm)
+        report["plan_hashed"] = len(self._plan_hashes)
+        return report
 
-    def execute_transfer(self, delete_source: bool = False, progress_callback: Optional[Callable[[int, int], None]] = None):
+    def _dest_expression(self, base_dest_path: str, mode: str) -> tuple[str, list]:
+        """SQL expression (and its parameters) of a row's destination for the given mode."""
+        # date_taken is ISO 8601 (YYYY-MM-DDTHH:MM:SS); anything else is planned on today's date
+        now = datetime.datetime.now()
+        is_iso = "date_taken GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+        year = f"(CASE WHEN {is_iso} THEN substr(date_taken, 1, 4) ELSE ? END)"
+        month = f"(CASE WHEN {is_iso} THEN substr(date_taken, 6, 2) ELSE ? END)"
+        day = f"(CASE WHEN {is_iso} THEN substr(date_taken, 9, 2) ELSE ? END)"
+        if mode == self.MODE_TYPE_DATE:
+            # Photos/2023/08/img.jpg
+            type_folder = "(CASE WHEN mime_type LIKE 'video%' THEN 'Video' ELSE 'Foto' END)"
+            parts = [(type_folder, []), (year, [now.strftime("%Y")]), (month, [now.strftime("%m")])]
+        else:
+            # 2023/08/15/img.jpg
+            parts = [(year, [now.strftime("%Y")]), (month, [now.strftime("%m")]), (day, [now.strftime("%d")])]
+
+        # base/ || part || / || part ... || / || file_name, separators bound as parameters
+        sql, params = ["?"], [os.path.join(base_dest_path, "")]   # Exactly one trailing separator
+        for i, (part, part_params) in enumerate(parts):
+            if i:
+                sql.append("?")
+                params.append(os.sep)
+            sql.append(part)
+            params.extend(part_params)
+        sql += ["?", "file_name"]
+        params.append(os.sep)
+        return " || ".join(sql), params
+
+    def _resolve_plan_conflicts(self, rows, is_taken: Callable[[str], bool]) -> List[tuple]:
+        """
+        rows share one dest_path (id order). The first keeps it; a later row with
+        the same content (equal size and hash) shares that row's path, any other
+        content gets the first free name_N.ext. Same-sized rows without a hash are
+        hashed here (only those: a size no other row of the group has is distinct
+        content anyway), so distinct contents never share a name. Execution then
+        finds the shared copies identical, at the planned name or at the sibling
+        the first one was renamed to. Returns [(new_dest_path, id), ...].
+        """
+        base, ext = os.path.splitext(rows[0]['dest_path'])
+        algorithm = self.transfer.algorithm
+        sizes: Dict[int, int] = {}
+        for row in rows:
+            sizes[row['file_size']] = sizes.get(row['file_size'], 0) + 1
+        hashes = {}
+        for row in rows:
+            file_hash = stored_hash(row, algorithm)
+            if not file_hash and sizes[row['file_size']] > 1:
+                try:
+                    file_hash = self.transfer.hash_file(row['source_path'])[0]
+                    self._plan_hashes.append((file_hash, row['id']))
+                except OSError:
+                    pass   # Unreadable now: shares the path, execution decides (or fails) on it
+            hashes[row['id']] = file_hash
+
+        placed: Dict[int, List[list]] = {}   # size -> [[dest_path, known hash or None]] per distinct content
+        moves = []
+        counter = 1
+        for row in rows:
+            size, file_hash = row['file_size'], hashes[row['id']]
+            slot = next((slot for slot in placed.get(size, ())
+                         if not file_hash or not slot[1] or slot[1] == file_hash), None)
+            if slot is None:
+                if not placed:
+                    dest = row['dest_path']
+                else:
+                    while is_taken(f"{base}_{counter}{ext}"):
+                        counter += 1
+                    dest = f"{base}_{counter}{ext}"
+                    counter += 1
+                slot = [dest, None]
+                placed.setdefault(size, []).append(slot)
+            slot[1] = slot[1] or file_hash
+            if slot[0] != row['dest_path']:
+                moves.append((slot[0], row['id']))
+        return moves
+
+    def execute_transfer(self, delete_source: bool = False, progress_callback: Optional[Callable[[int, int], None]] = None,
+                         log_callback: Optional[Callable[[str], None]] = None):
         """
-        Executes the copy process:
+        Executes the copy process (files run concurrently through the TransferScheduler):
         1. Check if destination exists
         2. If exists -> Check Hash. If match -> Mark Verified. If different -> Rename Dest.
-        3. If not exists -> Copy -> Verify -> Update DB.
+        3. If not exists -> Rename / reflink / hardlink per transfer_mode when the filesystems
+           allow it (verified against the recorded hash, no re-read), else
+           Copy + Hash in one read -> Verify (per verify_mode) -> Update DB.
+        log_callback receives the concurrency decisions of the adaptive scheduler.
+        """
+        done_statuses = ('verified', 'moved', 'skipped')
+        total = self.db.count_files(exclude_statuses=done_statuses, has_dest=True)
+        # Fresh view of the destination for this run: each directory is listed once, on first use
+        self.dest_index = DestinationIndex()
+        done = 0
+        done_lock = threading.Lock()
+
+        def tick(n: int = 1):
+            nonlocal done
+            with done_lock:
+                done += n
+                current = done
+            if progress_callback and (current % 5 == 0 or current == total):
+                progress_callback(current, total)
+
+        def make_job(rows):
+            def job() -> int:
+                handled = 0   # Bytes, for the adaptive scheduler
+                for row in rows:
+                    if self._stop_event:
+                        break
+                    self._transfer_file(row, delete_source)
+                    handled += row['file_size'] or 0
+                    tick()
+                return handled
+            return job
+
+        # Rows whose names can collide (same collision_family: X, X_1, X_2... in
+        # one directory) run in one job, in id order, so the suffixes come out
+        # exactly as in a serial run. Only those rows are held back; everything
+        # else streams straight to the scheduler.
+        shared = self.db.get_shared_destinations(exclude_statuses=done_statuses, key=collision_family)
+
+        def jobs():
+            groups: Dict[str, List] = {}
+            for row in self.db.iter_files(exclude_statuses=done_statuses, has_dest=True):
+                family = collision_family(row['dest_path'])
+                if family in shared:
+                    groups.setdefault(family, []).append(row)
+                else:
+                    yield row['source_path'], row['dest_path'], make_job([row])
+            for rows in groups.values():
+                yield rows[0]['source_path'], rows[0]['dest_path'], make_job(rows)
+
+        self.catalog = self.open_catalog() if self.use_catalog else None
+        try:
+            self.scheduler.run(jobs(), should_stop=lambda: self._stop_event, log_callback=log_callback)
+        finally:
+            if self.catalog:
+                self.catalog.close()
+        self.db.flush()
+        if self.cache:
+            self.cache.flush()
+
+    def open_catalog(self, library_root: Optional[str] = None, create: bool = True) -> Optional[LibraryCatalog]:
         """
-        files = self.db.get_all_files()
-        total = len(files)
-        
-        for i, row in enumerate(files):
-            if self._stop_event: break
+        Catalog of library_root (default: the root chosen at plan time).
+        None if it cannot be opened, or does not exist yet and create is False.
+        """
+        library_root = library_root or self.db.get_setting("library_root")
+        if not library_root:
+            return None
+        if not create and not os.path.exists(os.path.join(library_root, LibraryCatalog.FILE_NAME)):
+            return None
+        try:
+            return LibraryCatalog(library_root)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Library catalog unavailable ({library_root}): {e}")
+            return None
+
+    @metrics.timed("organizer.transfer_file")
+    def _transfer_file(self, row, delete_source: bool):
+        source = row['source_path']
+        dest = row['dest_path']
+        # Set once final_dest is reserved by this call, cleared once it holds the verified content:
+        # until then an error must not leave the placeholder (or a partial file) in the library
+        reserved = None
+
+        try:
+            # 1. Resolve Collision & Determine Final Path
+            # Resolution and name reservation are atomic per directory across workers
+            directory = os.path.dirname(dest)
+            st = os.stat(source)
+            src_stamp = (st.st_size, st.st_mtime_ns, st.st_ino)
+            # The stored hash describes the source only while it is still the file the scan saw
+            src_hash = (stored_hash(row, self.transfer.algorithm)
+                        if src_stamp == (row['file_size'], row['source_mtime_ns'], row['source_inode']) else None)
+            bytes_read = 0
+            with self._dir_lock(directory), metrics.timer("organizer.resolve_collision"):
+                for attempt in range(self.MAX_RESERVE_ATTEMPTS):
+                    # The source is hashed here only when a same-sized file already sits at dest
+                    final_dest, skip_copy, src_hash, n = self._resolve_smart_collision(dest, source, src_hash)
+                    bytes_read += n
+                    if skip_copy:
+                        break
+                    if not self.dest_index.directory_exists(directory):
+                        os.makedirs(directory, exist_ok=True)
+                    try:
+                        open(final_dest, 'xb').close()
+                    except FileExistsError:
+                        # Created behind the index's back (another program, case-insensitive name)
+                        self.dest_index.refresh(final_dest)
+                        continue
+                    self.dest_index.add(final_dest, 0)
+                    reserved = final_dest
+                    break
+                else:
+                    raise OSError(f"Nessun nome libero per {dest}")
+            if final_dest != dest:
+                # Renamed to a free _N: later stages (verify, reports) must look there
+                self.db.set_destination(source, final_dest)
+            bytes_written = 0
             
-            source = row['source_path']
-            dest = row['dest_path']
+            # 2. Share the source's blocks if the filesystems allow it, else
+            #    Copy + Verify (single streaming read of the source)
+            source_gone = False
+            if skip_copy:
+                verified = True
+                size = self.dest_index.lookup(final_dest).size
+            else:
+                result = None
+                for method in self._zero_copy_methods(delete_source):
+                    result = self.transfer.zero_copy(method, source, final_dest, src_hash, src_stamp)
+                    if result:
+                        break
+                if result is None:
+                    result = self.transfer.copy(source, final_dest)
+                source_gone = result.method == TransferEngine.METHOD_RENAME
+                src_hash = result.src_hash
+                verified = result.verified
+                bytes_read += result.bytes_read
+                bytes_written = result.bytes_written
+                if verified:
+                    reserved = None
+                    # Known content: a later collision on this name needs no re-read
+                    size = bytes_written if result.method == TransferEngine.METHOD_COPY else os.path.getsize(final_dest)
+                    self.dest_index.add(final_dest, size, file_hash=src_hash)
+
+            self.db.record_io(source, bytes_read, bytes_written)
             
-            if not dest:
-                continue
+            if verified:
+                # Success
+                self.db.update_metadata(source, row['date_taken'], row['date_source'], src_hash,
+                                        self.transfer.algorithm)
+                if self.catalog:
+                    # Later imports into this library skip this content before any I/O
+                    self.catalog.add(final_dest, size, src_hash, self.transfer.algorithm)
+                if self.cache:
+                    # Next scan of this source gets the hash for free
+                    self.cache.update_hash(os.path.abspath(source), row['file_size'], src_hash,
+                                           self.transfer.algorithm)
                 
-            # Skip if already done
-            if row['status'] in ('verified', 'moved'):
-                continue
-
-            try:
-                # Pre-Calc Source Hash
-                src_hash = MetadataExtractor.calculate_hash(source)
-                if not src_hash:
-                    self.db.update_status(source, 'error', "Source file validation failed (empty hash)")
-                    continue
-
-                # 1. Resolve Collision & Determine Final Path
-                final_dest, skip_copy = self._resolve_smart_collision(dest, src_hash, source)
-                
-                # 2. Copy if needed
-                if not skip_copy:
-                    os.makedirs(os.path.dirname(final_dest), exist_ok=True)
-                    shutil.copy2(source, final_dest)
-                
-                # 3. Verify
-                dst_hash = MetadataExtractor.calculate_hash(final_dest)
-                
-                if src_hash == dst_hash:
-                    # Success
-                    self.db.update_metadata(source, row['date_taken'], row['date_source'], src_hash)
-                    
-                    if delete_source:
-                        os.remove(source) 
-                        self.db.update_status(source, 'moved')
-                    else:
-                        self.db.update_status(source, 'verified')
+                if skip_copy or (result.dst_hash and (result.method != TransferEngine.METHOD_COPY
+                                                      or self.transfer.verify_mode == TransferEngine.VERIFY_FULL)):
+                    # Whole content confirmed at the destination: an incremental verify only needs a stat
+                    self._record_verification(source, final_dest)
+
+                if delete_source:
+                    if not source_gone:
+                        os.remove(source)
+                    self.db.update_status(source, 'moved')
                 else:
-                    self.db.update_status(source, 'error', "Hash Mismatch")
-                    # If we just copied it and it's wrong, should we delete it? 
-                    # Only if we *didn't* skip copy.
-                    if not skip_copy and os.path.exists(final_dest):
-                        os.remove(final_dest) 
-                        
-            except Exception as e:
-                self.db.update_status(source, 'error', str(e))
-            
-            if progress_callback and (i % 5 == 0 or i == total - 1):
-                progress_callback(i + 1, total)
+                    self.db.update_status(source, 'verified')
+            else:
+                self.db.update_status(source, 'error', "Hash Mismatch")
+                # If we just copied it and it's wrong, should we delete it? 
+                # Only if we *didn't* skip copy.
+                if not skip_copy and os.path.exists(final_dest):
+                    os.remove(final_dest) 
+                    self.dest_index.remove(final_dest)
+                reserved = None
+
+        except Exception as e:
+            self.db.update_status(source, 'error', str(e))
+            if reserved:
+                self._release(reserved)
 
-    def verify_migration(self) -> dict:
+    def _release(self, path: str):
+        """Removes a reserved destination that never received its verified content."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing incomplete file {path}: {e}")
+        self.dest_index.remove(path)
+
+    def _record_verification(self, source: str, dest: str):
+        try:
+            st = os.stat(dest)
+        except OSError:
+            return
+        self.db.record_verifications([(datetime.datetime.now().isoformat(timespec='seconds'),
+                                       st.st_size, st.st_mtime_ns, source)])
+
+    def _zero_copy_methods(self, delete_source: bool) -> tuple:
+        """TransferEngine methods to try, in order, before a plain copy."""
+        mode = self.transfer_mode
+        if mode == self.TRANSFER_AUTO:
+            # Hardlinks are never picked automatically: editing one name would change the other.
+            # Reflink after rename: btrfs subvolumes refuse renames between them but share blocks.
+            if delete_source:
+                return (TransferEngine.METHOD_RENAME, TransferEngine.METHOD_REFLINK)
+            return (TransferEngine.METHOD_REFLINK,)
+        if mode == TransferEngine.METHOD_COPY or (mode == TransferEngine.METHOD_RENAME and not delete_source):
+            return ()   # A rename is a move: copies keep the source
+        return (mode,)
+
+    def _dir_lock(self, directory: str) -> threading.Lock:
+        with self._dir_locks_guard:
+            lock = self._dir_locks.get(directory)
+            if lock is None:
+                lock = self._dir_locks[directory] = threading.Lock()
+            return lock
+
+    @metrics.timed("stage.verify")
+    def verify_migration(self, mode: str = MigrationVerifier.MODE_FULL, incremental: bool = False,
+                         sample_fraction: float = 0.05, max_mb_per_s: Optional[float] = None, workers: int = 4,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         log_callback: Optional[Callable[[str], None]] = None,
+                         issue_callback: Optional[Callable[[str], None]] = None) -> dict:
         """
         'Second Check' feature.
-        Iterates all 'verified'/'moved' files in DB and checks if they still exist in dest.
-        Returns a report.
+        Re-hashes the 'verified'/'moved' files at their destination and compares
+        them with the stored hash (see MigrationVerifier for modes and budget).
+        Returns a report: total, success, missing, corrupted, errors...
         """
-        files = self.db.get_all_files()
-        report = {
-            "total": 0,
-            "success": 0,
-            "missing": 0,
-            "corrupted": 0
-        }
-        
-        for row in files:
-            if row['status'] not in ('verified', 'moved'):
-                continue
-                
-            report['total'] += 1
-            dest = row['dest_path']
-            
-            if not os.path.exists(dest):
-                report['missing'] += 1
-                continue
-                
-            # Optional: Re-hash check (expensive but requested)
-            # stored_hash = row['file_hash']
-            # if stored_hash:
-            #     current_hash = MetadataExtractor.calculate_hash(dest)
-            #     if current_hash != stored_hash:
-            #         report['corrupted'] += 1
-            #         continue
-            
-            report['success'] += 1
-            
-        return report
+        self.verifier = MigrationVerifier(self.db, mode=mode, incremental=incremental,
+                                          sample_fraction=sample_fraction, max_mb_per_s=max_mb_per_s,
+                                          max_workers=workers, algorithm=self.transfer.algorithm)
+        return self.verifier.run(progress_callback, log_callback, issue_callback)
 
-    def _resolve_smart_collision(self, dest_path: str, src_hash: str, source_path: str) -> tuple[str, bool]:
+    def _resolve_smart_collision(self, dest_path: str, source_path: str, src_hash: Optional[str] = None) -> tuple[str, bool, Optional[str], int]:
         """
-        Returns (final_dest_path, skip_copy_flag)
+        Returns (final_dest_path, skip_copy_flag, src_hash, bytes_read)
+        src_hash is computed only if an existing file could be identical (same size, same name family);
+        bytes_read counts what was read to decide. The destination side is answered
+        by the DestinationIndex: no per-file exists/getsize probe, no suffix probing,
+        and each existing file is hashed at most once per run.
         """
-        if not os.path.exists(dest_path):
-            return dest_path, False
-            
-        # Collision found! Check if it's the exact same content
-        if MetadataExtractor.calculate_hash(dest_path) == src_hash:
-            return dest_path, True # Skip copy, it's already there!
+        existing = self.dest_index.lookup(dest_path)
+        if existing is None:
+            return dest_path, False, src_hash, 0
             
-        # Different content, we must rename
-        base, ext = os.path.splitext(dest_path)
-        counter = 1
-        new_dest = dest_path
-        
-        while os.path.exists(new_dest):
-            # Optimization: check hash of this variant too? 
-            # No, if user has IMG_001.jpg and IMG_001_1.jpg, we assume they are different versions.
-            # Just find a free slot.
-            new_dest = f"{base}_{counter}{ext}"
-            counter += 1
-            
-        return new_dest, False
+        # Collision found! Check if it's the exact same content (different size -> different content):
+        # at the planned name, or, when that holds other content, under one of its _N siblings
+        # (where an identical row of the plan, or an earlier import, was placed)
+        bytes_read = 0
+        size = os.path.getsize(source_path)
+        candidates = ([dest_path] if existing.size == size else []) + self.dest_index.siblings(dest_path, size)
+        for candidate in candidates:
+            if not src_hash:
+                src_hash, n = self.transfer.hash_file(source_path)
+                bytes_read += n
+            dst_hash, n = self.dest_index.hash_of(candidate, self.transfer.hash_file)
+            bytes_read += n
+            if dst_hash == src_hash:
+                return candidate, True, src_hash, bytes_read # Skip copy, it's already there!
+
+        # Different content, we must rename: first free _N
+        return self.dest_index.free_name(dest_path), False, src_hash, bytes_read
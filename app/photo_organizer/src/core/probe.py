@@ -0,0 +1,243 @@
+"""
+One-open file probe for the metadata pipeline.
+A file is opened once and its first HEADER_SIZE bytes read in a single call; the
+content type is sniffed from magic bytes and the date readers work on that buffer
+(or on positioned reads through the same descriptor), so the common case costs
+one open() and one read() per file.
+"""
+import io
+import os
+import mmap
+import threading
+import mimetypes
+from typing import Dict, Optional, Tuple
+
+HEADER_SIZE = 64 * 1024    # Covers a JPEG APP1 segment and HEIF 'meta' in practice
+WINDOW_SIZE = 64 * 1024    # Reads past the header fetch this much around the offset
+
+# Content kinds recognised from magic bytes
+KIND_JPEG = 'jpeg'
+KIND_TIFF = 'tiff'      # Also TIFF-based RAW (CR2, NEF, ARW, DNG)
+KIND_HEIF = 'heif'      # ISOBMFF still image (HEIC, HEIF, AVIF)
+KIND_MOVIE = 'movie'    # ISOBMFF / QuickTime video
+KIND_PNG = 'png'
+KIND_GIF = 'gif'
+KIND_BMP = 'bmp'
+KIND_WEBP = 'webp'
+KIND_AVI = 'avi'
+KIND_MATROSKA = 'matroska'
+KIND_ASF = 'asf'
+KIND_FLV = 'flv'
+
+KIND_MIME = {
+    KIND_JPEG: 'image/jpeg', KIND_TIFF: 'image/tiff', KIND_HEIF: 'image/heic', KIND_MOVIE: 'video/mp4',
+    KIND_PNG: 'image/png', KIND_GIF: 'image/gif', KIND_BMP: 'image/bmp', KIND_WEBP: 'image/webp',
+    KIND_AVI: 'video/x-msvideo', KIND_MATROSKA: 'video/x-matroska', KIND_ASF: 'video/x-ms-asf',
+    KIND_FLV: 'video/x-flv',
+}
+
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif', b'avis'}
+# QuickTime files without 'ftyp' start straight with one of these top-level boxes
+QUICKTIME_BOXES = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+
+def sniff(header: bytes) -> Optional[str]:
+    """Content kind from the first bytes of a file, or None if unknown."""
+    if header[:3] == b'\xff\xd8\xff':
+        return KIND_JPEG
+    if header[:4] in (b'II*\x00', b'MM\x00*'):
+        return KIND_TIFF
+    if header[4:8] == b'ftyp':
+        # Major brand, then the compatible brands list
+        brands = {header[8:12]} | {header[i:i + 4] for i in range(16, min(len(header), 64), 4)}
+        if header[8:12] in HEIF_BRANDS or (b'mif1' in brands and not brands & {b'isom', b'mp41', b'mp42', b'qt  '}):
+            return KIND_HEIF
+        return KIND_MOVIE
+    if header[4:8] in QUICKTIME_BOXES:
+        return KIND_MOVIE
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        return KIND_PNG
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return KIND_GIF
+    if header[:4] == b'RIFF':
+        if header[8:12] == b'WEBP':
+            return KIND_WEBP
+        if header[8:12] == b'AVI ':
+            return KIND_AVI
+        return None
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return KIND_MATROSKA
+    if header[:8] == b'\x30\x26\xb2\x75\x8e\x66\xcf\x11':
+        return KIND_ASF
+    if header[:3] == b'FLV':
+        return KIND_FLV
+    if header[:2] == b'BM':
+        return KIND_BMP
+    return None
+
+
+class FileProbe:
+    """
+    Opens a file once and reads its header. Use as a context manager:
+
+        with FileProbe(path, st) as probe:
+            probe.kind, probe.mime, probe.header, probe.read_at(off, n), probe.reader()
+
+    Syscalls are accounted per probe and summed into FileProbe.totals() on close.
+    """
+
+    _totals: Dict[str, int] = {}
+    _totals_lock = threading.Lock()
+
+    def __init__(self, file_path: str, st: Optional[os.stat_result] = None):
+        self.path = file_path
+        self.header = b''
+        self.kind: Optional[str] = None
+        self.error: Optional[OSError] = None
+        self.counts = {'opens': 0, 'reads': 0, 'stats': 0, 'mmaps': 0}
+        self._st = st
+        self._fd: Optional[int] = None
+        self._window: Tuple[int, bytes] = (0, b'')
+        self._open()
+
+    def _open(self):
+        try:
+            self._fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            self.counts['opens'] += 1
+            self.header = os.read(self._fd, HEADER_SIZE)
+            self.counts['reads'] += 1
+        except OSError as e:
+            self.error = e
+            self.close()
+            return
+        self.kind = sniff(self.header)
+
+    def __enter__(self) -> 'FileProbe':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if any(self.counts.values()):
+            FileProbe.add_totals(self.counts)
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def mime(self) -> str:
+        """
+        MIME type: the extension's guess when it agrees with the content family
+        (it is usually more specific, e.g. video/quicktime), else the sniffed one.
+        """
+        guessed, _ = mimetypes.guess_type(self.path)
+        sniffed = KIND_MIME.get(self.kind)
+        if not sniffed:
+            return guessed or "application/octet-stream"
+        if guessed and guessed.split('/')[0] == sniffed.split('/')[0]:
+            return guessed
+        return sniffed
+
+    @property
+    def whole_file_read(self) -> bool:
+        """True when the header buffer already holds the entire file."""
+        if self._fd is None:
+            return True
+        if self._st is not None:
+            return len(self.header) >= self._st.st_size
+        return len(self.header) < HEADER_SIZE
+
+    def stat(self) -> Optional[os.stat_result]:
+        """The walker's stat if one was passed, else fstat on the open descriptor."""
+        if self._st is None and self._fd is not None:
+            self._st = os.fstat(self._fd)
+            self.counts['stats'] += 1
+        return self._st
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Positioned read served from the header or the last window when possible."""
+        end = offset + length
+        if end <= len(self.header) or self.whole_file_read:
+            return self.header[offset:end]
+        start, window = self._window
+        if start <= offset and end <= start + len(window):
+            return window[offset - start:end - start]
+        data = self._pread(max(length, WINDOW_SIZE), offset)
+        self.counts['reads'] += 1
+        self._window = (offset, data)
+        return data[:length]
+
+    def _pread(self, length: int, offset: int) -> bytes:
+        if hasattr(os, 'pread'):
+            return os.pread(self._fd, length, offset)
+        # Windows has no pread: a probe is used by one thread, so seek + read on its own descriptor is safe
+        os.lseek(self._fd, offset, os.SEEK_SET)
+        return os.read(self._fd, length)
+
+    def reader(self) -> io.RawIOBase:
+        """Seekable file object over read_at, for the stream-based box readers."""
+        return _ProbeReader(self)
+
+    def map(self) -> mmap.mmap:
+        """Read-only mmap of the whole file through the open descriptor (no second open)."""
+        mm = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        self.counts['mmaps'] += 1
+        if hasattr(mm, 'madvise'):
+            mm.madvise(mmap.MADV_RANDOM)
+        return mm
+
+    @classmethod
+    def add_totals(cls, counts: Dict[str, int]):
+        with cls._totals_lock:
+            for key, value in counts.items():
+                cls._totals[key] = cls._totals.get(key, 0) + value
+
+    @classmethod
+    def totals(cls) -> Dict[str, int]:
+        """Syscalls issued by all probes (plus library fallbacks) since the last reset."""
+        with cls._totals_lock:
+            return dict(cls._totals)
+
+    @classmethod
+    def reset_totals(cls):
+        with cls._totals_lock:
+            cls._totals = {}
+
+
+class _ProbeReader(io.RawIOBase):
+    def __init__(self, probe: FileProbe):
+        self._probe = probe
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._probe.read_at(self._pos, len(b))
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            if self._probe.whole_file_read:
+                size = len(self._probe.header)
+            else:
+                size = self._probe.stat().st_size
+            offset += size
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
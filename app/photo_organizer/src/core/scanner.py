@@ -1,9 +1,17 @@
 import os
-import concurrent.futures
+import time
+import queue
+import threading
 from pathlib import Path
-from typing import List, Callable, Optional
-from .metadata import MetadataExtractor
+from contextlib import nullcontext
+from typing import List, Callable, Dict, Optional
+from .metadata import MetadataExtractor, extract_batch
+from .probe import FileProbe
+from .walker import ParallelWalker
 from ..data.database import SessionDatabase
+from ..data.metadata_cache import MetadataCache
+from ..utils.instrumentation import metrics
+from ..utils.adaptive import AdaptiveLimit
 
 class Scanner:
     SKIP_DIRS = {'.git', '.svn', '$RECYCLE.BIN', 'System Volume Information', '__pycache__'}
@@ -15,89 +23,299 @@ class Scanner:
         '.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.3gp'
     }
 
-    def __init__(self, db: SessionDatabase):
+    # Bounded queues between the pipeline stages: memory stays flat whatever the tree size
+    EXTRACT_QUEUE_SIZE = 2000
+    PERSIST_QUEUE_SIZE = 2000
+    PERSIST_BATCH = 500
+    # Process mode: files per task sent to a worker process
+    PROCESS_BATCH = 256
+    # Adaptive thread mode: extractor threads started; how many work at once is tuned while scanning
+    ADAPTIVE_MAX_WORKERS = 32
+
+    def __init__(self, db: SessionDatabase, cache: Optional[MetadataCache] = None, max_workers: Optional[int] = None,
+                 walk_workers: int = 16, use_processes: bool = False, adaptive: bool = True):
         self.db = db
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        self.cache = cache
+        self.max_workers = max_workers or os.cpu_count() or 4
+        # Directory listings in flight at once (one round-trip each on SMB/NFS)
+        self.walk_workers = walk_workers
+        # Extraction is mostly pure Python (parsers, filename regexes): threads share one GIL,
+        # processes scale with cores. Off by default: worker start-up costs ~1 s.
+        self.use_processes = use_processes
+        # Thread mode: max_workers is only the starting point, an AdaptiveLimit moves it between
+        # 1 (a USB HDD seeking between files) and ADAPTIVE_MAX_WORKERS (NVMe, network latency).
+        # Process mode stays fixed: its work is CPU-bound and sized by the cores.
+        self.adaptive = adaptive
+        self._limiter: Optional[AdaptiveLimit] = None
+        self._pool = None   # concurrent.futures.ProcessPoolExecutor in process mode
         self.is_running = False
         self._stop_event = False
         self.total_files_found = 0
+        self._extract_queue: Optional[queue.Queue] = None
+        self._persist_queue: Optional[queue.Queue] = None
+        self._counters: Dict[str, float] = {}
+        self._counters_lock = threading.Lock()
 
+    @metrics.timed("stage.scan")
     def scan_path(self, root_path: str, progress_callback: Optional[Callable[[str], None]] = None):
         """
-        Recursively scans the path. Submits metadata extraction tasks to thread pool.
+        Recursively scans the path as a streaming pipeline:
+        parallel walk -> this thread -> extract queue -> N extractor threads -> persist queue -> DB writer thread.
+        Every queue is bounded, so a fast walk waits for extraction instead of piling up work.
+        With use_processes the extractor threads only dispatch batches to a process pool.
         """
         self.is_running = True
         self._stop_event = False
         self.total_files_found = 0
+        if self.cache:
+            self.cache.reset_counters()
+        FileProbe.reset_totals()
         
         root = Path(root_path)
         if not root.exists():
+            self.is_running = False
             return
 
-        futures = []
+        self._extract_queue = queue.Queue(maxsize=self.EXTRACT_QUEUE_SIZE)
+        self._persist_queue = queue.Queue(maxsize=self.PERSIST_QUEUE_SIZE)
+        self._counters = {key: 0 for key in ("walked", "extracted", "persisted",
+                                             "walk_blocked_s", "extract_blocked_s")}
+
+        if self.use_processes:
+            # Imported here: multiprocessing adds ~25 ms to every start-up that never uses it
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: forking a process that already runs threads is unsafe (and unavailable on Windows)
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            # One dispatcher thread per process, each keeping one batch in flight
+            target = self._extract_batch_worker
+            threads = self.max_workers
+        else:
+            target = self._extract_worker
+            threads = self.max_workers
+            if self.adaptive:
+                threads = max(self.max_workers, self.ADAPTIVE_MAX_WORKERS)
+                self._limiter = AdaptiveLimit("estrazione", self.max_workers, maximum=threads,
+                                              on_decision=progress_callback)
+        extractors = [threading.Thread(target=target, name=f"ScanExtract-{i}", daemon=True)
+                      for i in range(threads)]
+        persister = threading.Thread(target=self._persist_worker, name="ScanPersist", daemon=True)
+        for t in extractors:
+            t.start()
+        persister.start()
+
+        walker = ParallelWalker(self.SKIP_DIRS, self.SKIP_FILES, max_workers=self.walk_workers,
+                                file_filter=self._is_media)
 
         try:
-            for entry in self._safe_walk(root):
+            for entry, st in walker.walk(str(root), should_stop=lambda: self._stop_event):
                 if self._stop_event:
                     break
                 
-                if entry.is_file():
-                    ext = os.path.splitext(entry.name)[1].lower()
-                    if ext in self.MEDIA_EXTENSIONS and entry.name not in self.SKIP_FILES:
-                        self.total_files_found += 1
-                        # Submit job to worker pool
-                        future = self.executor.submit(self._process_file, entry.path, entry.name, entry.stat().st_size)
-                        futures.append(future)
-                        
-
-                        if progress_callback and self.total_files_found % 50 == 0:
-                            progress_callback(f"Trovati {self.total_files_found} file... ({entry.name})")
-
-            # Wait for all tasks to complete
-            concurrent.futures.wait(futures)
+                self.total_files_found += 1
+                if not self._put(self._extract_queue, (entry.path, entry.name, st), "walk_blocked_s"):
+                    break
+                self._count("walked")
+
+                if progress_callback and self.total_files_found % 50 == 0:
+                    progress_callback(f"Trovati {self.total_files_found} file... ({entry.name})")
+                if progress_callback and self.total_files_found % 1000 == 0:
+                    stats = self.stage_stats()
+                    progress_callback(f"Pipeline: {stats['extract_queue']} in attesa di estrazione, "
+                                      f"{stats['persist_queue']} in attesa di scrittura")
             
         except Exception as e:
             print(f"Scan error: {e}")
         finally:
+            # Drain: one sentinel per extractor, then one for the persister
+            for _ in extractors:
+                self._put(self._extract_queue, None, None, force=True)
+            for t in extractors:
+                t.join()
+            self._put(self._persist_queue, None, None, force=True)
+            persister.join()
+            if self._pool:
+                self._pool.shutdown()
+                self._pool = None
+            self._limiter = None
+
+            if self.cache and not self._stop_event:
+                self.cache.prune()
+                if progress_callback:
+                    progress_callback(f"Cache metadati: {self.cache.hits} hit, {self.cache.misses} miss")
+            if progress_callback:
+                probe_io = FileProbe.totals()
+                progress_callback(f"I/O estrazione: {probe_io.get('opens', 0)} open, {probe_io.get('reads', 0)} read, "
+                                  f"{probe_io.get('fallback_opens', 0)} aperture extra per {self.total_files_found} file")
+
+            # Phase boundary: queued DB writes must be visible to the planner
+            self.db.flush()
+            # Sources edited since dedup no longer vouch for the copies skipped in their name
+            released = self.db.release_stale_duplicates()
+            if released and progress_callback:
+                progress_callback(f"Duplicati: {released} file di nuovo da trasferire (originale modificato)")
+            if self.cache:
+                self.cache.flush()
             self.is_running = False
 
     def stop(self):
         self._stop_event = True
-        self.executor.shutdown(wait=False)
 
-    def _safe_walk(self, path: Path):
-        """Generator that yields DirEntry objects, skipping system folders."""
+    def stage_stats(self) -> Dict[str, float]:
+        """
+        Live pipeline counters. A full extract_queue (and growing walk_blocked_s) means
+        extraction is the bottleneck; a full persist_queue / extract_blocked_s points at the DB.
+        """
+        with self._counters_lock:
+            stats = dict(self._counters)
+        stats["extract_queue"] = self._extract_queue.qsize() if self._extract_queue else 0
+        stats["persist_queue"] = self._persist_queue.qsize() if self._persist_queue else 0
+        # Syscalls of the extract stage (FileProbe opens/reads/mmaps, library fallbacks)
+        for key, value in FileProbe.totals().items():
+            stats[f"probe_{key}"] = value
+        return stats
+
+    def _count(self, key: str, amount: float = 1):
+        with self._counters_lock:
+            self._counters[key] += amount
+
+    def _put(self, q: queue.Queue, item, blocked_key: Optional[str], force: bool = False) -> bool:
+        """Blocking put that gives up on stop (unless force) and accounts the time spent blocked."""
         try:
-            # os.scandir is faster than os.walk
-            with os.scandir(path) as it:
-                for entry in it:
-                    if entry.name in self.SKIP_FILES or entry.name in self.SKIP_DIRS:
-                        continue
-                    
-                    if entry.is_dir(follow_symlinks=False):
-                        yield from self._safe_walk(Path(entry.path))
-                    else:
-                        yield entry
-        except PermissionError:
-            pass # Skip unreadable folders
-        except OSError:
+            q.put_nowait(item)
+            return True
+        except queue.Full:
             pass
+        start = time.monotonic()
+        try:
+            while True:
+                if self._stop_event and not force:
+                    return False
+                try:
+                    q.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+        finally:
+            if blocked_key:
+                self._count(blocked_key, time.monotonic() - start)
 
-    def _process_file(self, file_path: str, name: str, size: int):
-        """Worker function: Extract metadata and save to DB."""
-        if self._stop_event:
-            return
+    def _is_media(self, name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in self.MEDIA_EXTENSIONS
 
-        # 1. Insert into DB (Pending)
-        mime = MetadataExtractor.get_mime_type(file_path)
-        self.db.add_file(file_path, name, size, mime)
-        
-        # 2. Extract Date
-        date_taken, date_source = MetadataExtractor.get_date(file_path)
-        
-        # 3. Update DB
-        self.db.update_metadata(
-            source_path=file_path,
-            date_taken=date_taken.isoformat(),
-            date_source=date_source
-        )
+    def _extract_worker(self):
+        while True:
+            item = self._extract_queue.get()
+            if item is None:
+                return
+            if self._stop_event:
+                continue   # Keep draining so the walker never blocks on a dead pipeline
+            limiter = self._limiter
+            try:
+                with limiter.slot() if limiter else nullcontext():
+                    start = time.perf_counter()
+                    row = self._process_file(*item)
+                if limiter:
+                    limiter.record(1, time.perf_counter() - start)
+            except Exception as e:
+                print(f"Scan error on {item[0]}: {e}")
+                row = self._row(item[0], item[1], item[2], MetadataExtractor.get_mime_type(item[0]), None, None)
+            self._count("extracted")
+            self._put(self._persist_queue, row, "extract_blocked_s", force=True)
+
+    def _persist_worker(self):
+        batch = []
+        while True:
+            try:
+                item = self._persist_queue.get(timeout=0.1)
+            except queue.Empty:
+                item = False   # Idle: write what we have
+            if item:
+                batch.append(item)
+            if batch and (item is None or item is False or len(batch) >= self.PERSIST_BATCH):
+                self.db.add_files(batch)
+                self._count("persisted", len(batch))
+                batch = []
+            if item is None:
+                return
+
+    def _extract_batch_worker(self):
+        """
+        Process mode: cache hits are answered in this thread, misses are collected into
+        batches of PROCESS_BATCH and extracted by a worker process in one round-trip.
+        """
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < self.PROCESS_BATCH:
+                try:
+                    # Block for the first item; then send a partial batch as soon as the queue idles
+                    item = self._extract_queue.get(timeout=0.05 if batch else None)
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                if self._stop_event:
+                    continue
+                row = self._cached_row(*item)
+                if row:
+                    self._count("extracted")
+                    self._put(self._persist_queue, row, "extract_blocked_s", force=True)
+                else:
+                    batch.append(item)
+            if batch and not self._stop_event:
+                self._extract_remote(batch)
+
+    def _extract_remote(self, batch: List[tuple]):
+        items = [(path, st.st_size, st.st_mtime, st.st_ctime) for path, _, st in batch]
+        try:
+            results, probe_counts, worker_metrics = self._pool.submit(extract_batch, items).result()
+        except Exception as e:
+            print(f"Scan error on a batch of {len(batch)} files: {e}")
+            results = [(MetadataExtractor.get_mime_type(path), None, None) for path, _, _ in batch]
+            probe_counts, worker_metrics = {}, {}
+        FileProbe.add_totals(probe_counts)
+        metrics.merge(worker_metrics)
+        for (path, name, st), (mime, date_iso, date_source) in zip(batch, results):
+            if self.cache and date_source and date_source != "Unknown":
+                self.cache.store(os.path.abspath(path), st, date_iso, date_source, mime)
+            self._count("extracted")
+            self._put(self._persist_queue, self._row(path, name, st, mime, date_iso, date_source),
+                      "extract_blocked_s", force=True)
+
+    def _cached_row(self, file_path: str, name: str, st: os.stat_result) -> Optional[tuple]:
+        """The add_files row from the metadata cache if the file is unchanged since a previous scan."""
+        if not self.cache:
+            return None
+        cached = self.cache.lookup(os.path.abspath(file_path), st)
+        if not cached:
+            return None
+        return self._row(file_path, name, st, cached['mime_type'], cached['date_taken'], cached['date_source'],
+                         cached['file_hash'], cached['hash_algo'])
+
+    def _process_file(self, file_path: str, name: str, st: os.stat_result) -> tuple:
+        """
+        Extractor stage: metadata for one file (or the cached one).
+        Returns the row for SessionDatabase.add_files.
+        """
+        # Unchanged since a previous scan? Skip extraction entirely
+        cached = self._cached_row(file_path, name, st)
+        if cached:
+            return cached
+
+        # One open + one header read; the walker's stat serves the filesystem-date fallback
+        mime, date_taken, date_source = MetadataExtractor.extract(file_path, st)
+
+        # "Unknown" means the file could not even be stat'ed: nothing worth caching
+        if self.cache and date_source != "Unknown":
+            self.cache.store(os.path.abspath(file_path), st, date_taken.isoformat(), date_source, mime)
+
+        return self._row(file_path, name, st, mime, date_taken.isoformat(), date_source)
+
+    @staticmethod
+    def _row(path: str, name: str, st: os.stat_result, mime: str, date_iso: Optional[str], date_source: Optional[str],
+             file_hash: Optional[str] = None, hash_algo: Optional[str] = None) -> tuple:
+        """Row for SessionDatabase.add_files; the stat stamp tells a rescan whether the content changed."""
+        return (path, name, st.st_size, mime, date_iso, date_source, file_hash, hash_algo, st.st_mtime_ns, st.st_ino)
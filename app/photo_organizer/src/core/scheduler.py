@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from ..utils.adaptive import AdaptiveLimit
+
+
+class TransferScheduler:
+    """
+    Runs transfer jobs concurrently with separate read/write slot limits per
+    device (grouped by st_dev), so a slow HDD source is never thrashed while
+    jobs towards a fast target keep flowing.
+    With adaptive, the detected limit is only the starting point: each device
+    gets an AdaptiveLimit (1..max_workers) fed with the bytes and duration of
+    every job that touches it (a job returns the bytes it moved).
+    """
+    HDD_LIMIT = 1
+    SSD_LIMIT = 4
+    DEFAULT_LIMIT = 2   # Network shares / unknown devices
+
+    def __init__(self, max_workers: int = 8, source_limit: Optional[int] = None,
+                 dest_limit: Optional[int] = None, max_buffered: int = 1000, adaptive: bool = True):
+        self.max_workers = max_workers
+        self.source_limit = source_limit
+        self.dest_limit = dest_limit
+        self.max_buffered = max_buffered
+        self.adaptive = adaptive
+        self._adaptive_limits: Dict[int, AdaptiveLimit] = {}
+        self._cond = threading.Condition()
+        self._dev_cache: Dict[str, int] = {}
+        self._limit_cache: Dict[int, int] = {}
+
+    # --- Devices ---
+
+    def device_of(self, path: str) -> int:
+        """st_dev of path, or of its closest existing parent (destinations may not exist yet)."""
+        parent = os.path.dirname(path)
+        dev = self._dev_cache.get(parent)
+        if dev is not None:
+            return dev
+        probe = parent
+        while True:
+            try:
+                dev = os.stat(probe).st_dev
+                break
+            except OSError:
+                up = os.path.dirname(probe)
+                if up == probe:
+                    dev = -1
+                    break
+                probe = up
+        self._dev_cache[parent] = dev
+        return dev
+
+    def device_limit(self, dev: int) -> int:
+        if dev not in self._limit_cache:
+            self._limit_cache[dev] = self._detect_limit(dev)
+        return self._limit_cache[dev]
+
+    def _detect_limit(self, dev: int) -> int:
+        """Reads the block queue 'rotational' flag (Linux); other platforms use the default."""
+        if dev < 0:
+            return self.DEFAULT_LIMIT
+        base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+        # Partitions keep the queue settings on the parent disk
+        for candidate in (os.path.join(base, "queue", "rotational"),
+                          os.path.join(base, "..", "queue", "rotational")):
+            try:
+                with open(candidate) as f:
+                    return self.HDD_LIMIT if f.read().strip() == "1" else self.SSD_LIMIT
+            except OSError:
+                continue
+        return self.DEFAULT_LIMIT
+
+    def _slots(self, dev: int, fixed: Optional[int]) -> int:
+        """Current slot count of a device (fixed override, adaptive limit or detected limit)."""
+        if fixed:
+            return fixed
+        if self.adaptive:
+            return self._adaptive_limits[dev].limit
+        return self.device_limit(dev)
+
+    def _adaptive_for(self, dev: int, log_callback: Optional[Callable[[str], None]]) -> AdaptiveLimit:
+        limiter = self._adaptive_limits.get(dev)
+        if limiter is None:
+            limiter = self._adaptive_limits[dev] = AdaptiveLimit(
+                f"dev {os.major(dev)}:{os.minor(dev)}" if dev >= 0 else "dev ?", self.device_limit(dev),
+                maximum=self.max_workers, unit="MB", unit_scale=1 / (1024 * 1024), on_decision=log_callback)
+        return limiter
+
+    # --- Dispatch ---
+
+    def run(self, jobs: Iterable[Tuple[str, str, Callable[[], Optional[int]]]],
+            should_stop: Callable[[], bool] = lambda: False,
+            log_callback: Optional[Callable[[str], None]] = None):
+        """
+        jobs yields (source_path, dest_path, callable). A job starts only when its
+        source device has a free read slot and its destination device a free write slot.
+        Jobs are pulled lazily, at most max_buffered are held in memory.
+        log_callback receives the adaptive limit changes.
+        """
+        # Each run learns afresh, from the detected limits
+        self._adaptive_limits = {}
+        it = iter(jobs)
+        exhausted = False
+        lanes: Dict[Tuple[int, int], deque] = {}
+        buffered = 0
+        state = {"running": 0, "reads": {}, "writes": {}}
+
+        def finished(key: Tuple[int, int]):
+            src_dev, dst_dev = key
+            with self._cond:
+                state["running"] -= 1
+                state["reads"][src_dev] -= 1
+                state["writes"][dst_dev] -= 1
+                self._cond.notify()
+
+        def execute(key: Tuple[int, int], job: Callable[[], Optional[int]]):
+            start = time.perf_counter()
+            try:
+                moved = job()
+            finally:
+                finished(key)
+            if self.adaptive:
+                elapsed = time.perf_counter() - start
+                for dev in set(key):
+                    self._adaptive_limits[dev].record(moved or 0, elapsed)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if should_stop():
+                    lanes.clear()
+                    buffered = 0
+                    exhausted = True
+
+                # Top up the buffer outside the lock (the iterator may hit the DB)
+                while not exhausted and buffered < self.max_buffered:
+                    try:
+                        source, dest, job = next(it)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    key = (self.device_of(source), self.device_of(dest))
+                    if self.adaptive:
+                        for dev in key:
+                            self._adaptive_for(dev, log_callback)
+                    lanes.setdefault(key, deque()).append(job)
+                    buffered += 1
+
+                with self._cond:
+                    started = False
+                    for key in list(lanes):
+                        queue = lanes[key]
+                        src_dev, dst_dev = key
+                        while (queue and state["running"] < self.max_workers
+                               and state["reads"].get(src_dev, 0) < self._slots(src_dev, self.source_limit)
+                               and state["writes"].get(dst_dev, 0) < self._slots(dst_dev, self.dest_limit)):
+                            job = queue.popleft()
+                            buffered -= 1
+                            state["running"] += 1
+                            state["reads"][src_dev] = state["reads"].get(src_dev, 0) + 1
+                            state["writes"][dst_dev] = state["writes"].get(dst_dev, 0) + 1
+                            pool.submit(execute, key, job)
+                            started = True
+                        if not queue:
+                            del lanes[key]
+                        elif self.adaptive and state["running"] < self.max_workers:
+                            # Held back by a device limit, not by the pool: tell that device's controller
+                            if state["reads"].get(src_dev, 0) >= self._slots(src_dev, self.source_limit):
+                                self._adaptive_limits[src_dev].note_saturated()
+                            if state["writes"].get(dst_dev, 0) >= self._slots(dst_dev, self.dest_limit):
+                                self._adaptive_limits[dst_dev].note_saturated()
+
+                    if started:
+                        continue
+                    if exhausted and buffered == 0:
+                        if state["running"] == 0:
+                            break
+                        self._cond.wait(timeout=0.5)
+                    elif exhausted or buffered >= self.max_buffered:
+                        # Nothing runnable: wait for a slot to free up
+                        self._cond.wait(timeout=0.5)
@@ -0,0 +1,310 @@
+import os
+import time
+import errno
+import shutil
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from .hashing import FileHasher, DEFAULT_ALGORITHM
+from ..utils.instrumentation import metrics
+from ..utils.ratelimit import TokenBucket
+
+
+@dataclass
+class TransferResult:
+    src_hash: str
+    dst_hash: str        # Hash confirmed on the destination ("" when the write is trusted)
+    bytes_read: int      # Source read + destination re-read
+    bytes_written: int
+    verified: bool
+    method: str = "copy"   # TransferEngine.METHOD_* that produced the destination
+
+
+# ioctl(dest_fd, FICLONE, src_fd): share all of the source's extents (btrfs, XFS, bcachefs, OCFS2)
+FICLONE = 0x40049409
+# errno meaning "this pair of filesystems cannot do it", not "this file failed": remembered per device pair
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.ENOSYS}
+# errno refusing this file only (protected_hardlinks, immutable or append-only file, link count
+# limit, FICLONE on an inline or unaligned extent): this file is copied, the next one tries again
+FILE_ERRNOS = {errno.EPERM, errno.EINVAL, errno.EMLINK}
+
+
+class TransferEngine:
+    """
+    Copies a file while hashing it in the same streaming read, then checks
+    the destination according to the configured verify mode.
+    """
+    VERIFY_FULL = "full"       # Re-read the whole destination with the page cache dropped
+    VERIFY_SAMPLE = "sample"   # Re-read a few blocks and compare them with the source blocks
+    VERIFY_NONE = "none"       # Trust the write
+
+    VERIFY_MODES = (VERIFY_FULL, VERIFY_SAMPLE, VERIFY_NONE)
+
+    METHOD_COPY = "copy"           # Stream + hash + verify (works everywhere)
+    METHOD_REFLINK = "reflink"     # Copy-on-write clone: new file, shared blocks
+    METHOD_HARDLINK = "hardlink"   # Second name for the same inode
+    METHOD_RENAME = "rename"       # Atomic same-device move (delete_source only)
+
+    METHODS = (METHOD_COPY, METHOD_REFLINK, METHOD_HARDLINK, METHOD_RENAME)
+
+    def __init__(self, verify_mode: str = VERIFY_FULL, algorithm: str = DEFAULT_ALGORITHM,
+                 chunk_size: int = 1024 * 1024, sample_blocks: int = 8, rate_limit: Optional[TokenBucket] = None):
+        """rate_limit: shared byte budget for everything this engine reads (copies, hashes, verification)."""
+        if verify_mode not in self.VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode: {verify_mode}")
+        self.verify_mode = verify_mode
+        self.algorithm = algorithm
+        self.hasher = FileHasher(algorithm, buffer_size=chunk_size)
+        self.chunk_size = chunk_size
+        self.sample_blocks = sample_blocks
+        self.rate_limit = rate_limit
+        # (method, source st_dev, dest st_dev) found unable to share data: not tried again
+        self._unsupported: set = set()
+        self._unsupported_lock = threading.Lock()
+
+    def copy(self, source: str, dest: str) -> TransferResult:
+        """Copies source to dest (data + stat like shutil.copy2) in a single source read."""
+        hasher = self.hasher.new()
+        samples: Dict[int, bytes] = {}
+
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        bytes_read = 0
+        bytes_written = 0
+        block = 0
+
+        copy_start = time.perf_counter()
+        try:
+            size = os.path.getsize(source)
+            sample_idx = self._sample_indexes(size) if self.verify_mode == self.VERIFY_SAMPLE else set()
+            with open(source, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                while n := fsrc.readinto(buf):
+                    chunk = view[:n]
+                    hasher.update(chunk)
+                    if block in sample_idx:
+                        samples[block] = hashlib.blake2b(chunk, digest_size=16).digest()
+                    fdst.write(chunk)
+                    if self.rate_limit:
+                        self.rate_limit.consume(n)
+                    bytes_read += n
+                    bytes_written += n
+                    block += 1
+
+                fdst.flush()
+                if self.verify_mode != self.VERIFY_NONE:
+                    # Dirty pages cannot be dropped: push them to disk before re-reading
+                    os.fsync(fdst.fileno())
+            shutil.copystat(source, dest)
+        except BaseException:
+            # Never leave a truncated copy behind
+            if os.path.exists(dest):
+                os.remove(dest)
+            raise
+        finally:
+            view.release()
+
+        src_hash = hasher.hexdigest()
+        metrics.observe("transfer.copy", time.perf_counter() - copy_start)
+        metrics.count("transfer.bytes_copied", bytes_written)
+
+        verify_start = time.perf_counter()
+        if self.verify_mode == self.VERIFY_FULL:
+            dst_hash, verify_read = self._hash_uncached(dest)
+            bytes_read += verify_read
+            verified = dst_hash == src_hash
+        elif self.verify_mode == self.VERIFY_SAMPLE:
+            verified, verify_read = self._check_samples(dest, samples)
+            bytes_read += verify_read
+            dst_hash = src_hash if verified else ""
+        else:
+            dst_hash = ""
+            verified = bytes_written == size
+        metrics.observe(f"transfer.verify.{self.verify_mode}", time.perf_counter() - verify_start)
+
+        return TransferResult(src_hash, dst_hash, bytes_read, bytes_written, verified)
+
+    def zero_copy(self, method: str, source: str, dest: str, known_hash: Optional[str] = None,
+                  known_stamp: Optional[Tuple[int, int, int]] = None) -> Optional[TransferResult]:
+        """
+        Puts source at dest without streaming its data: reflink, hardlink or rename.
+        dest may exist (the engine's empty placeholder) and is replaced atomically.
+        On an error dest is at most that placeholder, or a clone/link of the source
+        (a renamed file is moved back), so the caller can remove it.
+        Returns None when it cannot be done and the caller falls back to copy().
+        When the filesystems cannot do it (EXDEV, no reflink support...) the outcome is
+        remembered per device pair, so a volume without reflink costs one failed ioctl
+        per run, not one per file; a refusal of this file only (FILE_ERRNOS) is not.
+
+        Where FICLONE is not supported, reflink uses copy_file_range(): the kernel
+        copies (or shares, on NFS 4.2/SMB server-side copy) without going through
+        user space, but the blocks are new, so they are verified like a copy.
+
+        The data is the source's own blocks, so there is nothing to re-read:
+        known_hash is taken as both hashes when known_stamp, the source's
+        (size, mtime_ns, inode) it was computed from, is still the source's stat.
+        Otherwise (no stamp, file edited since) the file is hashed once, unless
+        verify mode is none, so the session records the hash of what was placed.
+        """
+        if method not in (self.METHOD_REFLINK, self.METHOD_HARDLINK, self.METHOD_RENAME):
+            raise ValueError(f"Not a zero-copy method: {method}")
+        try:
+            src_st = os.stat(source)
+            src_dev = src_st.st_dev
+            dst_dev = os.stat(os.path.dirname(dest) or ".").st_dev
+        except OSError:
+            return None   # copy() reports the error and leaves nothing behind
+        key = (method, src_dev, dst_dev)
+        with self._unsupported_lock:
+            if key in self._unsupported:
+                return None
+        # Links and renames never cross a device; reflink may (btrfs subvolumes), so it is tried
+        if method != self.METHOD_REFLINK and src_dev != dst_dev:
+            return None
+
+        start = time.perf_counter()
+        shared = True
+        try:
+            if method == self.METHOD_REFLINK:
+                shared = self._reflink(source, dest, (src_dev, dst_dev))
+            elif method == self.METHOD_HARDLINK:
+                tmp = f"{dest}.{os.getpid()}-{threading.get_ident()}.link"
+                os.link(source, tmp)
+                try:
+                    os.replace(tmp, dest)
+                except BaseException:
+                    os.remove(tmp)
+                    raise
+            else:
+                os.replace(source, dest)
+        except OSError as e:
+            if e.errno in FILE_ERRNOS:
+                metrics.count(f"transfer.{method}.refused")
+                return None
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            with self._unsupported_lock:
+                self._unsupported.add(key)
+            metrics.count(f"transfer.{method}.unsupported")
+            return None
+        metrics.observe(f"transfer.{method}", time.perf_counter() - start)
+        metrics.count(f"transfer.{method}.files")
+
+        trusted = known_hash and known_stamp == (src_st.st_size, src_st.st_mtime_ns, src_st.st_ino)
+        if not shared:
+            return self._check_kernel_copy(source, dest, known_hash if trusted else None, src_st.st_size)
+        try:
+            if trusted:
+                file_hash, bytes_read = known_hash, 0
+            elif self.verify_mode != self.VERIFY_NONE:
+                # Recorded hash missing or stale (file changed since the scan): one read, no write
+                file_hash, bytes_read = self.hash_file(dest)
+            else:
+                file_hash, bytes_read = "", 0
+        except BaseException:
+            if method == self.METHOD_RENAME:
+                # dest holds the only copy: put it back, the caller then only removes its placeholder
+                os.replace(dest, source)
+            raise
+        return TransferResult(file_hash, file_hash, bytes_read, 0, True, method)
+
+    def hash_file(self, file_path: str) -> Tuple[str, int]:
+        """Returns (hash, bytes_read) with the engine's algorithm."""
+        result = self.hasher.hash_file(file_path)
+        if self.rate_limit:
+            # Charged after the read: the average stays within the budget
+            self.rate_limit.consume(result[1])
+        return result
+
+    # ---
+
+    def _reflink(self, source: str, dest: str, devices: Tuple[int, int]) -> bool:
+        """Clones source into dest. Returns False when copy_file_range() did it instead of FICLONE."""
+        try:
+            import fcntl
+        except ImportError:   # Windows
+            fcntl = None
+        ficlone_key = ("ficlone",) + devices
+        try:
+            with open(source, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                with self._unsupported_lock:
+                    use_ficlone = fcntl is not None and ficlone_key not in self._unsupported
+                if use_ficlone:
+                    try:
+                        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                        shared = True
+                    except OSError as e:
+                        if e.errno not in UNSUPPORTED_ERRNOS:
+                            raise
+                        with self._unsupported_lock:
+                            self._unsupported.add(ficlone_key)
+                        use_ficlone = False
+                if not use_ficlone:
+                    if not hasattr(os, 'copy_file_range'):
+                        raise OSError(errno.ENOSYS, "reflink not available", dest)
+                    self._copy_file_range(fsrc.fileno(), fdst.fileno())
+                    shared = False
+            shutil.copystat(source, dest)
+        except BaseException:
+            # The placeholder stays, empty, for the copy fallback (or the error path) to handle
+            with open(dest, 'wb'):
+                pass
+            raise
+        return shared
+
+    def _copy_file_range(self, src_fd: int, dst_fd: int):
+        while n := os.copy_file_range(src_fd, dst_fd, self.chunk_size * 64):
+            if self.rate_limit:
+                self.rate_limit.consume(n)
+
+    def _check_kernel_copy(self, source: str, dest: str, known_hash: Optional[str], size: int) -> TransferResult:
+        """Verifies a copy_file_range() destination: new blocks, checked like copy() checks its own."""
+        metrics.count("transfer.reflink.kernel_copy")
+        if self.verify_mode == self.VERIFY_NONE:
+            written = os.path.getsize(dest)
+            return TransferResult(known_hash or "", "", 0, written, written == size, self.METHOD_REFLINK)
+        bytes_read = 0
+        if not known_hash:
+            known_hash, bytes_read = self.hash_file(source)
+        # No samples were taken while copying: sample mode re-reads the whole file too
+        dst_hash, verify_read = self._hash_uncached(dest)
+        return TransferResult(known_hash, dst_hash, bytes_read + verify_read, size,
+                              dst_hash == known_hash, self.METHOD_REFLINK)
+
+    def _sample_indexes(self, size: int) -> set:
+        blocks = max(1, -(-size // self.chunk_size))
+        if blocks <= self.sample_blocks:
+            return set(range(blocks))
+        if self.sample_blocks < 2:
+            return {0}
+        # First and last block always, the rest evenly spaced in between
+        step = (blocks - 1) / (self.sample_blocks - 1)
+        return {round(i * step) for i in range(self.sample_blocks)}
+
+    def _check_samples(self, dest: str, samples: Dict[int, bytes]) -> Tuple[bool, int]:
+        total = 0
+        with open(dest, 'rb') as f:
+            self._drop_cache(f.fileno())
+            for block, expected in sorted(samples.items()):
+                f.seek(block * self.chunk_size)
+                data = f.read(self.chunk_size)
+                total += len(data)
+                if self.rate_limit:
+                    self.rate_limit.consume(len(data))
+                if hashlib.blake2b(data, digest_size=16).digest() != expected:
+                    return False, total
+        return True, total
+
+    def _hash_uncached(self, file_path: str) -> Tuple[str, int]:
+        with open(file_path, 'rb') as f:
+            self._drop_cache(f.fileno())
+        return self.hash_file(file_path)
+
+    @staticmethod
+    def _drop_cache(fd: int):
+        """Evicts the file from the page cache so the re-read hits the disk (POSIX only)."""
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
@@ -0,0 +1,170 @@
+import os
+import random
+import datetime
+import threading
+from typing import Callable, Dict, Optional
+from .hashing import new_hasher, DEFAULT_ALGORITHM, LEGACY_ALGORITHM
+from .scheduler import TransferScheduler
+from .transfer import TransferEngine
+from ..data.database import SessionDatabase
+from ..utils.ratelimit import TokenBucket
+from ..utils.instrumentation import metrics
+
+
+class MigrationVerifier:
+    """
+    Deep check of the transferred files: each destination is re-hashed with the
+    algorithm of its stored file_hash and compared with it. Reads go through
+    the TransferScheduler (per-device slots, so an HDD archive is read by one
+    worker at a time) and share one TokenBucket, so a nightly run stays under
+    max_mb_per_s whatever the worker count.
+
+    mode full: every file is re-hashed; sample: a random sample_fraction of them.
+    incremental: a file whose size and mtime are still those recorded at its
+    last verification (verified_at) is only stat-ed; changed or never verified
+    files are always re-hashed, and in sample mode the unchanged ones are
+    sampled (bit rot does not touch mtime).
+    """
+    MODE_FULL = "full"
+    MODE_SAMPLE = "sample"
+    MODES = (MODE_FULL, MODE_SAMPLE)
+
+    DONE_STATUSES = ('verified', 'moved')
+    RECORD_BATCH = 500   # Verifications saved per DB batch, so an interrupted run keeps its progress
+
+    def __init__(self, db: SessionDatabase, mode: str = MODE_FULL, incremental: bool = False,
+                 sample_fraction: float = 0.05, max_mb_per_s: Optional[float] = None, max_workers: int = 4,
+                 chunk_size: int = 1024 * 1024, algorithm: str = DEFAULT_ALGORITHM, seed: Optional[int] = None):
+        """algorithm: used for files that have no stored hash yet."""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown verification mode: {mode}")
+        self.db = db
+        self.mode = mode
+        self.incremental = incremental
+        self.sample_fraction = sample_fraction
+        self.bucket = TokenBucket(max_mb_per_s * 1024 * 1024 if max_mb_per_s else None)
+        self.scheduler = TransferScheduler(max_workers=max_workers)
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self.rng = random.Random(seed)
+        self._stop_event = False
+        self._local = threading.local()
+
+    def stop(self):
+        self._stop_event = True
+
+    def run(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+            log_callback: Optional[Callable[[str], None]] = None,
+            issue_callback: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """
+        log_callback: routine messages (scheduler concurrency decisions).
+        issue_callback: missing, corrupted or unreadable files (default: log_callback).
+        """
+        self._stop_event = False
+        self.db.flush()
+        report = {
+            "total": 0,
+            "success": 0,
+            "missing": 0,
+            "corrupted": 0,
+            "errors": 0,       # Destination present but unreadable
+            "hashed": 0,       # Re-hashed and compared
+            "unchanged": 0,    # Incremental: same size/mtime as at the last verification
+            "not_sampled": 0,
+            "unhashed": 0,     # No stored hash: the destination hash becomes the reference
+            "bytes_read": 0,
+        }
+        total = self.db.count_files(statuses=self.DONE_STATUSES)
+        issue_callback = issue_callback or log_callback
+        lock = threading.Lock()
+        pending_records = []
+
+        def finish(outcome: str, row, record: Optional[tuple], bytes_read: int, note: str = "") -> int:
+            with lock:
+                report['total'] += 1
+                report[outcome] += 1
+                report['bytes_read'] += bytes_read
+                if outcome in ('hashed', 'unchanged', 'not_sampled', 'unhashed'):
+                    report['success'] += 1
+                if record:
+                    pending_records.append(record)
+                    if len(pending_records) >= self.RECORD_BATCH:
+                        self.db.record_verifications(pending_records[:])
+                        pending_records.clear()
+                current = report['total']
+            if note and issue_callback:
+                issue_callback(f"{note}: {row['dest_path']}")
+            if progress_callback and (current % 50 == 0 or current == total):
+                progress_callback(current, total)
+            return bytes_read
+
+        def make_job(row, sampled: bool):
+            def job():
+                if not self._stop_event:
+                    return finish(*self._check(row, sampled))
+            return job
+
+        def jobs():
+            for row in self.db.iter_files(statuses=self.DONE_STATUSES):
+                sampled = self.mode == self.MODE_FULL or self.rng.random() < self.sample_fraction
+                # Same path as source and destination: the read slot is taken on the archive's device
+                yield row['dest_path'], row['dest_path'], make_job(row, sampled)
+
+        self.scheduler.run(jobs(), should_stop=lambda: self._stop_event, log_callback=log_callback)
+        if pending_records:
+            self.db.record_verifications(pending_records)
+        self.db.flush()
+        return report
+
+    def _check(self, row, sampled: bool) -> tuple:
+        """(outcome, row, verification record or None, bytes read, log note)."""
+        dest = row['dest_path']
+        try:
+            st = os.stat(dest)
+        except FileNotFoundError:
+            return 'missing', row, (None, None, None, row['source_path']), 0, "Mancante"
+        except OSError:
+            return 'errors', row, None, 0, "Illeggibile"
+
+        changed = (row['verified_at'] is None or row['verified_size'] != st.st_size
+                   or row['verified_mtime_ns'] != st.st_mtime_ns)
+        if self.incremental and not changed and (self.mode == self.MODE_FULL or not sampled):
+            return 'unchanged', row, None, 0, ""
+        if not sampled and not (self.incremental and changed):
+            return 'not_sampled', row, None, 0, ""
+
+        algorithm = (row['hash_algo'] or LEGACY_ALGORITHM) if row['file_hash'] else self.algorithm
+        try:
+            with metrics.timer(f"verify.hash.{algorithm}"):
+                file_hash, bytes_read = self._hash(dest, algorithm)
+        except OSError:
+            return 'errors', row, None, 0, "Illeggibile"
+        metrics.count("verify.bytes", bytes_read)
+
+        record = (datetime.datetime.now().isoformat(timespec='seconds'), st.st_size, st.st_mtime_ns,
+                  row['source_path'])
+        if not row['file_hash']:
+            self.db.set_file_hashes([(file_hash, row['id'])], algorithm)
+            return 'unhashed', row, record, bytes_read, ""
+        if file_hash != row['file_hash']:
+            # Forgotten, so the next incremental run checks it again
+            return 'corrupted', row, (None, None, None, row['source_path']), bytes_read, "Corrotto"
+        return 'hashed', row, record, bytes_read, ""
+
+    def _hash(self, path: str, algorithm: str) -> tuple:
+        """Streams path through the hasher within the byte budget, reading the disk, not the page cache."""
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = self._local.buf = bytearray(self.chunk_size)
+        hasher = new_hasher(algorithm)
+        total = 0
+        with open(path, 'rb', buffering=0) as f:
+            TransferEngine._drop_cache(f.fileno())
+            with memoryview(buf) as view:
+                while n := f.readinto(buf):
+                    hasher.update(view[:n])
+                    total += n
+                    self.bucket.consume(n)
+            # Do not leave a 20 TB pass in the cache, evicting what the machine actually uses
+            TransferEngine._drop_cache(f.fileno())
+        return hasher.hexdigest(), total
@@ -1,14 +1,79 @@
 import sqlite3
 import threading
+import queue
+import time
+import itertools
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Iterator, Sequence
+from ..utils.instrumentation import metrics
 
 class SessionDatabase:
-    def __init__(self, db_path: str = ":memory:"):
+    # Attempts of a write-behind batch while the database is locked by another connection
+    WRITE_RETRIES = 5
+    # Statements shared by the direct path and the write-behind writer
+    SQL_ADD_FILE = """
+        INSERT OR IGNORE INTO files (source_path, file_name, file_size, mime_type)
+        VALUES (?, ?, ?, ?)
+    """
+    SQL_UPDATE_METADATA = """
+        UPDATE files SET date_taken = ?, date_source = ?,
+            file_hash = COALESCE(?, file_hash), hash_algo = COALESCE(?, hash_algo)
+        WHERE source_path = ?
+    """
+    # One row per scanned file: insert, or refresh the metadata of a rescanned path.
+    # A source whose (size, mtime_ns, inode) changed since the last scan is new content:
+    # its hash (unless the row brings the new one) and verification are dropped, and a
+    # 'skipped' row is planned again. Rows already transferred keep theirs: the hash
+    # then describes the archived copy.
+    _SQL_SOURCE_CHANGED = """(files.status NOT IN ('verified', 'moved') AND NOT (
+            files.file_size = excluded.file_size AND files.source_mtime_ns IS excluded.source_mtime_ns
+            AND files.source_inode IS excluded.source_inode))"""
+    SQL_UPSERT_FILE = f"""
+        INSERT INTO files (source_path, file_name, file_size, mime_type, date_taken, date_source, file_hash, hash_algo,
+                           source_mtime_ns, source_inode)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_path) DO UPDATE SET
+            file_size = excluded.file_size, mime_type = excluded.mime_type,
+            date_taken = excluded.date_taken, date_source = excluded.date_source,
+            source_mtime_ns = excluded.source_mtime_ns, source_inode = excluded.source_inode,
+            hash_algo = CASE WHEN excluded.file_hash IS NOT NULL THEN excluded.hash_algo
+                             WHEN {_SQL_SOURCE_CHANGED} THEN NULL ELSE files.hash_algo END,
+            file_hash = CASE WHEN excluded.file_hash IS NOT NULL THEN excluded.file_hash
+                             WHEN {_SQL_SOURCE_CHANGED} THEN NULL ELSE files.file_hash END,
+            verified_at = CASE WHEN {_SQL_SOURCE_CHANGED} THEN NULL ELSE files.verified_at END,
+            verified_size = CASE WHEN {_SQL_SOURCE_CHANGED} THEN NULL ELSE files.verified_size END,
+            verified_mtime_ns = CASE WHEN {_SQL_SOURCE_CHANGED} THEN NULL ELSE files.verified_mtime_ns END,
+            error_msg = CASE WHEN {_SQL_SOURCE_CHANGED} AND files.status = 'skipped' THEN NULL ELSE files.error_msg END,
+            status = CASE WHEN {_SQL_SOURCE_CHANGED} AND files.status = 'skipped' THEN 'pending' ELSE files.status END
+    """
+    SQL_SET_DESTINATION = "UPDATE files SET dest_path = ? WHERE source_path = ?"
+    SQL_UPDATE_STATUS = "UPDATE files SET status = ?, error_msg = ? WHERE source_path = ?"
+    SQL_RECORD_IO = "UPDATE files SET bytes_read = ?, bytes_written = ? WHERE source_path = ?"
+    SQL_RECORD_VERIFICATION = """
+        UPDATE files SET verified_at = ?, verified_size = ?, verified_mtime_ns = ? WHERE source_path = ?
+    """
+
+    def __init__(self, db_path: str = ":memory:", write_behind: bool = False,
+                 batch_size: int = 500, flush_interval: float = 0.05, queue_size: int = 10000):
+        """
+        write_behind: writes are queued and applied by a single writer thread,
+        grouped with executemany in one transaction per batch_size rows or
+        flush_interval seconds. Call flush() at phase boundaries before reading.
+        """
         self.db_path = db_path
         self._local = threading.local()
         self._init_db()
 
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self.lost_writes = 0   # Write-behind writes SQLite refused even one at a time
+        if write_behind:
+            self.batch_size = batch_size
+            self.flush_interval = flush_interval
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._writer = threading.Thread(target=self._writer_loop, name="SessionDBWriter", daemon=True)
+            self._writer.start()
+
     def _get_conn(self):
         if not hasattr(self._local, "conn"):
             self._local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
@@ -29,15 +94,46 @@ class SessionDatabase:
                 file_name TEXT,
                 file_size INTEGER,
                 file_hash TEXT,
+                hash_algo TEXT, -- algorithm of file_hash (NULL: md5, sessions before it was recorded)
                 mime_type TEXT,
                 date_taken TEXT,
                 date_source TEXT,
                 dest_path TEXT,
                 status TEXT DEFAULT 'pending', -- pending, skipped, copied, verified, error
-                error_msg TEXT
+                error_msg TEXT,
+                bytes_read INTEGER DEFAULT 0,
+                bytes_written INTEGER DEFAULT 0,
+                verified_at TEXT, -- last time the destination matched file_hash (ISO 8601)
+                verified_size INTEGER, -- destination size and mtime_ns at verified_at
+                verified_mtime_ns INTEGER,
+                source_mtime_ns INTEGER, -- source mtime_ns and inode at the last scan:
+                source_inode INTEGER -- file_hash is the content seen with this stamp
             )
         """)
+        self._add_missing_columns(cursor, "files", {
+            "bytes_read": "INTEGER DEFAULT 0",
+            "bytes_written": "INTEGER DEFAULT 0",
+            "hash_algo": "TEXT",
+            "verified_at": "TEXT",
+            "verified_size": "INTEGER",
+            "verified_mtime_ns": "INTEGER",
+            "source_mtime_ns": "INTEGER",
+            "source_inode": "INTEGER",
+        })
         
+        # Secondary indexes so each phase can stream just the rows it needs
+        for column in ("status", "file_hash", "date_taken", "dest_path", "file_size", "file_name"):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_files_{column} ON files({column})")
+
+        # Duplicate groups found by the dedup stage (primary = lowest id of the group)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS duplicates (
+                file_id INTEGER PRIMARY KEY,
+                group_hash TEXT,
+                primary_id INTEGER
+            )
+        """)
+
         # Table for summary stats
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS stats (
@@ -45,25 +141,139 @@ class SessionDatabase:
                 value INTEGER
             )
         """)
+
+        # Session settings shared between commands (e.g. the library root chosen at plan time)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
         
         conn.commit()
         conn.close()
 
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+        """Upgrades a session DB created by an older version in place."""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    # --- Write-behind ---
+
+    def _writer_loop(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with metrics.timer("db.writer.batch"):
+                try:
+                    running = self._apply_batch(conn, batch)
+                except Exception as e:
+                    # Never let one bad batch kill the writer: every later flush() would wait forever
+                    lost = sum(1 for kind, _ in batch if kind == "write")
+                    self.lost_writes += lost
+                    metrics.count("db.writer.lost", lost)
+                    print(f"DB Error write-behind writer, {lost} writes lost: {e}")
+                    for kind, payload in batch:
+                        if kind == "barrier":
+                            payload.set()
+                    running = not any(kind == "stop" for kind, _ in batch)
+        conn.close()
+
+    def _apply_batch(self, conn, batch) -> bool:
+        """
+        Applies queued writes in order, grouping runs of the same statement. Returns False on stop.
+        A failed batch is retried while the database is locked, then applied one write at a
+        time so only the writes SQLite refuses are lost (each one reported).
+        """
+        barriers = [payload for kind, payload in batch if kind == "barrier"]
+        writes = [payload for kind, payload in batch if kind == "write"]
+        try:
+            for attempt in range(self.WRITE_RETRIES):
+                try:
+                    for sql, group in itertools.groupby(writes, key=lambda write: write[0]):
+                        conn.executemany(sql, [params for _, params in group])
+                    conn.commit()
+                    metrics.count("db.writer.ops", len(batch))
+                    break
+                except sqlite3.OperationalError as e:
+                    conn.rollback()
+                    if not self._is_transient(e) or attempt == self.WRITE_RETRIES - 1:
+                        print(f"DB Error write-behind batch ({len(writes)} ops): {e}")
+                        self._apply_one_by_one(conn, writes)
+                        break
+                    time.sleep(0.1 * (attempt + 1))
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    print(f"DB Error write-behind batch ({len(writes)} ops): {e}")
+                    self._apply_one_by_one(conn, writes)
+                    break
+        finally:
+            for event in barriers:
+                event.set()
+        return not any(kind == "stop" for kind, _ in batch)
+
+    def _apply_one_by_one(self, conn, writes: List[tuple]):
+        for sql, params in writes:
+            try:
+                conn.execute(sql, params)
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                self.lost_writes += 1
+                metrics.count("db.writer.lost")
+                print(f"DB Error write-behind, write lost: {e} ({' '.join(sql.split())[:60]}... {params})")
+
+    @staticmethod
+    def _is_transient(error: sqlite3.OperationalError) -> bool:
+        return "locked" in str(error) or "busy" in str(error)
+
+    def _enqueue(self, sql: str, params) -> bool:
+        """Queues a write when write-behind is on. Returns False if the caller must write directly."""
+        if self._queue is None or not self._writer.is_alive():
+            return False
+        self._queue.put(("write", (sql, params)))
+        return True
+
+    @metrics.timed("db.flush")
+    def flush(self):
+        """Barrier: returns once every write queued before the call is committed."""
+        if self._queue is None:
+            return
+        done = threading.Event()
+        self._queue.put(("barrier", done))
+        while not done.wait(0.5):
+            if not self._writer.is_alive():
+                raise sqlite3.OperationalError("Session DB writer stopped: queued writes were not committed")
+
+    # ---
+
+    @metrics.timed("db.add_file")
     def add_file(self, path: str, name: str, size: int, mime: str = "unknown"):
+        if self._enqueue(self.SQL_ADD_FILE, (path, name, size, mime)):
+            return
         conn = self._get_conn()
         retries = 5
         while retries > 0:
             try:
-                conn.execute("""
-                    INSERT OR IGNORE INTO files (source_path, file_name, file_size, mime_type)
-                    VALUES (?, ?, ?, ?)
-                """, (path, name, size, mime))
+                conn.execute(self.SQL_ADD_FILE, (path, name, size, mime))
                 conn.commit()
                 return
             except sqlite3.OperationalError as e:
                 if "locked" in str(e):
                     retries -= 1
-                    import time
                     time.sleep(0.1)
                 else:
                     print(f"DB Error add_file: {e}")
@@ -72,7 +282,30 @@ class SessionDatabase:
                 print(f"DB Error add_file: {e}")
                 break
 
-    def update_metadata(self, source_path: str, date_taken: str, date_source: str, file_hash: str = None):
+    @metrics.timed("db.add_files")
+    def add_files(self, rows: Sequence[tuple]):
+        """
+        Bulk insert of scanned files in one transaction.
+        rows: (path, name, size, mime, date_taken, date_source, file_hash, hash_algo, mtime_ns, inode)
+        """
+        if self._queue is not None:
+            for row in rows:
+                self._enqueue(self.SQL_UPSERT_FILE, row)
+            return
+        conn = self._get_conn()
+        try:
+            conn.executemany(self.SQL_UPSERT_FILE, rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB Error add_files: {e}")
+            conn.rollback()
+
+    @metrics.timed("db.update_metadata")
+    def update_metadata(self, source_path: str, date_taken: str, date_source: str, file_hash: str = None,
+                        hash_algo: str = None):
+        if self._enqueue(self.SQL_UPDATE_METADATA, (date_taken, date_source, file_hash or None,
+                                                    hash_algo if file_hash else None, source_path)):
+            return
         conn = self._get_conn()
         updates = ["date_taken = ?", "date_source = ?"]
         params = [date_taken, date_source]
@@ -80,6 +313,8 @@ class SessionDatabase:
         if file_hash:
             updates.append("file_hash = ?")
             params.append(file_hash)
+            updates.append("hash_algo = ?")
+            params.append(hash_algo)
             
         params.append(source_path)
         
@@ -87,38 +322,370 @@ class SessionDatabase:
         conn.execute(sql, params)
         conn.commit()
 
+    @metrics.timed("db.set_destination")
     def set_destination(self, source_path: str, dest_path: str):
+        if self._enqueue(self.SQL_SET_DESTINATION, (dest_path, source_path)):
+            return
         conn = self._get_conn()
-        conn.execute("UPDATE files SET dest_path = ? WHERE source_path = ?", (dest_path, source_path))
+        conn.execute(self.SQL_SET_DESTINATION, (dest_path, source_path))
         conn.commit()
 
+    @metrics.timed("db.plan_destinations")
+    def plan_destinations(self, expression: str, params: Sequence,
+                          resolve_conflicts: Callable[[List[sqlite3.Row], Callable[[str], bool]], List[tuple]],
+                          exclude_statuses: Optional[Sequence[str]] = None, batch_size: int = 50000,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          should_stop: Callable[[], bool] = lambda: False) -> Dict[str, int]:
+        """
+        Sets dest_path = expression (SQL over the files columns) on every row,
+        one id range of batch_size rows per UPDATE, then hands each group of
+        rows sharing a dest_path (in id order) to resolve_conflicts(rows, is_taken),
+        which returns [(new_dest_path, id), ...]. is_taken(path) tells whether a
+        path is already planned. Everything is one transaction: a stop rolls the
+        whole plan back.
+        Returns {"planned": rows, "conflicts": rows moved to another name}.
+        """
+        self.flush()
+        conn = self._get_conn()
+        clause, filter_params = self._filter_clause(None, exclude_statuses, None)
+        # Two statements: SQLite answers a lone MIN or MAX from the rowid b-tree, both at once needs a scan
+        low = conn.execute("SELECT MIN(id) FROM files").fetchone()[0]
+        high = conn.execute("SELECT MAX(id) FROM files").fetchone()[0]
+        total = self.count_files(exclude_statuses=exclude_statuses)
+        report = {"planned": 0, "conflicts": 0}
+        if low is None:
+            return report
+
+        update = f"UPDATE files SET dest_path = {expression} WHERE id >= ? AND id < ?{clause}"
+        try:
+            # Rebuilding the dest_path index once (a sort) is much faster than
+            # a random index update per row. sqlite3 does not open a transaction
+            # before DDL by itself: without this BEGIN the DROP would be committed
+            # on the spot and a rollback would leave the table unindexed
+            conn.execute("BEGIN")
+            conn.execute("DROP INDEX IF EXISTS idx_files_dest_path")
+            for start in range(low, high + 1, batch_size):
+                if should_stop():
+                    conn.rollback()
+                    return {"planned": 0, "conflicts": 0}
+                with metrics.timer("db.plan_destinations.batch"):
+                    cur = conn.execute(update, (*params, start, start + batch_size, *filter_params))
+                report["planned"] += cur.rowcount
+                if progress_callback:
+                    progress_callback(report["planned"], total)
+            with metrics.timer("db.plan_destinations.index"):
+                conn.execute("CREATE INDEX idx_files_dest_path ON files(dest_path)")
+
+            # Groups are collected first: the updates must not run under an open cursor on dest_path
+            assigned = set()
+
+            def is_taken(path: str) -> bool:
+                return path in assigned or conn.execute(
+                    "SELECT 1 FROM files WHERE dest_path = ? LIMIT 1", (path,)).fetchone() is not None
+
+            # The inner query only reads the dest_path index; the filter applies to the few rows found
+            shared = conn.execute(f"""
+                SELECT * FROM files WHERE dest_path IN (
+                    SELECT dest_path FROM files WHERE dest_path IS NOT NULL
+                    GROUP BY dest_path HAVING COUNT(*) > 1){clause}
+                ORDER BY dest_path, id
+            """, filter_params).fetchall()
+            moves = []
+            for _, group in itertools.groupby(shared, key=lambda row: row['dest_path']):
+                for dest_path, file_id in resolve_conflicts(list(group), is_taken):
+                    assigned.add(dest_path)
+                    moves.append((dest_path, file_id))
+            conn.executemany("UPDATE files SET dest_path = ? WHERE id = ?", moves)
+            report["conflicts"] = len(moves)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return report
+
+    @metrics.timed("db.update_status")
     def update_status(self, source_path: str, status: str, error_msg: str = None):
+        if self._enqueue(self.SQL_UPDATE_STATUS, (status, error_msg, source_path)):
+            return
+        conn = self._get_conn()
+        conn.execute(self.SQL_UPDATE_STATUS, (status, error_msg, source_path))
+        conn.commit()
+
+    @metrics.timed("db.record_io")
+    def record_io(self, source_path: str, bytes_read: int, bytes_written: int):
+        if self._enqueue(self.SQL_RECORD_IO, (bytes_read, bytes_written, source_path)):
+            return
         conn = self._get_conn()
-        conn.execute("UPDATE files SET status = ?, error_msg = ? WHERE source_path = ?", 
-                     (status, error_msg, source_path))
+        conn.execute(self.SQL_RECORD_IO, (bytes_read, bytes_written, source_path))
         conn.commit()
 
+    @metrics.timed("db.record_verifications")
+    def record_verifications(self, rows: Sequence[tuple]):
+        """
+        rows: (verified_at, size, mtime_ns, source_path) of destinations found
+        matching their hash; (None, None, None, source_path) forgets a verification.
+        """
+        if self._queue is not None:
+            for row in rows:
+                self._enqueue(self.SQL_RECORD_VERIFICATION, row)
+            return
+        conn = self._get_conn()
+        try:
+            conn.executemany(self.SQL_RECORD_VERIFICATION, rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB Error record_verifications: {e}")
+            conn.rollback()
+
+    @staticmethod
+    def _filter_clause(statuses: Optional[Sequence[str]], exclude_statuses: Optional[Sequence[str]],
+                       has_dest: Optional[bool]) -> tuple[str, list]:
+        conditions, params = [], []
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if exclude_statuses:
+            conditions.append(f"status NOT IN ({', '.join('?' * len(exclude_statuses))})")
+            params.extend(exclude_statuses)
+        if has_dest is not None:
+            conditions.append("dest_path IS NOT NULL" if has_dest else "dest_path IS NULL")
+        return "".join(f" AND {c}" for c in conditions), params
+
+    def iter_files(self, statuses: Optional[Sequence[str]] = None, exclude_statuses: Optional[Sequence[str]] = None,
+                   has_dest: Optional[bool] = None, page_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """
+        Streams rows in id order with keyset pagination (WHERE id > last_id LIMIT n).
+        Only one page is held in memory and no cursor stays open between pages,
+        so callers may update the rows they are iterating.
+        """
+        conn = self._get_conn()
+        clause, params = self._filter_clause(statuses, exclude_statuses, has_dest)
+        sql = f"SELECT * FROM files WHERE id > ?{clause} ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            with metrics.timer("db.iter_files.page"):
+                rows = conn.execute(sql, (last_id, *params, page_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]['id']
+
+    # Columns the preview may sort on (each has an index, which also carries the id)
+    SORTABLE_COLUMNS = ("id", "file_name", "file_size", "date_taken", "dest_path", "status")
+
+    @metrics.timed("db.fetch_page")
+    def fetch_page(self, order_by: str = "id", descending: bool = False, statuses: Optional[Sequence[str]] = None,
+                   after: Optional[tuple] = None, limit: int = 500) -> List[sqlite3.Row]:
+        """
+        One page of rows sorted on order_by (ties broken by id), for views that
+        load on demand. after is (order_by value, id) of the last row already
+        fetched: keyset pagination makes every page an index seek, however deep.
+        NULLs sort first ascending and last descending, as SQLite does.
+        """
+        if order_by not in self.SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort on {order_by!r}")
+        clause, params = self._filter_clause(statuses, None, None)
+        direction = "DESC" if descending else "ASC"
+        cmp = "<" if descending else ">"
+        value, last_id = after if after is not None else (None, None)
+
+        # Segments in display order, each (condition, params, ORDER BY). The NULL run
+        # and the non-NULL values are queried separately: an OR across them would
+        # turn the index seek into a scan from the start.
+        if order_by == "id":
+            segments = [(f"id {cmp} ?" if after else "1", [last_id] if after else [], f"id {direction}")]
+        else:
+            null_order, value_order = f"id {direction}", f"{order_by} {direction}, id {direction}"
+            nulls = (f"{order_by} IS NULL", [], null_order)
+            values = (f"{order_by} IS NOT NULL", [], value_order)
+            if after is None:
+                segments = [values, nulls] if descending else [nulls, values]
+            elif value is None:
+                rest_of_nulls = (f"{order_by} IS NULL AND id {cmp} ?", [last_id], null_order)
+                segments = [rest_of_nulls] if descending else [rest_of_nulls, values]
+            else:
+                rest_of_values = (f"({order_by}, id) {cmp} (?, ?)", [value, last_id], value_order)
+                segments = [rest_of_values, nulls] if descending else [rest_of_values]
+
+        conn = self._get_conn()
+        rows: List[sqlite3.Row] = []
+        for condition, key_params, order in segments:
+            sql = f"SELECT * FROM files WHERE {condition}{clause} ORDER BY {order} LIMIT ?"
+            rows.extend(conn.execute(sql, (*key_params, *params, limit - len(rows))).fetchall())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def iter_pending_files(self, page_size: int = 1000) -> Iterator[sqlite3.Row]:
+        return self.iter_files(statuses=('pending',), page_size=page_size)
+
+    @metrics.timed("db.count_files")
+    def count_files(self, statuses: Optional[Sequence[str]] = None, exclude_statuses: Optional[Sequence[str]] = None,
+                    has_dest: Optional[bool] = None) -> int:
+        conn = self._get_conn()
+        clause, params = self._filter_clause(statuses, exclude_statuses, has_dest)
+        return conn.execute(f"SELECT COUNT(*) FROM files WHERE 1{clause}", params).fetchone()[0]
+
+    @metrics.timed("db.get_shared_destinations")
+    def get_shared_destinations(self, exclude_statuses: Optional[Sequence[str]] = None,
+                                key: Optional[Callable[[str], str]] = None) -> set:
+        """
+        dest_path values planned for more than one source file; with key, the
+        key(dest_path) values shared by more than one (grouped by SQLite, not in memory).
+        """
+        conn = self._get_conn()
+        clause, params = self._filter_clause(None, exclude_statuses, True)
+        column = "dest_path"
+        if key:
+            conn.create_function("dest_key", 1, key, deterministic=True)
+            column = "dest_key(dest_path)"
+        rows = conn.execute(f"SELECT {column} AS k FROM files WHERE 1{clause} GROUP BY k HAVING COUNT(*) > 1",
+                            params)
+        return {row[0] for row in rows}
+
+    def iter_size_collisions(self, exclude_statuses: Optional[Sequence[str]] = None,
+                             page_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """
+        Streams rows whose file_size is shared with at least one other row,
+        ordered by (file_size, id) with keyset pagination.
+        """
+        conn = self._get_conn()
+        clause, params = self._filter_clause(None, exclude_statuses, None)
+        sql = f"""
+            SELECT id, source_path, file_size, file_hash, hash_algo FROM files
+            WHERE (file_size, id) > (?, ?){clause} AND file_size IN (
+                SELECT file_size FROM files WHERE file_size > 0{clause}
+                GROUP BY file_size HAVING COUNT(*) > 1)
+            ORDER BY file_size, id LIMIT ?
+        """
+        last = (-1, 0)
+        while True:
+            with metrics.timer("db.iter_size_collisions.page"):
+                rows = conn.execute(sql, (*last, *params, *params, page_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = (rows[-1]['file_size'], rows[-1]['id'])
+
+    @metrics.timed("db.set_file_hashes")
+    def set_file_hashes(self, pairs: Sequence[tuple], hash_algo: str):
+        """Bulk update of (file_hash, id) pairs, all computed with hash_algo."""
+        conn = self._get_conn()
+        conn.executemany("UPDATE files SET file_hash = ?, hash_algo = ? WHERE id = ?",
+                         [(file_hash, hash_algo, file_id) for file_hash, file_id in pairs])
+        conn.commit()
+
+    @metrics.timed("db.reset_duplicates")
+    def reset_duplicates(self):
+        conn = self._get_conn()
+        conn.execute("DELETE FROM duplicates")
+        conn.commit()
+
+    @metrics.timed("db.add_duplicate_groups")
+    def add_duplicate_groups(self, groups: Sequence[tuple]):
+        """groups: (file_hash, [ids]) with at least two ids each."""
+        conn = self._get_conn()
+        conn.executemany("INSERT OR REPLACE INTO duplicates (file_id, group_hash, primary_id) VALUES (?, ?, ?)",
+                         [(file_id, file_hash, min(ids)) for file_hash, ids in groups for file_id in ids])
+        conn.commit()
+
+    @metrics.timed("db.release_stale_duplicates")
+    def release_stale_duplicates(self) -> int:
+        """
+        Drops the duplicate groups a member no longer matches (its source changed
+        since dedup, so its file_hash was cleared or replaced); rows skipped as
+        copies in those groups are planned again. Returns the rows released.
+        """
+        conn = self._get_conn()
+        stale = """
+            SELECT d.group_hash FROM duplicates d JOIN files f ON f.id = d.file_id
+            WHERE f.file_hash IS NOT d.group_hash
+        """
+        cur = conn.execute(f"""
+            UPDATE files SET status = 'pending', error_msg = NULL
+            WHERE status = 'skipped' AND error_msg LIKE 'Duplicato di %'
+              AND id IN (SELECT file_id FROM duplicates WHERE file_id != primary_id AND group_hash IN ({stale}))
+        """)
+        conn.execute(f"DELETE FROM duplicates WHERE group_hash IN ({stale})")
+        conn.commit()
+        return cur.rowcount
+
+    @metrics.timed("db.skip_duplicates")
+    def skip_duplicates(self) -> int:
+        """Marks every non-primary duplicate still to transfer as 'skipped'. Returns the count."""
+        self.release_stale_duplicates()
+        conn = self._get_conn()
+        cur = conn.execute("""
+            UPDATE files SET status = 'skipped', dest_path = NULL,
+                error_msg = 'Duplicato di ' || (SELECT p.source_path FROM duplicates d
+                                               JOIN files p ON p.id = d.primary_id WHERE d.file_id = files.id)
+            WHERE id IN (SELECT file_id FROM duplicates WHERE file_id != primary_id)
+              AND status IN ('pending', 'error')
+        """)
+        conn.commit()
+        return cur.rowcount
+
+    @metrics.timed("db.mark_skipped")
+    def mark_skipped(self, pairs: Sequence[tuple], statuses: Sequence[str] = ('pending', 'error')) -> int:
+        """(reason, id) pairs: those rows still in one of statuses become 'skipped' with reason as error_msg."""
+        conn = self._get_conn()
+        cur = conn.executemany(f"""
+            UPDATE files SET status = 'skipped', dest_path = NULL, error_msg = ?
+            WHERE id = ? AND status IN ({', '.join('?' * len(statuses))})
+        """, [(reason, file_id, *statuses) for reason, file_id in pairs])
+        conn.commit()
+        return cur.rowcount
+
+    @metrics.timed("db.get_all_files")
     def get_all_files(self) -> List[sqlite3.Row]:
         conn = self._get_conn()
         return conn.execute("SELECT * FROM files").fetchall()
 
+    @metrics.timed("db.get_pending_files")
     def get_pending_files(self) -> List[sqlite3.Row]:
         conn = self._get_conn()
         return conn.execute("SELECT * FROM files WHERE status = 'pending'").fetchall()
         
+    @metrics.timed("db.get_stats")
     def get_stats(self) -> Dict[str, int]:
         conn = self._get_conn()
         total = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
         processed = conn.execute("SELECT COUNT(*) FROM files WHERE status IN ('copied', 'verified')").fetchone()[0]
         errors = conn.execute("SELECT COUNT(*) FROM files WHERE status = 'error'").fetchone()[0]
         size = conn.execute("SELECT SUM(file_size) FROM files").fetchone()[0] or 0
+        io_read, io_written = conn.execute("SELECT SUM(bytes_read), SUM(bytes_written) FROM files").fetchone()
         return {
             "total_files": total,
             "processed": processed,
             "errors": errors,
-            "total_size_bytes": size
+            "total_size_bytes": size,
+            "bytes_read": io_read or 0,
+            "bytes_written": io_written or 0
         }
 
+    def save_stats(self, values: Dict[str, int]):
+        """Stores key/value pairs (e.g. instrumentation.metrics.flat_stats()) in the stats table."""
+        conn = self._get_conn()
+        conn.executemany("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)", values.items())
+        conn.commit()
+
+    def load_stats(self, prefix: str = "") -> Dict[str, int]:
+        conn = self._get_conn()
+        rows = conn.execute("SELECT key, value FROM stats WHERE key LIKE ? ORDER BY key", (prefix + "%",))
+        return {key: value for key, value in rows}
+
+    def set_setting(self, key: str, value: Optional[str]):
+        conn = self._get_conn()
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        conn.commit()
+
+    def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._get_conn().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row and row[0] is not None else default
+
     def close(self):
+        if self._queue is not None and self._writer.is_alive():
+            self._queue.put(("stop", None))
+            self._writer.join()
         if hasattr(self._local, "conn"):
             self._local.conn.close()
@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class LibraryCatalog:
+    """
+    Persistent index of the content a destination library already holds:
+    relative path -> (size, hash, algorithm). It lives in the library itself
+    (FILE_NAME at its root), so every session that imports into the library,
+    from any machine or mount point, sees what earlier imports archived.
+    Hashes are filled lazily: a file indexed by sync() is only hashed the
+    first time a new import has a file of the same size, then kept.
+    """
+    FILE_NAME = ".organizer_catalog.db"
+    # Writes are buffered and committed together every FLUSH_EVERY operations
+    FLUSH_EVERY = 500
+    # Sizes per "IN (...)" lookup (well below SQLite's host parameter limit)
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.db_path = os.path.join(self.root, self.FILE_NAME)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._init_db()
+
+    def _get_conn(self):
+        if not hasattr(self._local, "conn"):
+            self._local.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._local.conn.row_factory = sqlite3.Row
+        return self._local.conn
+
+    def _init_db(self):
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS contents (
+                path TEXT PRIMARY KEY, -- relative to the library root, '/' separated
+                size INTEGER,
+                file_hash TEXT, -- NULL until a same-sized file needs it
+                hash_algo TEXT,
+                added_at INTEGER
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_contents_size ON contents(size)")
+        conn.commit()
+        conn.close()
+
+    # --- Paths ---
+
+    def relative(self, path: str) -> Optional[str]:
+        """Catalog key of an absolute path, or None if it is outside the library."""
+        try:
+            rel = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:   # Another drive (Windows)
+            return None
+        if rel == os.curdir or rel.startswith(os.pardir + os.sep) or rel == os.pardir or os.path.isabs(rel):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def absolute(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split("/"))
+
+    # --- Lookup / Store ---
+
+    def lookup_sizes(self, sizes: Iterable[int]) -> Dict[int, List[sqlite3.Row]]:
+        """size -> catalog rows (path, size, file_hash, hash_algo) with that size, for the sizes present."""
+        self.flush()
+        conn = self._get_conn()
+        sizes = list(sizes)
+        found: Dict[int, List[sqlite3.Row]] = {}
+        for i in range(0, len(sizes), self.LOOKUP_CHUNK):
+            chunk = sizes[i:i + self.LOOKUP_CHUNK]
+            rows = conn.execute(f"SELECT path, size, file_hash, hash_algo FROM contents "
+                                f"WHERE size IN ({', '.join('?' * len(chunk))})", chunk)
+            for row in rows:
+                found.setdefault(row['size'], []).append(row)
+        return found
+
+    def add(self, path: str, size: int, file_hash: Optional[str], hash_algo: Optional[str]):
+        """Records a file archived under the library (ignored if path is outside it)."""
+        rel = self.relative(path)
+        if rel is None:
+            return
+        with self._lock:
+            self._pending.append((rel, size, file_hash or None, hash_algo if file_hash else None, int(time.time())))
+            if len(self._pending) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def set_hashes(self, rows: Sequence[Tuple[str, str, str]]):
+        """(file_hash, hash_algo, relative path) computed for entries found without a usable hash."""
+        self.flush()
+        conn = self._get_conn()
+        conn.executemany("UPDATE contents SET file_hash = ?, hash_algo = ? WHERE path = ?", rows)
+        conn.commit()
+
+    def remove(self, rel_paths: Sequence[str]):
+        """Forgets entries whose file is no longer in the library."""
+        self.flush()
+        conn = self._get_conn()
+        conn.executemany("DELETE FROM contents WHERE path = ?", [(p,) for p in rel_paths])
+        conn.commit()
+
+    def sync(self, files: Iterable[Tuple[str, int]], should_stop: Callable[[], bool] = lambda: False,
+             batch_size: int = 5000) -> Dict[str, int]:
+        """
+        Makes the catalog match a walk of the library: files yields (absolute path, size).
+        New files are added without a hash, files whose size changed lose theirs,
+        entries not seen in the walk are removed (unless the walk was stopped).
+        """
+        self.flush()
+        conn = self._get_conn()
+        before = conn.execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.seen")
+        now = int(time.time())
+        batch = []
+
+        def write(rows):
+            conn.executemany("""
+                INSERT INTO contents (path, size, added_at) VALUES (?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET size = excluded.size, file_hash = NULL, hash_algo = NULL
+                WHERE contents.size != excluded.size
+            """, rows)
+            conn.executemany("INSERT OR IGNORE INTO temp.seen (path) VALUES (?)", [(r[0],) for r in rows])
+
+        for path, size in files:
+            rel = self.relative(path)
+            if rel is None or rel.startswith(self.FILE_NAME):
+                continue
+            batch.append((rel, size, now))
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+        seen = conn.execute("SELECT COUNT(*) FROM temp.seen").fetchone()[0]
+        removed = 0
+        if not should_stop():
+            removed = conn.execute("DELETE FROM contents WHERE path NOT IN (SELECT path FROM temp.seen)").rowcount
+        conn.execute("DELETE FROM temp.seen")
+        conn.commit()
+        return {"files": seen, "added": seen - (before - removed), "removed": removed}
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        conn = self._get_conn()
+        try:
+            conn.executemany("INSERT OR REPLACE INTO contents (path, size, file_hash, hash_algo, added_at) "
+                             "VALUES (?, ?, ?, ?, ?)", self._pending)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Library catalog error: {e}")
+            conn.rollback()
+        self._pending = []
+
+    def count(self) -> int:
+        self.flush()
+        return self._get_conn().execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        if hasattr(self._local, "conn"):
+            self._local.conn.close()
+            del self._local.conn
@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Optional, Dict, Any, List
+
+
+class MetadataCache:
+    """
+    Persistent cache of extracted metadata, shared across sessions.
+    An entry is valid only while (path, size, mtime_ns, inode) are unchanged,
+    so a rescan of an unchanged tree only costs the walk and the stat calls.
+    """
+    # Writes are buffered and committed together every FLUSH_EVERY operations
+    FLUSH_EVERY = 500
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 2_000_000):
+        self.db_path = db_path or self.default_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending_store: List[tuple] = []
+        self._pending_touch: List[tuple] = []
+        self._pending_hash: List[tuple] = []
+        self._init_db()
+
+    @staticmethod
+    def default_path() -> str:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(base, "organizer_foto_pro", "metadata_cache.db")
+
+    def _get_conn(self):
+        if not hasattr(self._local, "conn"):
+            self._local.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._local.conn.row_factory = sqlite3.Row
+        return self._local.conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                date_taken TEXT,
+                date_source TEXT,
+                mime_type TEXT,
+                file_hash TEXT,
+                last_used INTEGER,
+                hash_algo TEXT
+            )
+        """)
+        # Caches written before hashes recorded their algorithm (NULL there means md5)
+        if "hash_algo" not in {row[1] for row in conn.execute("PRAGMA table_info(entries)")}:
+            conn.execute("ALTER TABLE entries ADD COLUMN hash_algo TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        conn.commit()
+        conn.close()
+
+    # --- Lookup / Store ---
+
+    def lookup(self, path: str, st: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Returns the cached metadata if the file is unchanged, otherwise None."""
+        row = self._get_conn().execute(
+            "SELECT size, mtime_ns, inode, date_taken, date_source, mime_type, file_hash, hash_algo "
+            "FROM entries WHERE path = ?",
+            (path,)).fetchone()
+        with self._lock:
+            if row and (row['size'], row['mtime_ns'], row['inode']) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                self.hits += 1
+                self._pending_touch.append((int(time.time()), path))
+                hit = dict(row)
+            else:
+                self.misses += 1
+                hit = None
+            if len(self._pending_store) + len(self._pending_touch) >= self.FLUSH_EVERY:
+                self._flush_locked()
+        return hit
+
+    def store(self, path: str, st: os.stat_result, date_taken: str, date_source: str,
+              mime_type: str, file_hash: Optional[str] = None, hash_algo: Optional[str] = None):
+        with self._lock:
+            self._pending_store.append((path, st.st_size, st.st_mtime_ns, st.st_ino, date_taken,
+                                        date_source, mime_type, file_hash, int(time.time()), hash_algo))
+            if len(self._pending_store) + len(self._pending_touch) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def update_hash(self, path: str, size: int, file_hash: str, hash_algo: str):
+        """Attaches a hash computed later (e.g. during transfer) to a still-matching entry."""
+        with self._lock:
+            self._pending_hash.append((file_hash, hash_algo, path, size))
+            if len(self._pending_hash) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not (self._pending_store or self._pending_touch or self._pending_hash):
+            return
+        conn = self._get_conn()
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO entries (path, size, mtime_ns, inode, date_taken, date_source,
+                                                mime_type, file_hash, last_used, hash_algo)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, self._pending_store)
+            conn.executemany("UPDATE entries SET last_used = ? WHERE path = ?", self._pending_touch)
+            conn.executemany("UPDATE entries SET file_hash = ?, hash_algo = ? WHERE path = ? AND size = ?",
+                             self._pending_hash)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Metadata cache error: {e}")
+            conn.rollback()
+        self._pending_store = []
+        self._pending_touch = []
+        self._pending_hash = []
+
+    # --- Maintenance ---
+
+    def prune(self) -> int:
+        """Evicts the least recently used entries above max_entries. Returns the number removed."""
+        with self._lock:
+            self._flush_locked()
+            conn = self._get_conn()
+            excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess <= 0:
+                return 0
+            conn.execute("DELETE FROM entries WHERE path IN (SELECT path FROM entries ORDER BY last_used LIMIT ?)",
+                         (excess,))
+            conn.commit()
+            return excess
+
+    def invalidate(self, path_prefix: Optional[str] = None) -> int:
+        """Drops every entry under path_prefix (all entries when None). Returns the number removed."""
+        with self._lock:
+            self._flush_locked()
+            conn = self._get_conn()
+            if path_prefix is None:
+                cur = conn.execute("DELETE FROM entries")
+            else:
+                prefix = os.path.abspath(path_prefix)
+                # Match the path itself or anything below it, not siblings sharing the prefix
+                below = prefix.rstrip(os.sep) + os.sep
+                cur = conn.execute("DELETE FROM entries WHERE path = ? OR substr(path, 1, ?) = ?",
+                                   (prefix, len(below), below))
+            conn.commit()
+            return cur.rowcount
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def count(self) -> int:
+        self.flush()
+        return self._get_conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        if hasattr(self._local, "conn"):
+            self._local.conn.close()
+            del self._local.conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the persistent metadata cache.")
+    parser.add_argument("--cache", help="Cache DB path (default: %(default)s)", default=MetadataCache.default_path())
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--invalidate", metavar="PATH", help="Drop entries for PATH and everything below it")
+    group.add_argument("--clear", action="store_true", help="Drop every entry")
+    group.add_argument("--prune", type=int, metavar="MAX", help="Keep only the MAX most recently used entries")
+    group.add_argument("--count", action="store_true", help="Print the number of entries")
+    args = parser.parse_args(argv)
+
+    cache = MetadataCache(args.cache)
+    if args.invalidate:
+        print(f"Removed {cache.invalidate(args.invalidate)} entries")
+    elif args.clear:
+        print(f"Removed {cache.invalidate()} entries")
+    elif args.prune is not None:
+        cache.max_entries = args.prune
+        print(f"Removed {cache.prune()} entries")
+    else:
+        print(cache.count())
+    cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+from collections import deque
+from typing import List, Tuple
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
+from ..utils.log_buffer import LogBuffer
+
+
+class LogModel(QAbstractListModel):
+    """
+    Operation log kept in a fixed-size ring: once capacity lines are shown the
+    oldest ones scroll out, so a million-file scan uses the same memory as a
+    small one. Lines arrive through a LogBuffer and are flushed to the view at
+    a fixed frame rate, one model update per frame.
+    """
+    CAPACITY = 5000
+    FLUSH_INTERVAL_MS = 50   # 20 frames per second
+
+    def __init__(self, buffer: LogBuffer, parent=None, capacity: int = CAPACITY):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.capacity = capacity
+        self._lines: deque = deque()
+        self.views = []   # Views kept scrolled to the bottom while the user has not scrolled up
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(self.FLUSH_INTERVAL_MS)
+
+    def clear(self):
+        self.flush()
+        self.beginResetModel()
+        self._lines.clear()
+        self.endResetModel()
+
+    def flush(self):
+        entries, dropped = self.buffer.drain()
+        if dropped:
+            entries.insert(0, ("WARNING", f"... {dropped} messaggi non mostrati ..."))
+        if entries:
+            self._append(entries)
+
+    def _append(self, entries: List[Tuple[str, str]]):
+        entries = entries[-self.capacity:]
+        follow = [view for view in self.views if self._at_bottom(view)]
+
+        overflow = len(self._lines) + len(entries) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+
+        start = len(self._lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(entries) - 1)
+        self._lines.extend(entries)
+        self.endInsertRows()
+
+        for view in follow:
+            view.scrollToBottom()
+
+    @staticmethod
+    def _at_bottom(view) -> bool:
+        bar = view.verticalScrollBar()
+        return bar.value() >= bar.maximum()
+
+    # --- Qt model interface ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        level, text = self._lines[index.row()]
+        if role == Qt.DisplayRole:
+            return f"[{level}] {text}"
+        if role == Qt.ForegroundRole:
+            if level == "ERROR":
+                return Qt.red
+            if level == "SUCCESS":
+                return Qt.green
+            if level == "WARNING":
+                return Qt.yellow
+        return None
@@ -1,4 +1,6 @@
+import os
 import sys
+import time
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -15,21 +17,29 @@ from PySide6.QtWidgets import (
     QButtonGroup,
     QMessageBox,
     QHeaderView,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QListView,
+    QComboBox,
     QStackedWidget,
     QGroupBox,
-    QFrame
+    QFrame,
+    QCheckBox
 )
 from PySide6.QtCore import Qt, QThread, Signal, Slot, QSize
 from PySide6.QtGui import QIcon, QFont
 from ..core.scanner import Scanner
 from ..core.organizer import OrganizerEngine
+from ..core.dedup import DuplicateFinder
+from ..core.archive import ArchiveMatcher
 from ..data.database import SessionDatabase
+from ..data.metadata_cache import MetadataCache
+from ..utils.instrumentation import metrics, start_profiler, stop_profiler
+from ..utils.log_buffer import LogBuffer
+from .log_model import LogModel
+from .preview_model import PreviewTableModel
 from .styles import DARK_THEME
 
 class WorkerThread(QThread):
-    progress = Signal(str)
     progress_int = Signal(int, int)
     finished = Signal()
 
@@ -42,15 +52,23 @@ class WorkerThread(QThread):
         self.task_func(*self.args, self)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, db_path: str = "session.db"):
         super().__init__()
         self.setWindowTitle("Organizer Foto Pro")
         self.resize(1100, 800)
         
+        # Opt-in sampling profiler: ORGANIZER_PROFILE=<collapsed stacks output file>
+        if os.environ.get("ORGANIZER_PROFILE"):
+            start_profiler()
+
+        # Log lines from any thread; shown in batches by LogModel
+        self.log_buffer = LogBuffer()
+
         # Init Backend
-        self.db = SessionDatabase("session.db")
-        self.scanner = Scanner(self.db)
-        self.organizer = OrganizerEngine(self.db)
+        self.db = SessionDatabase(db_path, write_behind=True)
+        self.cache = MetadataCache()
+        self.scanner = Scanner(self.db, cache=self.cache)
+        self.organizer = OrganizerEngine(self.db, cache=self.cache)
         
         # Main Layout
         self.central_widget = QWidget()
@@ -106,6 +124,13 @@ class MainWindow(QMainWindow):
         
         layout_opts.addWidget(self.radio_date)
         layout_opts.addWidget(self.radio_type)
+        
+        self.chk_skip_dupes = QCheckBox("Ignora i duplicati (stesso contenuto, nome diverso)")
+        layout_opts.addWidget(self.chk_skip_dupes)
+
+        self.chk_skip_archived = QCheckBox("Ignora i file già presenti nell'archivio di destinazione")
+        self.chk_skip_archived.setChecked(True)
+        layout_opts.addWidget(self.chk_skip_archived)
         main_layout.addWidget(group_opts)
         
         # 3. Destination Group
@@ -149,14 +174,24 @@ class MainWindow(QMainWindow):
         self.lbl_stats = QLabel("")
         self.lbl_stats.setStyleSheet("color: #aaa;")
         header.addWidget(self.lbl_stats, alignment=Qt.AlignRight)
+
+        self.combo_status = QComboBox()
+        self.combo_status.addItem("Tutti gli stati", None)
+        for status, label in PreviewTableModel.STATUS_LABELS.items():
+            self.combo_status.addItem(label, status)
+        self.combo_status.currentIndexChanged.connect(
+            lambda: self.preview_model.set_status_filter(self.combo_status.currentData()))
+        header.addWidget(self.combo_status)
         layout.addLayout(header)
         
-        # Table
-        self.table_preview = QTableWidget()
-        self.table_preview.setColumnCount(4)
-        self.table_preview.setHorizontalHeaderLabels(["File Originale", "Data Rilevata", "Destinazione Proposta", "Stato"])
+        # Table: rows are paged in from the session DB while scrolling
+        self.preview_model = PreviewTableModel(self.db, self)
+        self.table_preview = QTableView()
+        self.table_preview.setModel(self.preview_model)
         self.table_preview.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_preview.verticalHeader().setVisible(False)
         self.table_preview.setAlternatingRowColors(True)
+        self.table_preview.setSortingEnabled(True)
         layout.addWidget(self.table_preview)
         
         # Action Bar
@@ -193,9 +228,15 @@ class MainWindow(QMainWindow):
         self.progress_bar.setFormat("%p% - %v/%m File")
         layout.addWidget(self.progress_bar)
         
-        self.log_view = QTreeWidget()
-        self.log_view.setHeaderLabels(["Dettagli Operazioni"])
-        self.log_view.setRootIsDecorated(False)
+        lbl_log = QLabel("Dettagli Operazioni")
+        lbl_log.setStyleSheet("color: #aaa;")
+        layout.addWidget(lbl_log)
+
+        self.log_model = LogModel(self.log_buffer, self)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)   # No per-row size query on every update
+        self.log_model.views.append(self.log_view)
         layout.addWidget(self.log_view)
         
         self.btn_finish = QPushButton("Nuova Scansione")
@@ -231,7 +272,7 @@ class MainWindow(QMainWindow):
 
     def start_scan(self):
         self.stack.setCurrentIndex(2) # Go to progress for scanning
-        self.log_view.clear()
+        self.log_model.clear()
         self.add_log("Inizio scansione...", "INFO")
         
         # Collect sources
@@ -240,19 +281,31 @@ class MainWindow(QMainWindow):
             sources.append(self.source_list.topLevelItem(i).text(0))
             
         self.worker = WorkerThread(self.run_scan_process, sources)
-        self.worker.progress.connect(lambda s: self.add_log(s))
         self.worker.finished.connect(self.on_scan_finished)
         self.worker.start()
 
     def run_scan_process(self, sources, thread_context):
         for src in sources:
-            self.scanner.scan_path(src, lambda f: thread_context.progress.emit(f"Scan: {f}"))
+            self.scanner.scan_path(src, lambda f: self.log_buffer.append(f"Scan: {f}"))
+        
+        # Find duplicates
+        skip_dupes = self.chk_skip_dupes.isChecked()
+        if skip_dupes:
+            self.log_buffer.append("Ricerca duplicati in corso...")
+            DuplicateFinder(self.db, self.organizer.transfer).run(self.log_buffer.append)
         
+        dest_path = self.lbl_dest.text()
+        if self.chk_skip_archived.isChecked():
+            catalog = self.organizer.open_catalog(dest_path, create=False)
+            if catalog:
+                self.log_buffer.append("Ricerca file già in archivio...")
+                ArchiveMatcher(self.db, catalog, self.organizer.transfer).run(self.log_buffer.append)
+                catalog.close()
+
         # Calc destinations
-        thread_context.progress.emit("Calcolo destinazioni in corso...")
+        self.log_buffer.append("Calcolo destinazioni in corso...")
         mode = OrganizerEngine.MODE_DATE_TREE if self.radio_date.isChecked() else OrganizerEngine.MODE_TYPE_DATE
-        dest_path = self.lbl_dest.text()
-        self.organizer.calculate_destinations(dest_path, mode)
+        self.organizer.calculate_destinations(dest_path, mode, skip_duplicates=skip_dupes)
 
     def on_scan_finished(self):
         self.add_log("Scansione completata.", "SUCCESS")
@@ -260,39 +313,15 @@ class MainWindow(QMainWindow):
         self.stack.setCurrentIndex(1) # Go to preview
 
     def load_preview(self):
-        files = self.db.get_all_files()
-        self.table_preview.setRowCount(len(files))
+        self.db.flush()
+        stats = self.db.get_stats()
         
         # Update Stats
-        total_size = sum(f['size'] for f in files)
-        size_gb = total_size / (1024**3)
-        self.lbl_stats.setText(f"File trovati: {len(files)} | Dimensione Totale: {size_gb:.2f} GB")
-        
-        status_map = {
-            'pending': 'In attesa',
-            'skipped': 'Saltato',
-            'copied': 'Copiato',
-            'verified': 'Verificato',
-            'moved': 'Spostato',
-            'error': 'Errore'
-        }
-        
-        for i, row in enumerate(files):
-            self.table_preview.setItem(i, 0, QTableWidgetItem(row['file_name']))
-            self.table_preview.setItem(i, 1, QTableWidgetItem(row['date_taken']))
-            self.table_preview.setItem(i, 2, QTableWidgetItem(row['dest_path']))
-            
-            raw_status = row['status']
-            status_text = status_map.get(raw_status, raw_status)
-            item_status = QTableWidgetItem(status_text)
-            
-            # Color code status
-            if raw_status == 'error':
-                 item_status.setForeground(Qt.red)
-            elif raw_status == 'verified':
-                item_status.setForeground(Qt.green)
-                
-            self.table_preview.setItem(i, 3, item_status)
+        size_gb = stats['total_size_bytes'] / (1024**3)
+        self.lbl_stats.setText(f"File trovati: {stats['total_files']} | Dimensione Totale: {size_gb:.2f} GB")
+        
+        # First page only; the rest is fetched as the table scrolls
+        self.preview_model.reload()
 
     def start_execution(self):
         self.stack.setCurrentIndex(2)
@@ -309,11 +338,19 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(current)
 
     def run_execution_process(self, thread_context):
+        last_emit = 0.0
+
         def progress(current, total):
-            thread_context.progress_int.emit(current, total)
+            # At most one progress bar update per log frame (plus the final one)
+            nonlocal last_emit
+            now = time.monotonic()
+            if current == total or now - last_emit >= LogModel.FLUSH_INTERVAL_MS / 1000:
+                last_emit = now
+                thread_context.progress_int.emit(current, total)
             
         try:
-            self.organizer.execute_transfer(delete_source=False, progress_callback=progress)
+            self.organizer.execute_transfer(delete_source=False, progress_callback=progress,
+                                            log_callback=self.log_buffer.append)
         except Exception as e:
             print(f"Execution Error: {e}")
 
@@ -322,7 +359,9 @@ class MainWindow(QMainWindow):
         
         # Run Verification
         try:
-            report = self.organizer.verify_migration()
+            # Files confirmed during the transfer are only stat-ed, the others re-hashed
+            report = self.organizer.verify_migration(incremental=True, log_callback=self.add_log,
+                                                     issue_callback=lambda m: self.add_log(m, "ERROR"))
             self.add_log(f"Verifica completata: {report['success']} OK, {report['corrupted']} Corrotti", "SUCCESS")
         except Exception as e:
              self.add_log(f"Errore verifica: {e}", "ERROR")
@@ -337,17 +376,30 @@ class MainWindow(QMainWindow):
                f"Mancanti/Saltati: {report['missing']}\n"
                f"Corrotti: {report['corrupted']}")
                
+        self.save_session_metrics()
         QMessageBox.information(self, "Report Finale", msg)
         self.btn_finish.setVisible(True)
 
+    def save_session_metrics(self):
+        """Per-stage timings of this session: stats table of session.db and session_metrics.json."""
+        try:
+            self.db.save_stats(metrics.flat_stats())
+            metrics.dump_json("session_metrics.json")
+            for line in metrics.report_lines(5):
+                self.add_log(f"Tempi: {line}", "INFO")
+        except Exception as e:
+            self.add_log(f"Errore salvataggio metriche: {e}", "ERROR")
+
+    def closeEvent(self, event):
+        stop_profiler()
+        # Commits what the write-behind queue still holds (statuses of files already moved)
+        self.db.close()
+        self.cache.close()
+        super().closeEvent(event)
+
     def add_log(self, text, level="INFO"):
-        item = QTreeWidgetItem([f"[{level}] {text}"])
-        if level == "ERROR":
-            item.setForeground(0, Qt.red)
-        elif level == "SUCCESS":
-            item.setForeground(0, Qt.green)
-        self.log_view.addTopLevelItem(item)
-        self.log_view.scrollToBottom()
+        # Same path as the worker messages, so the order is kept; shown on the next frame
+        self.log_buffer.append(text, level)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,106 @@
+from typing import List, Optional
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from ..data.database import SessionDatabase
+
+
+class PreviewTableModel(QAbstractTableModel):
+    """
+    Preview rows read from the SessionDatabase one page at a time, as the view
+    scrolls (canFetchMore/fetchMore). Sorting and the status filter are SQL
+    (SessionDatabase.fetch_page), so opening the preview costs one page
+    whatever the session size, and memory grows only with what was scrolled.
+    """
+    PAGE_SIZE = 500
+
+    # (DB column, header)
+    COLUMNS = [
+        ("file_name", "File Originale"),
+        ("date_taken", "Data Rilevata"),
+        ("dest_path", "Destinazione Proposta"),
+        ("status", "Stato"),
+    ]
+
+    STATUS_LABELS = {
+        'pending': 'In attesa',
+        'skipped': 'Saltato',
+        'copied': 'Copiato',
+        'verified': 'Verificato',
+        'moved': 'Spostato',
+        'error': 'Errore'
+    }
+
+    def __init__(self, db: SessionDatabase, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self._rows: List[tuple] = []
+        self._order_by = "id"
+        self._descending = False
+        self._status: Optional[str] = None
+        self._after: Optional[tuple] = None
+        self._exhausted = True
+
+    def reload(self):
+        """Drops the loaded pages and starts again from the first one (call after the DB changed)."""
+        self.beginResetModel()
+        self._rows = []
+        self._after = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def set_status_filter(self, status: Optional[str]):
+        self._status = status
+        self.reload()
+
+    # --- Qt model interface ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        statuses = (self._status,) if self._status else None
+        page = self.db.fetch_page(self._order_by, self._descending, statuses, self._after, self.PAGE_SIZE)
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not page:
+            return
+        self._after = (page[-1][self._order_by], page[-1]['id'])
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        # Only the displayed columns are kept
+        self._rows.extend(tuple(row[name] for name, _ in self.COLUMNS) for row in page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        is_status = self.COLUMNS[index.column()][0] == "status"
+        if role == Qt.DisplayRole:
+            if is_status:
+                return self.STATUS_LABELS.get(value, value)
+            return value
+        if role == Qt.ForegroundRole and is_status:
+            # Color code status
+            if value == 'error':
+                return Qt.red
+            if value == 'verified':
+                return Qt.green
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._order_by = self.COLUMNS[column][0] if 0 <= column < len(self.COLUMNS) else "id"
+        self._descending = order == Qt.DescendingOrder
+        self.reload()
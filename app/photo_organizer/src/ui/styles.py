@@ -61,7 +61,7 @@ QPushButton#success:hover {
 }
 
 /* Tree & Table Views */
-QTreeWidget, QTableWidget {
+QTreeWidget, QTableView {
     background-color: #333333;
     alternate-background-color: #3a3a3a;
     border: 1px solid #444444;
@@ -78,11 +78,11 @@ QHeaderView::section {
     border-bottom: 1px solid #444444;
 }
 
-QTreeWidget::item, QTableWidget::item {
+QTreeWidget::item, QTableView::item {
     padding: 4px;
 }
 
-QTreeWidget::item:selected, QTableWidget::item:selected {
+QTreeWidget::item:selected, QTableView::item:selected {
     background-color: #3d8ec9;
     color: white;
 }
@@ -0,0 +1,136 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+from .instrumentation import metrics
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit tuned at run time by AIMD on measured throughput and latency.
+    Workers report each completed unit of work with record(units, seconds); every
+    interval the controller compares the window with the previous one and moves
+    the limit by one, hill-climbing on throughput:
+    - throughput rose: the last step paid, take another the same way
+      (increases only while work was waiting for a slot)
+    - throughput fell: the last step hurt (an HDD seeking between streams), reverse
+    - no difference: the extra workers are waste, try one fewer
+    and, above that, latency per unit beyond tolerance x the best seen means the
+    device is queueing: multiplicative decrease.
+    Every change is reported to on_decision (e.g. a progress callback).
+
+    Slots are taken either with slot() (blocking) or by a dispatcher that reads
+    .limit itself and calls note_saturated() when work waits on it.
+    """
+
+    def __init__(self, name: str, initial: int, minimum: int = 1, maximum: int = 64,
+                 interval: float = 1.0, tolerance: float = 2.0, decrease: float = 0.7, threshold: float = 0.05,
+                 min_samples: int = 4,
+                 unit: str = "file", unit_scale: float = 1.0, on_decision: Optional[Callable[[str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.interval = interval
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.threshold = threshold   # Relative throughput change below which two windows count as equal
+        self.min_samples = min_samples
+        self.unit = unit
+        self.unit_scale = unit_scale   # Reported units per recorded unit (e.g. 1 / 2**20 for MB)
+        self.on_decision = on_decision
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0          # Workers blocked in slot()
+        self._saturated = False    # Set by note_saturated() during the window
+        self._window_start = clock()
+        self._units = 0.0
+        self._busy = 0.0
+        self._samples = 0
+        self._best_latency: Optional[float] = None
+        self._last_throughput: Optional[float] = None
+        self._direction = 1   # Way of the next step: +1 more workers, -1 fewer
+
+    @contextmanager
+    def slot(self):
+        """Blocks until fewer than limit workers hold a slot."""
+        with self._cond:
+            if self._active >= self.limit:
+                self._waiting += 1
+                while self._active >= self.limit:
+                    self._cond.wait()
+                self._waiting -= 1
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+    def note_saturated(self):
+        """Work was waiting for a slot during this window (an increase could help)."""
+        self._saturated = True
+
+    def record(self, units: float, seconds: float):
+        decision = None
+        with self._cond:
+            self._units += units
+            self._busy += seconds
+            self._samples += 1
+            now = self.clock()
+            if now - self._window_start >= self.interval and self._samples >= self.min_samples:
+                decision = self._evaluate(now)
+        if decision and self.on_decision:
+            self.on_decision(decision)
+
+    def _evaluate(self, now: float) -> Optional[str]:
+        """Closes the window and adjusts the limit. Returns the decision message, if the limit changed."""
+        throughput = self._units / (now - self._window_start)
+        latency = self._busy / self._units if self._units else 0.0
+        old = self.limit
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+
+        if latency > self._best_latency * self.tolerance and self.limit > self.minimum:
+            self.limit = max(self.minimum, math.floor(self.limit * self.decrease))
+            self._direction = -1
+            reason = "latenza in aumento"
+        elif self._last_throughput is None or throughput > self._last_throughput * (1 + self.threshold):
+            # First window, or the last step paid: keep going the same way
+            self._step(self._direction)
+            reason = "throughput in crescita" if self._last_throughput else "lavoro in attesa"
+        elif throughput < self._last_throughput * (1 - self.threshold):
+            # The last step (or a change of load) hurt: go back
+            self._direction = -self._direction
+            self._step(self._direction)
+            reason = "throughput in calo"
+        else:
+            # No difference: extra workers are waste, fewer are tried until throughput drops
+            self._direction = -1 if self.limit > self.minimum else 1
+            self._step(self._direction)
+            reason = "throughput stabile"
+
+        self._last_throughput = throughput
+        # The best latency slowly ages, so a change of workload (bigger files) is not read as congestion forever
+        self._best_latency *= 1.01
+        self._window_start = now
+        self._units = self._busy = 0.0
+        self._samples = 0
+        self._saturated = False
+        if self.limit == old:
+            return None
+        self._cond.notify_all()
+        metrics.count(f"adaptive.{self.name}.{'up' if self.limit > old else 'down'}")
+        scale = self.unit_scale
+        return (f"Concorrenza {self.name}: {old} -> {self.limit} ({reason}; "
+                f"{throughput * scale:.1f} {self.unit}/s, {latency / scale * 1000:.2f} ms/{self.unit})")
+
+    def _step(self, direction: int):
+        if direction > 0 and (self._saturated or self._waiting) and self.limit < self.maximum:
+            self.limit += 1
+        elif direction < 0 and self.limit > self.minimum:
+            self.limit -= 1
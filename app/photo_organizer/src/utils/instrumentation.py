@@ -0,0 +1,273 @@
+"""
+Lightweight timers, counters and latency histograms for the pipeline stages,
+plus an opt-in sampling profiler.
+
+    from ..utils.instrumentation import metrics
+
+    with metrics.timer("transfer.copy"):
+        ...
+    metrics.count("hash.bytes", n)
+
+    @metrics.timed("db.add_files")
+    def add_files(...): ...
+
+At the end of a session metrics.snapshot() / dump_json() give every histogram
+and counter, and SessionDatabase.save_stats(metrics.flat_stats()) stores them in
+the 'stats' table. Set ORGANIZER_METRICS=0 to turn recording off.
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Histogram bucket upper bounds in seconds: 1 us doubling up to ~9 minutes
+BUCKET_BOUNDS: List[float] = [1e-6 * 2 ** i for i in range(30)]
+
+
+class Histogram:
+    """Fixed log2 buckets: constant memory whatever the number of samples."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th sample (at most 2x off, never below the truth)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": self.min * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p90_ms": self.percentile(0.90) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            # Non-empty buckets only: {upper bound in ms: samples}
+            "buckets": {(f"{BUCKET_BOUNDS[i] * 1000:g}" if i < len(BUCKET_BOUNDS) else "inf"): n
+                        for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self._started = time.time()
+
+    def observe(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.record(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of timer()."""
+        def decorator(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "started": self._started,
+                "elapsed_s": time.time() - self._started,
+                "timers": {name: h.to_dict() for name, h in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def export(self) -> Dict:
+        """Raw state, picklable: lets worker processes ship their measurements to the parent."""
+        with self._lock:
+            return {
+                "timers": {name: (h.count, h.total, h.min, h.max, list(h.buckets))
+                           for name, h in self._histograms.items()},
+                "counters": dict(self._counters),
+            }
+
+    def merge(self, exported: Dict):
+        """Adds the measurements of export() (e.g. from a worker process) to this registry."""
+        if not self.enabled or not exported:
+            return
+        with self._lock:
+            for name, (count, total, low, high, buckets) in exported["timers"].items():
+                hist = self._histograms.get(name)
+                if hist is None:
+                    hist = self._histograms[name] = Histogram()
+                hist.count += count
+                hist.total += total
+                hist.min = min(hist.min, low)
+                hist.max = max(hist.max, high)
+                hist.buckets = [a + b for a, b in zip(hist.buckets, buckets)]
+            for name, value in exported["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def dump_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def flat_stats(self, prefix: str = "metrics.") -> Dict[str, int]:
+        """Integer key/values for the 'stats' table: counters, and count/total/percentiles (us) per timer."""
+        snap = self.snapshot()
+        flat = {f"{prefix}counter.{name}": value for name, value in snap["counters"].items()}
+        for name, h in snap["timers"].items():
+            flat[f"{prefix}timer.{name}.count"] = h["count"]
+            for field in ("total_s", "p50_ms", "p90_ms", "p99_ms", "max_ms"):
+                scale = 1e6 if field.endswith("_s") else 1e3
+                flat[f"{prefix}timer.{name}.{field.rsplit('_', 1)[0]}_us"] = int(h[field] * scale)
+        return flat
+
+    def report_lines(self, top: int = 10) -> List[str]:
+        """Most expensive timers by total time, for a short end-of-run summary."""
+        timers = self.snapshot()["timers"]
+        ranked = sorted(timers.items(), key=lambda item: item[1]["total_s"], reverse=True)[:top]
+        return [f"{name}: {h['total_s']:.2f}s in {h['count']} (p50 {h['p50_ms']:.2f} ms, p99 {h['p99_ms']:.2f} ms)"
+                for name, h in ranked]
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a daemon thread snapshots every thread's stack each
+    interval seconds and counts collapsed stacks ("outer;...;inner" -> samples),
+    the input format of flamegraph.pl and speedscope. Nothing runs unless start()
+    is called, so it costs nothing when off.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, n in self.samples.most_common():
+                f.write(f"{stack} {n}\n")
+
+    def top_functions(self, top: int = 20) -> List[tuple]:
+        """(function, self samples) of the innermost frames, hottest first."""
+        leaves = Counter()
+        for stack, n in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        return leaves.most_common(top)
+
+
+# Process-wide registry used by the core modules
+metrics = Instrumentation(enabled=os.environ.get("ORGANIZER_METRICS", "1") != "0")
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def start_profiler(interval: float = 0.005) -> SamplingProfiler:
+    """Opt-in: MainWindow starts it when ORGANIZER_PROFILE=<output file> is set, the CLI with --profile FILE."""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(interval)
+        _profiler.start()
+    return _profiler
+
+
+def stop_profiler(path: Optional[str] = None) -> Optional[SamplingProfiler]:
+    """Stops the profiler and writes collapsed stacks to path (or $ORGANIZER_PROFILE)."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    path = path or os.environ.get("ORGANIZER_PROFILE")
+    if path:
+        profiler.dump_collapsed(path)
+    return profiler
@@ -0,0 +1,33 @@
+import threading
+from collections import deque
+from typing import List, Tuple
+
+
+class LogBuffer:
+    """
+    Thread-safe hand-off of log lines from worker threads to the GUI.
+    append() never blocks and never touches Qt: the GUI drains the buffer on a
+    timer and renders a whole batch at once. When the GUI falls behind, the
+    oldest pending lines are dropped (and counted) instead of growing memory.
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        self._pending: deque = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self.total_dropped = 0
+
+    def append(self, text: str, level: str = "INFO"):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append((level, text))
+
+    def drain(self) -> Tuple[List[Tuple[str, str]], int]:
+        """([(level, text), ...] since the last drain, lines dropped meanwhile)."""
+        with self._lock:
+            entries = list(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+        self.total_dropped += dropped
+        return entries, dropped
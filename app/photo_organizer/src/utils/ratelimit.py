@@ -0,0 +1,38 @@
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe byte budget shared by all the workers of a stage.
+    consume(n) returns at once while the bucket has tokens and otherwise
+    sleeps just long enough to keep the average at rate bytes/s; bursts are
+    capped at capacity bytes. A rate of None (or 0) means unlimited.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.set_rate(rate, capacity)
+
+    def set_rate(self, rate: Optional[float], capacity: Optional[float] = None):
+        """Changes the budget on the fly (the tokens already earned are kept, up to the new capacity)."""
+        with self._lock:
+            self.rate = rate or None
+            # One second of budget by default: smooth, but a single 1 MB read never waits on itself
+            self.capacity = capacity or (self.rate or 0)
+            self._tokens = min(getattr(self, "_tokens", self.capacity), self.capacity)
+            self._last = time.monotonic()
+
+    def consume(self, amount: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Take the tokens now, even into debt: later callers queue up behind this one
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)